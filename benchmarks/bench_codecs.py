@@ -0,0 +1,55 @@
+"""
+Бенчмарк кодеков хранилища: время сериализации и разбора и размер файла.
+Для сравнения приведен прежний формат FileStorageClient (json с indent=2; datetime в нем
+не сериализовался, здесь он превращается в строку без восстановления при чтении).
+
+Запуск: python -m benchmarks.bench_codecs --sizes 100000
+"""
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import make_books, measure
+from src.storage.codecs import get_codec
+
+CODEC_NAMES = ("json", "orjson", "msgpack")
+
+
+def run(size: int, repeat: int) -> None:
+    records = make_books(size)
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for record in records:
+        record["created_at"] = record["updated_at"] = created_at + timedelta(seconds=record["id"])
+
+    print(f"\n{size:,} books")
+    print(f"{'codec':16} {'encode, ms':>12} {'decode, ms':>12} {'size, MB':>10}")
+
+    legacy = json.dumps(records, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+    encode_ms = measure(lambda: json.dumps(records, indent=2, ensure_ascii=False, default=str).encode("utf-8"), repeat)
+    decode_ms = measure(lambda: json.loads(legacy), repeat)
+    print(f"{'legacy indent=2':16} {encode_ms:12.1f} {decode_ms:12.1f} {len(legacy) / 2**20:10.1f}")
+
+    for name in CODEC_NAMES:
+        try:
+            codec = get_codec(name)
+        except ValueError as e:
+            print(f"{name:16} skipped: {e}")
+            continue
+        content = codec.encode_records(records)
+        assert codec.decode_records(content)[-1]["created_at"] == records[-1]["created_at"]
+        encode_ms = measure(lambda: codec.encode_records(records), repeat)
+        decode_ms = measure(lambda: codec.decode_records(content), repeat)
+        print(f"{name:16} {encode_ms:12.1f} {decode_ms:12.1f} {len(content) / 2**20:10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
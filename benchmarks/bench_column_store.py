@@ -0,0 +1,59 @@
+"""
+Бенчмарк страницы списка и общего количества: RecordIndex (словари записей) против ColumnStore
+(колонки NumPy, статус и жанр кодами словаря, фильтры - булевы маски).
+
+Запуск: python -m benchmarks.bench_column_store --sizes 1000000
+"""
+import argparse
+import gc
+
+from benchmarks.common import make_books, measure
+from src.models.book import BookFilters, BookSortField
+from src.storage.column_store import ColumnStore
+from src.storage.record_index import RecordIndex
+
+QUERY_CASES = {
+    "status": BookFilters(status="available"),
+    "genre='fic'": BookFilters(genre="fic"),
+    "genre='Detective', status": BookFilters(genre="Detective", status="borrowed"),
+    "status, sort by year": BookFilters(status="reserved", sort_by=BookSortField.YEAR_OF_RELEASING),
+    "genre, sort by title": BookFilters(genre="poetry", sort_by=BookSortField.TITLE),
+    "title='garden', status": BookFilters(title="garden", status="available"),
+}
+
+
+def time_cases(index, repeat: int) -> dict:
+    """Медианы (page+total, count) по всем случаям"""
+    return {
+        name: (measure(lambda: index.query_page(filters, filters.offset, filters.limit), repeat),
+               measure(lambda: index.count(filters), repeat))
+        for name, filters in QUERY_CASES.items()
+    }
+
+
+def run(size: int, repeat: int) -> None:
+    records = make_books(size)
+    # Индексы строятся по очереди, чтобы не держать в памяти оба сразу
+    rows = time_cases(RecordIndex(records), repeat)
+    gc.collect()
+    columns = time_cases(ColumnStore(records), repeat)
+
+    print(f"\n{size:,} books")
+    print(f"{'filter':28} {'rows page+total':>16} {'columns':>9} {'rows count':>11} {'columns':>9} {'speedup':>8}")
+    for name in QUERY_CASES:
+        (rows_page, rows_count), (columns_page, columns_count) = rows[name], columns[name]
+        print(f"{name:28} {rows_page:16.2f} {columns_page:9.2f} {rows_count:11.2f} {columns_count:9.2f} "
+              f"{rows_page / columns_page:7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк памяти на книгу (tracemalloc): каталог разбирается из JSON и превращается в сущности.
+До: обычный @dataclass с __dict__ и своей копией status/genre/author у каждой книги.
+После: BookEntity со __slots__ и интернированными status/genre/author.
+
+Запуск: python -m benchmarks.bench_entity_memory --sizes 1000000
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import make_books
+from src.domain.entities import BookEntity
+from src.storage.interning import intern_fields
+
+
+@dataclass
+class LegacyBookEntity:
+    """BookEntity в прежнем виде: обычный dataclass без __slots__"""
+    title: str
+    author: str
+    year_of_releasing: int
+    genre: str
+    amount_of_pages: int
+    status: str
+    id: Optional[int] = None
+    isbn: Optional[str] = None
+    cover_url: Optional[str] = None
+    description: Optional[str] = None
+    subjects: List[str] = field(default_factory=list)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+def to_entity(entity_class: type, data: Dict[str, Any]) -> Any:
+    """Та же конвертация, что BookRepository._dict_to_entity"""
+    return entity_class(
+        id=data.get("id"), title=data.get("title", ""), author=data.get("author", ""),
+        year_of_releasing=data.get("year_of_releasing", 0), genre=data.get("genre", ""),
+        amount_of_pages=data.get("amount_of_pages", 0), status=data.get("status", "available"),
+        isbn=data.get("isbn"), cover_url=data.get("cover_url"), description=data.get("description"),
+        subjects=data.get("subjects", []), created_at=data.get("created_at"), updated_at=data.get("updated_at"),
+    )
+
+
+def bytes_per_book(payload: bytes, build: Callable[[Dict[str, Any]], Any], size: int) -> float:
+    """Память, которую занимают сущности после разбора payload, в байтах на книгу"""
+    gc.collect()
+    tracemalloc.start()
+    entities = [build(record) for record in json.loads(payload)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(entities) == size
+    return current / size
+
+
+def run(size: int) -> None:
+    # Каждая строка JSON при разборе становится отдельным объектом - как при чтении файла или ответа БД
+    payload = json.dumps(make_books(size), ensure_ascii=False).encode("utf-8")
+    before = bytes_per_book(payload, lambda record: to_entity(LegacyBookEntity, record), size)
+    after = bytes_per_book(payload, lambda record: to_entity(BookEntity, intern_fields(record)), size)
+
+    print(f"\n{size:,} books")
+    print(f"{'entity':36} {'bytes/book':>12}")
+    print(f"{'dataclass, no interning':36} {before:12.0f}")
+    print(f"{'slots + interned status/genre/author':36} {after:12.0f}")
+    print(f"{'saved':36} {before - after:12.0f} ({(before - after) / before:.0%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
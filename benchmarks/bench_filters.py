@@ -0,0 +1,69 @@
+"""
+Бенчмарк фильтров-подстрок списка книг: линейный проход, как в BookRepository до индексов
+(конвертация каждой записи в BookEntity + _apply_filters), против триграммных индексов RecordIndex.
+
+Запуск: python -m benchmarks.bench_filters --sizes 100000 1000000
+"""
+import argparse
+from typing import Any, Dict, List
+
+from benchmarks.common import make_books, measure
+from src.domain.entities import BookEntity
+from src.models.book import BookFilters
+from src.storage.record_index import RecordIndex
+
+FILTER_CASES = {
+    "title='garden'": BookFilters(title="garden"),
+    "title='night', genre='fic'": BookFilters(title="night", genre="fic"),
+    "author='silverov'": BookFilters(author="silverov"),
+    "genre='Detective', status": BookFilters(genre="Detective", status="available"),
+    "title='мастер маргарита'": BookFilters(title="мастер маргарита"),
+}
+
+
+def legacy_get_all(records: List[Dict[str, Any]], filters: BookFilters) -> List[BookEntity]:
+    """Повторяет прежний путь BookRepository.get_all: копия данных, BookEntity на каждую запись, фильтры, срез"""
+    books = [
+        BookEntity(
+            id=data.get("id"), title=data.get("title", ""), author=data.get("author", ""),
+            year_of_releasing=data.get("year_of_releasing", 0), genre=data.get("genre", ""),
+            amount_of_pages=data.get("amount_of_pages", 0), status=data.get("status", "available"),
+            isbn=data.get("isbn"), cover_url=data.get("cover_url"), description=data.get("description"),
+            subjects=data.get("subjects", []), created_at=data.get("created_at"), updated_at=data.get("updated_at"),
+        )
+        for data in records.copy()
+    ]
+    if filters.title:
+        books = [book for book in books if filters.title.lower() in book.title.lower()]
+    if filters.author:
+        books = [book for book in books if filters.author.lower() in book.author.lower()]
+    if filters.status:
+        books = [book for book in books if book.status == filters.status.value]
+    if filters.genre:
+        books = [book for book in books if filters.genre.lower() in book.genre.lower()]
+    return books[filters.offset:filters.offset + filters.limit]
+
+
+def run(size: int, repeat: int) -> None:
+    records = make_books(size)
+    index = RecordIndex(records)
+
+    print(f"\n{size:,} books")
+    print(f"{'filter':32} {'legacy, ms':>12} {'indexed page+total, ms':>24} {'speedup':>8}")
+    for name, filters in FILTER_CASES.items():
+        legacy_ms = measure(lambda: legacy_get_all(records, filters), repeat)
+        indexed_ms = measure(lambda: index.query_page(filters, filters.offset, filters.limit), repeat)
+        print(f"{name:32} {legacy_ms:12.2f} {indexed_ms:24.2f} {legacy_ms / indexed_ms:7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
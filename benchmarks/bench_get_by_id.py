@@ -0,0 +1,67 @@
+"""
+Бенчмарк GET /books/{id} на уровне репозитория: время BookRepository.get_by_id по случайным ID
+для каталогов разного размера. Хранилища держат словарь id -> запись, поэтому время не должно
+расти вместе с каталогом.
+
+Запуск: python -m benchmarks.bench_get_by_id --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import make_books
+from src.repositories.book_repository import BookRepository
+from src.storage.file_storage import FileStorageClient
+from src.storage.memory import InMemoryStorageClient
+
+LOOKUPS = 2000
+
+
+async def lookup_us(repository: BookRepository, size: int, repeat: int) -> float:
+    """Медианное время одного get_by_id в микросекундах"""
+    rng = random.Random(size)
+    timings = []
+    for _ in range(repeat):
+        book_ids = [rng.randint(1, size) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for book_id in book_ids:
+            await repository.get_by_id(book_id)
+        timings.append((time.perf_counter() - start) / LOOKUPS * 1_000_000)
+    return statistics.median(timings)
+
+
+async def run(sizes, repeat: int) -> None:
+    print(f"{'books':>10} {'memory, us':>12} {'file, us':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            # Хранилища создаются по очереди, чтобы на 1M книг в памяти не было двух индексов сразу
+            memory = InMemoryStorageClient()
+            await memory.save_data(make_books(size))
+            memory_us = await lookup_us(BookRepository(memory), size, repeat)
+            del memory
+
+            file = FileStorageClient(path=os.path.join(directory, f"books_{size}.json"))
+            await file.save_data(make_books(size))
+            await file.get_by_id(1)  # первая загрузка файла в индекс не входит в замер
+            file_us = await lookup_us(BookRepository(file), size, repeat)
+            await file.close()
+            del file
+            gc.collect()
+            print(f"{size:>10,} {memory_us:12.1f} {file_us:10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Общие утилиты бенчмарков: генерация синтетического каталога и замер времени"""
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+_WORDS = (
+    "war peace night day river city garden house shadow light winter summer road sea "
+    "mountain storm glass silver golden dark last first secret lost hidden little old new "
+    "мастер маргарита тихий дон идиот бесы отцы дети дом сад вишневый белая гвардия"
+).split()
+_GENRES = ["Fiction", "Science Fiction", "Fantasy", "Detective", "Romance", "History", "Biography",
+           "Poetry", "Drama", "Horror", "Thriller", "Philosophy", "Psychology", "Travel", "Classic"]
+_STATUSES = ["available", "borrowed", "reserved", "maintenance"]
+
+
+def make_books(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Генерирует count записей книг с повторяющимися авторами и жанрами, как в реальном каталоге"""
+    rng = random.Random(seed)
+    authors = [f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()}ov" for _ in range(max(count // 20, 10))]
+    return [
+        {
+            "id": i,
+            "title": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 5))).capitalize() + f" {i}",
+            "author": rng.choice(authors),
+            "year_of_releasing": rng.randint(1800, 2024),
+            "genre": rng.choice(_GENRES),
+            "amount_of_pages": rng.randint(50, 1500),
+            "status": rng.choice(_STATUSES),
+            "isbn": None,
+            "cover_url": None,
+            "description": None,
+            "subjects": [],
+            "created_at": None,
+            "updated_at": None,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(func: Callable[[], Any], repeat: int = 5) -> float:
+    """Возвращает медианное время вызова в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Annotated
+import json
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Any, List
 
 from src.dependencies import get_book_service
 from src.services.book_service import BookService
-from src.models.book import Book, BookCreate, BookUpdate, BookFilters, PaginatedBooks
+from src.models.book import Book, BookCreate, BookUpdate, BookFilters, BookSearchQuery, PaginatedBooks, BulkCreateResult
+from src.models.book import ExportFormat, BookBulkUpdate, BulkChangeResult, BookBatchRequest, BookBatchResult
+from src.models.book import BulkUpsertResult
 from src.domain.exceptions import BookAlreadyExistsError, InvalidBookDataError, BookNotFoundError
 from src.core.logger import get_logger
 
@@ -11,6 +15,53 @@ logger = get_logger(__name__)
 
 router = APIRouter(prefix="/books", tags=["books"])
 
+# Тип содержимого выгрузки по формату
+EXPORT_MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv; charset=utf-8"}
+
+# Типы тела пакетной загрузки с одной книгой на строку
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _read_bulk_items(request: Request) -> List[Any]:
+    """Читает тело пакетной загрузки: JSON массив или NDJSON, который разбирается по строкам по мере получения"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type not in NDJSON_CONTENT_TYPES:
+            items = json.loads(await request.body())
+            if not isinstance(items, list):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of books")
+            return items
+
+        items, buffer = [], b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            items.extend(json.loads(line) for line in lines if line.strip())
+        if buffer.strip():
+            items.append(json.loads(buffer))
+        return items
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+
+
+def _parse_book_ids(ids: str) -> List[int]:
+    """Разбирает список ID через запятую из query параметра"""
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="ids must be a comma-separated list of integers")
+
+
+async def _get_books_batch(book_ids: List[int], book_service: BookService) -> BookBatchResult:
+    """Общая часть GET и POST /books/batch"""
+    try:
+        result = await book_service.get_books_by_ids(book_ids)
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid batch request: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    logger.info(f"Returning {len(book_ids) - len(result.missing)} of {len(book_ids)} requested books")
+    return result
+
 
 @router.post("/", response_model=Book, status_code=status.HTTP_201_CREATED)  # создание книги
 async def create_book(
@@ -31,6 +82,24 @@ async def create_book(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
 
 
+@router.post("/bulk", response_model=BulkCreateResult)
+async def create_books_bulk(
+    request: Request,  # JSON массив книг или NDJSON (Content-Type: application/x-ndjson)
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+    enrich: bool = False,  # обогащать метаданными OpenLibrary (медленно - запрос на каждую книгу)
+) -> BulkCreateResult:
+    """Пакетное создание книг с результатом по каждой книге"""
+    items = await _read_bulk_items(request)
+    logger.info(f"Bulk creating {len(items)} books")
+    try:
+        result = await book_service.create_books(items, enrich=enrich)
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid bulk request: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    logger.info(f"Bulk create: {result.created} created, {result.duplicates} duplicates, {result.invalid} invalid")
+    return result
+
+
 @router.get("/", response_model=PaginatedBooks)
 async def get_books(
     filters: Annotated[BookFilters, Depends()],  # фильтры из query параметров
@@ -43,6 +112,124 @@ async def get_books(
     return result  # возвращаем пагинированный список
 
 
+@router.patch("/", response_model=BulkChangeResult)
+async def update_books_by_filter(
+    filters: Annotated[BookFilters, Depends()],  # выборка книг из query параметров; offset/limit не применяются
+    changes: BookBulkUpdate,  # изменяемые поля
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+    dry_run: bool = False,  # только посчитать книги под фильтр
+) -> BulkChangeResult:
+    """Изменение всех книг под фильтр одной операцией"""
+    try:
+        result = await book_service.update_books_where(filters, changes, dry_run=dry_run)
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid update by filter: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    logger.info(f"Books updated by filter: {result.affected} (dry_run={dry_run})")
+    return result
+
+
+@router.delete("/", response_model=BulkChangeResult)
+async def delete_books_by_filter(
+    filters: Annotated[BookFilters, Depends()],  # выборка книг из query параметров; offset/limit не применяются
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+    dry_run: bool = False,  # только посчитать книги под фильтр
+) -> BulkChangeResult:
+    """Удаление всех книг под фильтр одной операцией"""
+    try:
+        result = await book_service.delete_books_where(filters, dry_run=dry_run)
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid delete by filter: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    logger.info(f"Books deleted by filter: {result.affected} (dry_run={dry_run})")
+    return result
+
+
+@router.get("/search", response_model=PaginatedBooks)  # объявлен до /{book_id}, чтобы не перехватывался им
+async def search_books(
+    query: Annotated[BookSearchQuery, Depends()],  # поисковый запрос и пагинация из query параметров
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+) -> PaginatedBooks:
+    """Полнотекстовый поиск книг по названию, автору и описанию с ранжированием по релевантности"""
+    logger.info(f"Searching books: q='{query.q}'")
+    result = await book_service.search_books(query)
+    logger.info(f"Returning {len(result.items)} books out of {result.total} found")
+    return result
+
+
+@router.get("/export")  # объявлен до /{book_id}, чтобы не перехватывался им
+async def export_books(
+    filters: Annotated[BookFilters, Depends()],  # те же фильтры и сортировка, что у списка; offset/limit не применяются
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+    format: ExportFormat = ExportFormat.NDJSON,  # формат выгрузки
+) -> StreamingResponse:
+    """Потоковая выгрузка всех книг под фильтры в NDJSON или CSV"""
+    logger.info(f"Exporting books as {format.value}")
+    return StreamingResponse(
+        book_service.export_books(filters, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="books.{format.value}"'},
+    )
+
+
+@router.get("/batch", response_model=BookBatchResult)  # объявлен до /{book_id}, чтобы не перехватывался им
+async def get_books_batch(
+    ids: str,  # ID книг через запятую: ?ids=1,2,3
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+) -> BookBatchResult:
+    """Получение книг по списку ID в порядке запроса; ненайденные - null в items и в списке missing"""
+    return await _get_books_batch(_parse_book_ids(ids), book_service)
+
+
+@router.post("/batch", response_model=BookBatchResult)
+async def post_books_batch(
+    request: BookBatchRequest,  # длинный список ID в теле запроса
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+) -> BookBatchResult:
+    """Получение книг по списку ID из тела запроса - для списков, не помещающихся в URL"""
+    return await _get_books_batch(request.ids, book_service)
+
+
+@router.put("/by-isbn", response_model=BulkUpsertResult)  # объявлен до /{book_id}, чтобы не перехватывался им
+async def upsert_books_by_isbn(
+    request: Request,  # JSON массив книг или NDJSON (Content-Type: application/x-ndjson); ISBN у каждой книги
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+) -> BulkUpsertResult:
+    """Пакетное создание или замена книг по ISBN - для синхронизации каталога с внешней системой"""
+    items = await _read_bulk_items(request)
+    logger.info(f"Bulk upserting {len(items)} books by ISBN")
+    try:
+        result = await book_service.upsert_books(items)
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid bulk upsert request: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    logger.info(f"Bulk upsert: {result.created} created, {result.updated} updated, "
+                f"{result.duplicates} duplicates, {result.invalid} invalid")
+    return result
+
+
+@router.put("/by-isbn/{isbn}", response_model=Book)
+async def upsert_book_by_isbn(
+    book_data: BookCreate,  # полные данные книги; ISBN в теле можно не указывать
+    response: Response,
+    book_service: Annotated[BookService, Depends(get_book_service)],  # внедренный сервис
+    isbn: str = Path(..., min_length=10, max_length=17),  # ISBN книги из path параметра
+) -> Book:
+    """Создание или полная замена книги по ISBN: 201 если книга создана, 200 если заменена"""
+    try:
+        book, created = await book_service.upsert_book_by_isbn(isbn, book_data)
+    except BookAlreadyExistsError as e:
+        logger.warning(f"Book already exists: {e}")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))  # возвращаем 409 Conflict
+    except InvalidBookDataError as e:
+        logger.warning(f"Invalid book data: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))  # возвращаем 400 Bad Request
+    if created:
+        response.status_code = status.HTTP_201_CREATED
+    logger.info(f"Book {'created' if created else 'updated'} by ISBN {isbn}: {book.id}")
+    return book
+
+
 @router.get("/{book_id}", response_model=Book)  # получение книги по ID
 async def get_book_by_id(
     book_id: int,  # ID книги из path параметра
@@ -76,6 +263,9 @@ async def update_book(
     except BookNotFoundError as e:
         logger.warning(f"Book not found: {e}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))  # возвращаем 404
+    except BookAlreadyExistsError as e:
+        logger.warning(f"Book already exists: {e}")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))  # возвращаем 409 Conflict
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
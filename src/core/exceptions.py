@@ -23,4 +23,8 @@ class AppValidationError(Exception):
 
 class BookServiceError(Exception):
     """Ошибка бизнес-логики на уровне сервисов"""
-    pass
\ No newline at end of file
+    pass
+
+class DuplicateRecordError(Exception):
+    """Запись с таким же ключом уникальности уже есть в хранилище"""
+    pass
@@ -16,16 +16,15 @@ logger = get_logger(__name__)
 
 
 async def get_storage_client(session: Annotated[AsyncSession, Depends(get_db_session)]) -> StorageClient:
-    """Создает клиент хранилища данных"""
+    """Создает клиент хранилища данных (тип из STORAGE_TYPE, по умолчанию PostgreSQL)"""
+    storage_factory = StorageFactory()
     try:
-        storage_factory = StorageFactory("postgres")
         storage = storage_factory.create_storage(session=session)
-        logger.info("PostgreSQL storage client created")
+        logger.info(f"{storage_factory.storage_type} storage client created")
         return storage
     except Exception as e:
-        logger.error(f"PostgreSQL storage failed: {e}, falling back to memory storage")
-        storage_factory = StorageFactory("memory")
-        return storage_factory.create_storage()
+        logger.error(f"{storage_factory.storage_type} storage failed: {e}, falling back to memory storage")
+        return StorageFactory("memory").create_storage()
 
 
 async def get_metadata_client() -> OpenLibraryClient:
@@ -3,11 +3,12 @@ from typing import Optional, List
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class BookEntity:
     """
     Доменная модель книги - содержит бизнес-правила и логику.
     Независима от внешних зависимостей (БД, API, фреймворков).
+    Атрибуты в __slots__: без __dict__ у каждого экземпляра, что заметно при больших каталогах в памяти.
     """
     # Основные атрибуты книги
     title: str
@@ -42,4 +43,12 @@ class BookEntity:
 
     def __repr__(self) -> str:  # техническое представление для отладки
         """Техническое представление для отладки"""
-        return f"BookEntity(id={self.id}, title='{self.title}', author='{self.author}', status='{self.status}')"
\ No newline at end of file
+        return f"BookEntity(id={self.id}, title='{self.title}', author='{self.author}', status='{self.status}')"
+
+
+@dataclass
+class BookPage:
+    """Страница книг вместе с общим количеством книг под фильтры"""
+    items: List[BookEntity]
+    total: int
+    next_cursor: Optional[str] = None  # курсор следующей страницы, None если страница последняя
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from src.domain.entities import BookEntity
-from src.models.book import BookFilters
+from typing import AsyncIterator, List, Optional, Tuple
+from src.domain.entities import BookEntity, BookPage
+from src.models.book import BookFilters, BookSearchQuery
 
 
 class BookRepositoryInterface(ABC):
@@ -12,16 +12,36 @@ class BookRepositoryInterface(ABC):
         """Получить все книги с фильтрацией и пагинацией"""
         pass
 
+    @abstractmethod
+    def iter_all(self, filters: BookFilters) -> AsyncIterator[BookEntity]:
+        """Все книги под фильтры (без offset/limit) потоком - для выгрузки каталога"""
+        pass
+
     @abstractmethod
     async def get_by_id(self, book_id: int) -> Optional[BookEntity]:
         """Найти книгу по ID"""
         pass
 
+    @abstractmethod
+    async def get_many(self, book_ids: List[int]) -> List[Optional[BookEntity]]:
+        """Найти книги по списку ID; результат в порядке ID, None на месте ненайденной"""
+        pass
+
     @abstractmethod
     async def create(self, book: BookEntity) -> BookEntity:
         """Создать новую книгу"""
         pass
 
+    @abstractmethod
+    async def create_many(self, books: List[BookEntity]) -> List[Optional[BookEntity]]:
+        """Создать пачку книг; на месте дубликата - None"""
+        pass
+
+    @abstractmethod
+    async def upsert_many(self, books: List[BookEntity]) -> List[Optional[Tuple[BookEntity, bool]]]:
+        """Создать или заменить книги по ISBN; пары (книга, создана ли она), на месте дубликата - None"""
+        pass
+
     @abstractmethod
     async def update(self, book_id: int, book: BookEntity) -> Optional[BookEntity]:
         """Обновить данные книги"""
@@ -32,7 +52,27 @@ class BookRepositoryInterface(ABC):
         """Удалить книгу"""
         pass
 
+    @abstractmethod
+    async def update_where(self, filters: BookFilters, changes: dict) -> int:
+        """Изменить все книги под фильтры, вернуть их число"""
+        pass
+
+    @abstractmethod
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удалить все книги под фильтры, вернуть их число"""
+        pass
+
     @abstractmethod
     async def count_total(self, filters: BookFilters) -> int:
         """Подсчитать общее количество книг с учетом фильтров"""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def get_page(self, filters: BookFilters) -> BookPage:
+        """Получить страницу книг и общее количество под фильтры за один запрос"""
+        pass
+
+    @abstractmethod
+    async def search(self, query: BookSearchQuery) -> BookPage:
+        """Полнотекстовый поиск книг с ранжированием по релевантности"""
+        pass
@@ -25,6 +25,21 @@ REQUEST_IN_PROGRESS = Gauge(
     ["method", "endpoint"]
 )
 
+# Метрики группового коммита файловых хранилищ
+STORAGE_BATCH_SIZE = Histogram(
+    "storage_write_batch_size",
+    "Number of changes committed by one storage write",
+    ["backend"],
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+)
+
+STORAGE_FLUSH_LATENCY = Histogram(
+    "storage_flush_duration_seconds",
+    "Duration of one storage flush (serialize + fsync + rename) in seconds",
+    ["backend"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
 
 async def prometheus_middleware(request: Request, call_next):
     """Middleware для автоматического сбора метрик всех HTTP запросов"""
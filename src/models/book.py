@@ -13,6 +13,19 @@ class BookStatus(str, Enum):
     MAINTENANCE = "maintenance"
 
 
+class BookSortField(str, Enum):
+    """Поля, по которым можно сортировать список книг (вторичный ключ - всегда id)"""
+    ID = "id"
+    TITLE = "title"
+    YEAR_OF_RELEASING = "year_of_releasing"
+
+
+class ExportFormat(str, Enum):
+    """Форматы выгрузки каталога"""
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 def _validate_isbn(isbn: Optional[str]) -> Optional[str]:
     """Валидация ISBN - общая функция"""
     if isbn is None:
@@ -65,16 +78,88 @@ class BookUpdate(BaseModel):
     description: Optional[str] = Field(None, max_length=2000)
 
 
+class BookBulkUpdate(BaseModel):
+    """Изменения для всех книг под фильтр. Название, автор и ISBN не меняются массово - они уникальны у книги"""
+    year_of_releasing: Optional[int] = Field(None, ge=1000, le=2030)
+    genre: Optional[str] = Field(None, min_length=1, max_length=100)
+    amount_of_pages: Optional[int] = Field(None, gt=0, le=10000)
+    status: Optional[BookStatus] = None
+    description: Optional[str] = Field(None, max_length=2000)
+
+
+class BulkChangeResult(BaseModel):
+    """Результат изменения или удаления по фильтру"""
+    affected: int = Field(..., ge=0)  # книг изменено/удалено (при dry_run - было бы)
+    dry_run: bool = False
+
+
+class BulkItemStatus(str, Enum):
+    """Итог обработки одной книги пакетной загрузки"""
+    CREATED = "created"
+    UPDATED = "updated"  # книга с таким ISBN уже была и заменена (только upsert по ISBN)
+    DUPLICATE = "duplicate"  # такая книга (название + автор) или ее ISBN уже есть или встречались раньше в пачке
+    INVALID = "invalid"
+
+
+class BulkItemResult(BaseModel):
+    """Результат для одной книги пакетной загрузки"""
+    index: int = Field(..., ge=0)  # позиция книги в запросе
+    status: BulkItemStatus
+    book: Optional[Book] = None  # созданная или обновленная книга
+    error: Optional[str] = None  # причина отказа для duplicate и invalid
+
+
+class BulkCreateResult(BaseModel):
+    """Ответ пакетной загрузки: счетчики и результаты в порядке книг запроса"""
+    created: int = Field(..., ge=0)
+    duplicates: int = Field(..., ge=0)
+    invalid: int = Field(..., ge=0)
+    items: List[BulkItemResult]
+
+
+class BulkUpsertResult(BaseModel):
+    """Ответ пакетного upsert по ISBN: счетчики и результаты в порядке книг запроса"""
+    created: int = Field(..., ge=0)
+    updated: int = Field(..., ge=0)
+    duplicates: int = Field(..., ge=0)
+    invalid: int = Field(..., ge=0)
+    items: List[BulkItemResult]
+
+
 class BookFilters(BaseModel):
     """Модель для фильтрации книг в API"""
     title: Optional[str] = Field(None, max_length=200, min_length=1)
     author: Optional[str] = Field(None, max_length=100, min_length=1)
     status: Optional[BookStatus] = None  # фильтр по статусу книги
     genre: Optional[str] = Field(None, max_length=100, min_length=1)
+    year_min: Optional[int] = Field(None, ge=0)  # границы включительно
+    year_max: Optional[int] = Field(None, ge=0)
+    pages_min: Optional[int] = Field(None, ge=0)
+    pages_max: Optional[int] = Field(None, ge=0)
+    offset: int = Field(0, ge=0)
+    limit: int = Field(20, ge=1, le=100)
+    sort_by: BookSortField = BookSortField.ID  # ключ сортировки страницы
+    cursor: Optional[str] = Field(None, max_length=500)  # непрозрачный курсор из next_cursor, при нем offset игнорируется
+
+
+class BookSearchQuery(BaseModel):
+    """Модель параметров полнотекстового поиска книг"""
+    q: str = Field(..., min_length=1, max_length=200)  # поисковый запрос по названию, автору и описанию
     offset: int = Field(0, ge=0)
     limit: int = Field(20, ge=1, le=100)
 
 
+class BookBatchRequest(BaseModel):
+    """Тело пакетного получения книг по ID (для длинных списков, не помещающихся в URL)"""
+    ids: List[int] = Field(..., min_length=1)
+
+
+class BookBatchResult(BaseModel):
+    """Книги в порядке запрошенных ID: на месте ненайденной книги null, сами ID перечислены в missing"""
+    items: List[Optional[Book]]
+    missing: List[int]
+
+
 class PaginatedBooks(BaseModel):
     """Модель для пагинированного списка книг"""
     items: List[Book]
@@ -82,17 +167,22 @@ class PaginatedBooks(BaseModel):
     offset: int = Field(..., ge=0)
     limit: int = Field(..., ge=1, le=100)
     has_next: bool
+    next_cursor: Optional[str] = None  # курсор следующей страницы для keyset пагинации
 
     @classmethod
     def create(cls, items: List[Book], total: int, offset: int,
-               limit: int) -> 'PaginatedBooks':
+               limit: int, next_cursor: Optional[str] = None,
+               has_next: Optional[bool] = None) -> 'PaginatedBooks':
         """Удобный конструктор для создания пагинированного ответа"""
+        if has_next is None:
+            has_next = offset + limit < total  # вычисляем есть ли следующая страница
         return cls(
             items=items,
             total=total,
             offset=offset,
             limit=limit,
-            has_next=offset + limit < total  # вычисляем есть ли следующая страница
+            has_next=has_next,
+            next_cursor=next_cursor
         )
 
 
@@ -101,6 +191,17 @@ __all__ = [  # экспортируемые классы
     "BookCreate",
     "BookUpdate",
     "BookFilters",
+    "BookSearchQuery",
     "PaginatedBooks",
-    "BookStatus"
+    "BookBatchRequest",
+    "BookBatchResult",
+    "BookBulkUpdate",
+    "BulkChangeResult",
+    "BulkItemStatus",
+    "BulkItemResult",
+    "BulkCreateResult",
+    "BulkUpsertResult",
+    "BookStatus",
+    "BookSortField",
+    "ExportFormat"
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, DDL, event, literal_column
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.sql import func
 
@@ -8,6 +8,14 @@ class Base(DeclarativeBase):
     pass
 
 
+# Расширение pg_trgm нужно до создания триграммных индексов таблицы books
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class BookORM(Base):
     """SQLAlchemy модель для таблицы books"""
     __tablename__ = "books"
@@ -35,6 +43,16 @@ class BookORM(Base):
         Index('idx_title_author', 'title', 'author'),  # индекс для поиска по названию и автору одновременно
         Index('idx_status_genre', 'status', 'genre'),  # индекс для фильтрации по статусу и жанру
         Index('idx_year_genre', 'year_of_releasing', 'genre'),  # индекс для фильтрации по году и жанру
+        Index('idx_title_id', 'title', 'id'),  # индекс для keyset пагинации с сортировкой по названию
+        Index('idx_year_id', 'year_of_releasing', 'id'),  # индекс для keyset пагинации с сортировкой по году
+        Index('idx_pages_id', 'amount_of_pages', 'id'),  # индекс для диапазона по числу страниц
+        # Триграммные GIN индексы (pg_trgm) для фильтров-подстрок ILIKE '%...%' - B-tree их не обслуживает
+        Index('idx_books_title_trgm', 'title', postgresql_using='gin',
+              postgresql_ops={'title': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('idx_books_author_trgm', 'author', postgresql_using='gin',
+              postgresql_ops={'author': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('idx_books_genre_trgm', 'genre', postgresql_using='gin',
+              postgresql_ops={'genre': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
     )
 
     def __repr__(self) -> str:  # строковое представление объекта для отладки
@@ -43,4 +61,86 @@ class BookORM(Base):
 
     def __str__(self) -> str:  # человекочитаемое строковое представление
         """Человекочитаемое представление книги"""
-        return f"{self.title} by {self.author} ({self.year_of_releasing})"
\ No newline at end of file
+        return f"{self.title} by {self.author} ({self.year_of_releasing})"
+
+
+# Полнотекстовый поиск: поддерживаемая базой tsvector колонка (title важнее author, author важнее description)
+# и GIN индекс по ней. Колонка не отображается в BookORM - ее читает только поисковый запрос.
+# DDL идемпотентен и выполняется при каждом create_all, поэтому добавляется и в уже существующую таблицу.
+SEARCH_VECTOR_COLUMN = "search_vector"
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"ALTER TABLE books ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+        ") STORED"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE INDEX IF NOT EXISTS idx_books_search_vector ON books USING gin ({SEARCH_VECTOR_COLUMN})"
+    ).execute_if(dialect="postgresql"),
+)
+
+# Полнотекстовый поиск в SQLite: внешняя FTS5 таблица над title/author/description,
+# которую триггеры синхронизируют с books (ранжирование bm25 с теми же весами полей)
+SEARCH_FTS_TABLE = "books_fts"
+
+for _statement in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_FTS_TABLE} "
+    "USING fts5(title, author, description, content='books', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_FTS_TABLE}_ai AFTER INSERT ON books BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, title, author, description) "
+    "VALUES (new.id, new.title, new.author, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_FTS_TABLE}_ad AFTER DELETE ON books BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, title, author, description) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_FTS_TABLE}_au AFTER UPDATE ON books BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, title, author, description) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description); "
+    f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, title, author, description) "
+    "VALUES (new.id, new.title, new.author, new.description); END",
+):
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+# Ключ дубликата: название и автор без учета регистра, пробелы по краям убраны, внутренние схлопнуты.
+# Уникальный индекс по выражению делает проверку дубликата частью самой вставки (INSERT ... ON CONFLICT).
+# В PostgreSQL выражение строится из встроенных функций (lower - приближение casefold),
+# в SQLite - из функции normalize_key, которую регистрирует create_sqlite_engine.
+DUPLICATE_KEY_INDEX = "uq_books_title_author_key"
+# Уникальный индекс ISBN (unique=True, index=True у колонки). PostgreSQL называет в ошибке индекс, SQLite - колонку
+ISBN_UNIQUE_INDEX = "ix_books_isbn"
+ISBN_UNIQUE_COLUMN = "books.isbn"
+_PG_DUPLICATE_KEY_SQL = "lower(btrim(regexp_replace({column}, '\\s+', ' ', 'g')))"
+
+
+def duplicate_key_expression(column, dialect: str):
+    """Выражение ключа дубликата для колонки - то же, что в уникальном индексе, иначе ON CONFLICT его не найдет"""
+    if dialect == "sqlite":
+        return func.normalize_key(column)
+    return func.lower(func.btrim(func.regexp_replace(
+        column, literal_column("'\\s+'"), literal_column("' '"), literal_column("'g'"))))
+
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {DUPLICATE_KEY_INDEX} ON books "
+        f"(({_PG_DUPLICATE_KEY_SQL.format(column='title')}), ({_PG_DUPLICATE_KEY_SQL.format(column='author')}))"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {DUPLICATE_KEY_INDEX} ON books (normalize_key(title), normalize_key(author))"
+    ).execute_if(dialect="sqlite"),
+)
@@ -1,12 +1,39 @@
-from typing import List, Optional
+import base64
+import json
+from typing import AsyncIterator, List, Optional, Tuple, Any
 from src.storage.base import StorageClient
+from src.storage.filtering import sort_key
+from src.storage.interning import intern_value
 from src.domain.repositories import BookRepositoryInterface
-from src.domain.entities import BookEntity
-from src.models.book import BookFilters
+from src.domain.entities import BookEntity, BookPage
+from src.domain.exceptions import InvalidBookDataError, BookAlreadyExistsError
+from src.core.exceptions import DuplicateRecordError
+from src.models.book import BookFilters, BookSortField, BookSearchQuery
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+
+def encode_cursor(sort_by: BookSortField, key: Tuple[Any, int]) -> str:
+    """Кодирует ключ keyset пагинации (значение сортировки, id) в непрозрачный курсор"""
+    payload = json.dumps([sort_by.value, key[0], key[1]], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: BookSortField) -> Tuple[Any, int]:
+    """Декодирует курсор и проверяет, что он выдан для той же сортировки"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        field, value, book_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise InvalidBookDataError(f"Invalid pagination cursor: {e}")
+
+    expected_type = str if sort_by == BookSortField.TITLE else int
+    if field != sort_by.value or not isinstance(value, expected_type) or not isinstance(book_id, int):
+        raise InvalidBookDataError("Pagination cursor does not match the requested sort order")
+    return value, book_id
+
+
 class BookRepository(BookRepositoryInterface):
     """Репозиторий для работы с книгами через абстрактное хранилище"""
     def __init__(self, storage_client: StorageClient):
@@ -16,90 +43,138 @@ class BookRepository(BookRepositoryInterface):
         """Получить все книги с фильтрацией и пагинацией"""
         logger.info(f"Getting books with filters: offset={filters.offset}, limit={filters.limit}")
 
-        # Получаем данные из хранилища
-        books_data: List[dict] = await self.storage.get_data()
-
-        # Конвертируем в доменные сущности
+        # Фильтрация и пагинация выполняются на стороне хранилища
+        after = decode_cursor(filters.cursor, filters.sort_by) if filters.cursor else None
+        books_data: List[dict] = await self.storage.query(
+            filters, offset=filters.offset, limit=filters.limit, after=after)
         books = [self._dict_to_entity(book_data) for book_data in books_data]
 
-        # Применяем фильтры
-        filtered_books = self._apply_filters(books, filters)
+        logger.info(f"Returning {len(books)} books")
+        return books
 
-        # Применяем пагинацию
-        start = filters.offset
-        end = filters.offset + filters.limit
-        paginated_books = filtered_books[start:end]
 
-        logger.info(
-            f"Returning {len(paginated_books)} books out of {len(filtered_books)} filtered")
-        return paginated_books
+    async def iter_all(self, filters: BookFilters) -> AsyncIterator[BookEntity]:
+        """Все книги под фильтры потоком: хранилище отдает записи порциями, в памяти держится одна порция"""
+        logger.info(f"Streaming books sorted by {filters.sort_by.value}")
+        async for book_data in self.storage.iter_records(filters):
+            yield self._dict_to_entity(book_data)
 
 
     async def get_by_id(self, book_id: int) -> Optional[BookEntity]:
         """Найти книгу по ID"""
         logger.info(f"Getting book by ID: {book_id}")
 
-        books_data: List[dict] = await self.storage.get_data()
+        book_data = await self.storage.get_by_id(book_id)
+        if book_data is None:
+            logger.warning(f"Book not found: {book_id}")
+            return None
 
-        # Ищем книгу с нужным ID
-        for book_data in books_data:
-            if book_data.get("id") == book_id:
-                logger.info(f"Found book: {book_data.get('title')}")
-                return self._dict_to_entity(book_data)
+        logger.info(f"Found book: {book_data.get('title')}")
+        return self._dict_to_entity(book_data)
 
-        logger.warning(f"Book not found: {book_id}")
-        return None
+
+    async def get_many(self, book_ids: List[int]) -> List[Optional[BookEntity]]:
+        """Найти книги по списку ID одним обращением к хранилищу; порядок и повторы ID как в запросе"""
+        logger.info(f"Getting {len(book_ids)} books by ID")
+
+        # Хранилище получает каждый ID один раз и может вернуть строки в любом порядке
+        found = {record["id"]: record for record in await self.storage.get_many(list(dict.fromkeys(book_ids)))}
+        entities = {book_id: self._dict_to_entity(record) for book_id, record in found.items()}
+
+        logger.info(f"Found {len(found)} of {len(book_ids)} requested books")
+        return [entities.get(book_id) for book_id in book_ids]
 
 
     async def create(self, book: BookEntity) -> BookEntity:
         """Создать новую книгу"""
         logger.info(f"Creating book: {book.title}")
 
-        books_data: List[dict] = await self.storage.get_data()
-
-        # Генерируем новый ID
-        book.id = self._generate_next_id(books_data)
-
-        # Конвертируем в dict и сохраняем
+        # ID назначает хранилище
         book_data = self._entity_to_dict(book)
-        books_data.append(book_data)
-        await self.storage.save_data(books_data)
+        book_data.pop("id", None)
+        try:
+            saved_data = await self.storage.insert(book_data)
+        except DuplicateRecordError as e:
+            # Дубликат находит индекс хранилища по ключу (название, автор) в рамках самой вставки
+            logger.warning(f"Duplicate book rejected by storage: {e}")
+            raise BookAlreadyExistsError(f"Book '{book.title}' by {book.author} already exists")
+        book.id = saved_data["id"]
 
         logger.info(f"Book created with ID: {book.id}")
         return book
 
 
+    async def create_many(self, books: List[BookEntity]) -> List[Optional[BookEntity]]:
+        """Создать пачку книг одной пакетной вставкой; на месте дубликата - None"""
+        logger.info(f"Creating {len(books)} books")
+
+        books_data = []
+        for book in books:
+            book_data = self._entity_to_dict(book)
+            book_data.pop("id", None)
+            books_data.append(book_data)
+        saved = await self.storage.insert_many(books_data)
+
+        created: List[Optional[BookEntity]] = []
+        for book, saved_data in zip(books, saved):
+            if saved_data is None:
+                created.append(None)
+                continue
+            book.id = saved_data["id"]
+            created.append(book)
+
+        logger.info(f"Created {sum(book is not None for book in created)} of {len(books)} books")
+        return created
+
+
+    async def upsert_many(self, books: List[BookEntity]) -> List[Optional[Tuple[BookEntity, bool]]]:
+        """Создать или заменить книги по ISBN одной операцией хранилища; на месте дубликата - None"""
+        logger.info(f"Upserting {len(books)} books by ISBN")
+
+        books_data = []
+        for book in books:
+            book_data = self._entity_to_dict(book)
+            # Обложка и темы не приходят с данными книги - у существующей книги они сохраняются
+            for field in ("id", "cover_url", "subjects"):
+                book_data.pop(field, None)
+            books_data.append(book_data)
+        saved = await self.storage.upsert_many(books_data)
+
+        upserted: List[Optional[Tuple[BookEntity, bool]]] = []
+        for change in saved:
+            if change is None:
+                upserted.append(None)
+                continue
+            saved_data, created = change
+            upserted.append((self._dict_to_entity(saved_data), created))
+
+        logger.info(f"Upserted {sum(change is not None for change in upserted)} of {len(books)} books")
+        return upserted
+
+
     async def update(self, book_id: int, book: BookEntity) -> Optional[BookEntity]:
         """Обновить данные книги"""
         logger.info(f"Updating book: {book_id}")
 
-        books_data: List[dict] = await self.storage.get_data()
-
-        # Ищем и обновляем книгу
-        for i, book_data in enumerate(books_data):
-            if book_data.get("id") == book_id:
-                book.id = book_id
-                books_data[i] = self._entity_to_dict(book)
-                await self.storage.save_data(books_data)
-                logger.info(f"Book updated: {book_id}")
-                return book
-
-        logger.warning(f"Book not found for update: {book_id}")
-        return None
+        book.id = book_id
+        try:
+            saved_data = await self.storage.update(book_id, self._entity_to_dict(book))
+        except DuplicateRecordError as e:
+            logger.warning(f"Duplicate book rejected by storage: {e}")
+            raise BookAlreadyExistsError(f"Book '{book.title}' by {book.author} already exists")
+        if saved_data is None:
+            logger.warning(f"Book not found for update: {book_id}")
+            return None
+
+        logger.info(f"Book updated: {book_id}")
+        return book
 
 
     async def delete(self, book_id: int) -> bool:
         """Удалить книгу"""
         logger.info(f"Deleting book: {book_id}")
 
-        books_data: List[dict] = await self.storage.get_data()
-        initial_count = len(books_data)
-
-        # Фильтруем книги (убираем с нужным ID)
-        books_data = [book for book in books_data if book.get("id") != book_id]
-
-        if len(books_data) < initial_count:
-            await self.storage.save_data(books_data)
+        if await self.storage.delete(book_id):
             logger.info(f"Book deleted: {book_id}")
             return True
 
@@ -107,12 +182,61 @@ class BookRepository(BookRepositoryInterface):
         return False
 
 
+    async def update_where(self, filters: BookFilters, changes: dict) -> int:
+        """Изменить все книги под фильтры одной операцией хранилища"""
+        logger.info(f"Updating books by filter: {sorted(changes)}")
+        affected = await self.storage.update_where(filters, changes)
+        logger.info(f"Books updated by filter: {affected}")
+        return affected
+
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удалить все книги под фильтры одной операцией хранилища"""
+        logger.info("Deleting books by filter")
+        affected = await self.storage.delete_where(filters)
+        logger.info(f"Books deleted by filter: {affected}")
+        return affected
+
+
     async def count_total(self, filters: BookFilters) -> int:
         """Подсчитать общее количество книг с учетом фильтров"""
-        books_data = await self.storage.get_data()
+        return await self.storage.count(filters)
+
+
+    async def get_page(self, filters: BookFilters) -> BookPage:
+        """
+        Получить страницу книг и общее количество под фильтры за один проход хранилища.
+        С курсором страница выбирается по ключу (sort_by, id), без OFFSET.
+        Запрашивается на одну запись больше limit, чтобы узнать, есть ли следующая страница.
+        """
+        logger.info(f"Getting page of books: offset={filters.offset}, limit={filters.limit}, "
+                    f"cursor={'yes' if filters.cursor else 'no'}")
+
+        after = decode_cursor(filters.cursor, filters.sort_by) if filters.cursor else None
+        books_data, total = await self.storage.query_page(
+            filters, offset=filters.offset, limit=filters.limit + 1, after=after)
+
+        has_more = len(books_data) > filters.limit
+        books_data = books_data[:filters.limit]
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(filters.sort_by, sort_key(books_data[-1], filters.sort_by))
+
         books = [self._dict_to_entity(book_data) for book_data in books_data]
-        filtered_books = self._apply_filters(books, filters)
-        return len(filtered_books)
+
+        logger.info(f"Returning {len(books)} books out of {total} filtered")
+        return BookPage(items=books, total=total, next_cursor=next_cursor)
+
+
+    async def search(self, query: BookSearchQuery) -> BookPage:
+        """Полнотекстовый поиск книг, результаты упорядочены по релевантности"""
+        logger.info(f"Searching books: q='{query.q}', offset={query.offset}, limit={query.limit}")
+
+        books_data, total = await self.storage.search(query.q, offset=query.offset, limit=query.limit)
+        books = [self._dict_to_entity(book_data) for book_data in books_data]
+
+        logger.info(f"Found {total} books, returning {len(books)}")
+        return BookPage(items=books, total=total)
 
 
     def _dict_to_entity(self, book_data: dict) -> BookEntity:  # конвертация словаря в доменную сущность
@@ -120,11 +244,11 @@ class BookRepository(BookRepositoryInterface):
         return BookEntity(
             id=book_data.get("id"),
             title=book_data.get("title", ""),
-            author=book_data.get("author", ""),
+            author=intern_value(book_data.get("author", "")),
             year_of_releasing=book_data.get("year_of_releasing", 0),
-            genre=book_data.get("genre", ""),
+            genre=intern_value(book_data.get("genre", "")),
             amount_of_pages=book_data.get("amount_of_pages", 0),
-            status=book_data.get("status", "available"),
+            status=intern_value(book_data.get("status", "available")),
             isbn=book_data.get("isbn"),
             cover_url=book_data.get("cover_url"),
             description=book_data.get("description"),
@@ -151,34 +275,3 @@ class BookRepository(BookRepositoryInterface):
             "created_at": book.created_at,
             "updated_at": book.updated_at
         }
-
-
-    def _apply_filters(self, books: List[BookEntity], filters: BookFilters) -> List[BookEntity]:
-        """Применяет фильтры к списку книг"""
-        filtered_books = books  # начинаем с полного списка
-
-        if filters.title:  # если указан фильтр по названию
-            filtered_books = [book for book in filtered_books if
-                              filters.title.lower() in book.title.lower()]
-
-        if filters.author:  # если указан фильтр по автору
-            filtered_books = [book for book in filtered_books if
-                              filters.author.lower() in book.author.lower()]
-
-        if filters.status:  # если указан фильтр по статусу
-            filtered_books = [book for book in filtered_books if
-                              book.status == filters.status.value]
-
-        if filters.genre:  # если указан фильтр по жанру
-            filtered_books = [book for book in filtered_books if
-                              filters.genre.lower() in book.genre.lower()]
-
-        return filtered_books  # возвращаем отфильтрованный список
-
-
-    def _generate_next_id(self, books_data: List[dict]) -> int:
-        """Генерирует следующий доступный ID"""
-        if not books_data:
-            return 1
-        max_id = max(book.get("id", 0) for book in books_data)
-        return max_id + 1
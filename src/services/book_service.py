@@ -1,15 +1,44 @@
-from typing import Optional
+import asyncio
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
+from pydantic import ValidationError
 from src.domain.entities import BookEntity
 from src.domain.repositories import BookRepositoryInterface
 from src.domain.metadata_service import MetadataService
-from src.models.book import Book, BookCreate, BookFilters, PaginatedBooks, BookUpdate
-from src.models.book import BookStatus
-from src.domain.exceptions import BookAlreadyExistsError, InvalidBookDataError, BookNotFoundError
+from src.models.book import Book, BookCreate, BookFilters, PaginatedBooks, BookUpdate, BookSearchQuery
+from src.models.book import BookStatus, BulkCreateResult, BulkItemResult, BulkItemStatus, ExportFormat
+from src.models.book import BookBulkUpdate, BulkChangeResult, BookBatchResult, BulkUpsertResult
+from src.domain.exceptions import InvalidBookDataError, BookNotFoundError, BookAlreadyExistsError
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Ограничение пакетной загрузки: больший каталог загружается несколькими запросами
+MAX_BULK_ITEMS = 10000
+
+# Ограничение пакетного получения по ID: список для страницы, а не выгрузка каталога
+MAX_BATCH_IDS = 1000
+
+# Одновременных запросов к сервису метаданных при обогащении пачки
+BULK_ENRICH_CONCURRENCY = 8
+
+# Поля BookFilters, задающие выборку; без хотя бы одного из них изменение по фильтру задело бы весь каталог
+SELECTION_FILTER_FIELDS = ("title", "author", "status", "genre", "year_min", "year_max", "pages_min", "pages_max")
+
+# Книг в одном фрагменте выгрузки: меньше фрагментов - меньше накладных расходов на запись в сокет
+EXPORT_CHUNK_BOOKS = 500
+
+def validate_publication_year(year: int) -> None:
+    """Проверка года издания (общая для создания книги, пакетной загрузки и загрузчика каталогов)"""
+    current_year = datetime.now(timezone.utc).year
+    if year > current_year:
+        raise InvalidBookDataError("Publication year cannot be in the future")
+    if year < 1400:
+        raise InvalidBookDataError("Publication year is too early")
+
+
 def entity_to_model(entity: BookEntity) -> Book:
     """Конвертация доменной сущности в API модель"""
     return Book(
@@ -73,6 +102,139 @@ class BookService:
         logger.info(f"Book created successfully with ID: {created_entity.id}")
         return entity_to_model(created_entity)
 
+    async def create_books(self, items: List[Any], enrich: bool = False) -> BulkCreateResult:
+        """
+        Пакетное создание книг: один проход валидации, одна пакетная вставка.
+        Невалидные книги и дубликаты не прерывают загрузку - они отражаются в результатах по позициям.
+        Обогащение метаданными выполняется только по запросу (enrich), иначе загрузка идет со скоростью хранилища.
+        """
+        logger.info(f"Creating {len(items)} books in bulk (enrich={enrich})")
+        results, positions, entities = self._validate_bulk_items(items)
+
+        if enrich and self.metadata_service and entities:
+            semaphore = asyncio.Semaphore(BULK_ENRICH_CONCURRENCY)
+
+            async def enrich_one(entity: BookEntity) -> None:
+                async with semaphore:
+                    await self._enrich_with_metadata(entity)
+
+            await asyncio.gather(*(enrich_one(entity) for entity in entities))
+
+        created = await self.book_repo.create_many(entities) if entities else []
+        for position, entity, created_entity in zip(positions, entities, created):
+            if created_entity is None:
+                results[position] = BulkItemResult(
+                    index=position, status=BulkItemStatus.DUPLICATE,
+                    error=(f"Book '{entity.title}' by {entity.author}"
+                           f"{f' or ISBN {entity.isbn}' if entity.isbn else ''} already exists"))
+            else:
+                results[position] = BulkItemResult(
+                    index=position, status=BulkItemStatus.CREATED, book=entity_to_model(created_entity))
+
+        counts = self._count_statuses(results)
+        logger.info(f"Bulk create finished: {counts[BulkItemStatus.CREATED]} created, "
+                    f"{counts[BulkItemStatus.DUPLICATE]} duplicates, {counts[BulkItemStatus.INVALID]} invalid")
+        return BulkCreateResult(
+            created=counts[BulkItemStatus.CREATED],
+            duplicates=counts[BulkItemStatus.DUPLICATE],
+            invalid=counts[BulkItemStatus.INVALID],
+            items=results
+        )
+
+    async def upsert_book_by_isbn(self, isbn: str, book_data: BookCreate) -> Tuple[Book, bool]:
+        """Создание или полная замена книги по ISBN одной операцией хранилища; возвращает книгу и признак создания"""
+        if book_data.isbn is not None and book_data.isbn != isbn:
+            raise InvalidBookDataError(f"ISBN in body ({book_data.isbn}) does not match ISBN in path ({isbn})")
+        validate_publication_year(book_data.year_of_releasing)
+        logger.info(f"Upserting book by ISBN {isbn}: {book_data.title} by {book_data.author}")
+
+        entity = model_to_entity(book_data)
+        entity.isbn = isbn
+        (change,) = await self.book_repo.upsert_many([entity])
+        if change is None:
+            raise BookAlreadyExistsError(f"Book '{entity.title}' by {entity.author} already exists")
+
+        saved_entity, created = change
+        logger.info(f"Book {'created' if created else 'updated'} by ISBN {isbn} with ID: {saved_entity.id}")
+        return entity_to_model(saved_entity), created
+
+    async def upsert_books(self, items: List[Any]) -> BulkUpsertResult:
+        """
+        Пакетный upsert по ISBN для синхронизации каталога: один проход валидации, одна операция хранилища.
+        У каждой книги должен быть ISBN, повтор ISBN в пачке - ошибка книги; метаданные не запрашиваются.
+        """
+        logger.info(f"Upserting {len(items)} books by ISBN")
+        results, positions, entities = self._validate_bulk_items(items)
+
+        seen: Dict[str, int] = {}
+        keep = []
+        for position, entity in zip(positions, entities):
+            if not entity.isbn:
+                error = "isbn: required for upsert by ISBN"
+            elif entity.isbn in seen:
+                error = f"isbn: repeats book {seen[entity.isbn]} of the batch"
+            else:
+                seen[entity.isbn] = position
+                keep.append((position, entity))
+                continue
+            results[position] = BulkItemResult(index=position, status=BulkItemStatus.INVALID, error=error)
+
+        upserted = await self.book_repo.upsert_many([entity for _, entity in keep]) if keep else []
+        for (position, entity), change in zip(keep, upserted):
+            if change is None:
+                results[position] = BulkItemResult(
+                    index=position, status=BulkItemStatus.DUPLICATE,
+                    error=f"Book '{entity.title}' by {entity.author} already exists")
+                continue
+            saved_entity, created = change
+            results[position] = BulkItemResult(
+                index=position, status=BulkItemStatus.CREATED if created else BulkItemStatus.UPDATED,
+                book=entity_to_model(saved_entity))
+
+        counts = self._count_statuses(results)
+        logger.info(f"Bulk upsert finished: {counts[BulkItemStatus.CREATED]} created, "
+                    f"{counts[BulkItemStatus.UPDATED]} updated, {counts[BulkItemStatus.DUPLICATE]} duplicates, "
+                    f"{counts[BulkItemStatus.INVALID]} invalid")
+        return BulkUpsertResult(
+            created=counts[BulkItemStatus.CREATED],
+            updated=counts[BulkItemStatus.UPDATED],
+            duplicates=counts[BulkItemStatus.DUPLICATE],
+            invalid=counts[BulkItemStatus.INVALID],
+            items=results
+        )
+
+    async def export_books(self, filters: BookFilters, export_format: ExportFormat) -> AsyncIterator[str]:
+        """
+        Выгрузка всех книг под фильтры (offset, limit и cursor не применяются) фрагментами текста
+        по EXPORT_CHUNK_BOOKS книг: NDJSON - книга на строку, CSV - заголовок и строки с полями Book.
+        Книги читаются из репозитория потоком, поэтому память не зависит от размера каталога.
+        """
+        logger.info(f"Exporting books as {export_format.value}: sort_by={filters.sort_by.value}")
+        columns = list(Book.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == ExportFormat.CSV:
+            writer.writerow(columns)
+
+        exported = 0
+        async for entity in self.book_repo.iter_all(filters):
+            book = entity_to_model(entity)
+            if export_format == ExportFormat.CSV:
+                row = book.model_dump(mode="json")
+                writer.writerow(["" if row[column] is None else row[column] for column in columns])
+            else:
+                buffer.write(book.model_dump_json())
+                buffer.write("\n")
+            exported += 1
+            if exported % EXPORT_CHUNK_BOOKS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+        logger.info(f"Exported {exported} books as {export_format.value}")
+
     async def get_book_by_id(self, book_id: int) -> Optional[Book]:
         """Получение книги по ID"""
         logger.info(f"Getting book by ID: {book_id}")
@@ -84,6 +246,23 @@ class BookService:
         logger.warning(f"Book not found: {book_id}")
         return None
 
+    async def get_books_by_ids(self, book_ids: List[int]) -> BookBatchResult:
+        """Получение книг по списку ID одним запросом к хранилищу, в порядке запроса и с явными промахами"""
+        if not book_ids:
+            raise InvalidBookDataError("At least one book ID is required")
+        if len(book_ids) > MAX_BATCH_IDS:
+            raise InvalidBookDataError(f"Too many book IDs: {len(book_ids)} > {MAX_BATCH_IDS}")
+        logger.info(f"Getting {len(book_ids)} books by ID")
+
+        entities = await self.book_repo.get_many(book_ids)
+        missing = [book_id for book_id, entity in zip(book_ids, entities) if entity is None]
+        if missing:
+            logger.warning(f"Books not found: {missing}")
+        return BookBatchResult(
+            items=[entity_to_model(entity) if entity else None for entity in entities],
+            missing=missing
+        )
+
     async def update_book(self, book_id: int, data: BookUpdate) -> Optional[Book]:
         """Обновление книги по ID"""
         logger.info(f"Updating book: {book_id}")
@@ -101,72 +280,128 @@ class BookService:
 
         existing_entity.updated_at = datetime.now(timezone.utc)
 
-        # Сохраняем изменения
+        # Сохраняем изменения; книгу могли удалить между чтением и записью
         updated_entity = await self.book_repo.update(book_id, existing_entity)
-        if updated_entity:
-            logger.info(f"Book updated successfully: {book_id}")
-            return entity_to_model(updated_entity)
+        if not updated_entity:
+            raise BookNotFoundError(f"Book with ID {book_id} not found")
 
-        return None
+        logger.info(f"Book updated successfully: {book_id}")
+        return entity_to_model(updated_entity)
 
     async def delete_book(self, book_id: int) -> bool:
         """Удаление книги по ID"""
         logger.info(f"Deleting book: {book_id}")
 
-        # Проверяем существование книги
-        existing_entity = await self.book_repo.get_by_id(book_id)
-        if not existing_entity:
+        # Удаление само сообщает, была ли книга - отдельное чтение перед ним не нужно
+        if not await self.book_repo.delete(book_id):
             raise BookNotFoundError(f"Book with ID {book_id} not found")
 
-        # Удаляем книгу
-        success = await self.book_repo.delete(book_id)
-        if success:
-            logger.info(f"Book deleted successfully: {book_id}")
-
-        return success
+        logger.info(f"Book deleted successfully: {book_id}")
+        return True
+
+    async def update_books_where(self, filters: BookFilters, data: BookBulkUpdate,
+                                 dry_run: bool = False) -> BulkChangeResult:
+        """Изменение всех книг под фильтры одной операцией хранилища; dry_run только считает их"""
+        self._require_selection(filters)
+        # null допустим только для описания - остальные поля книги обязательны
+        changes = {field: value for field, value in data.model_dump(mode="json", exclude_unset=True).items()
+                   if value is not None or field == "description"}
+        if not changes:
+            raise InvalidBookDataError("No fields to update")
+        logger.info(f"Updating books by filter: fields={sorted(changes)}, dry_run={dry_run}")
+
+        if dry_run:
+            return BulkChangeResult(affected=await self.book_repo.count_total(filters), dry_run=True)
+        changes["updated_at"] = datetime.now(timezone.utc)
+        return BulkChangeResult(affected=await self.book_repo.update_where(filters, changes))
+
+    async def delete_books_where(self, filters: BookFilters, dry_run: bool = False) -> BulkChangeResult:
+        """Удаление всех книг под фильтры одной операцией хранилища; dry_run только считает их"""
+        self._require_selection(filters)
+        logger.info(f"Deleting books by filter: dry_run={dry_run}")
+
+        if dry_run:
+            return BulkChangeResult(affected=await self.book_repo.count_total(filters), dry_run=True)
+        return BulkChangeResult(affected=await self.book_repo.delete_where(filters))
 
     async def get_filtered_books(self, filters: BookFilters) -> PaginatedBooks:
         """Получение книг с фильтрацией и пагинацией"""
         logger.info(f"Getting filtered books: offset={filters.offset}, limit={filters.limit}")
 
-        # Получаем книги из репозитория
-        entities = await self.book_repo.get_all(filters)
-        total_count = await self.book_repo.count_total(filters)
+        # Страница и общее количество - одним запросом к репозиторию
+        page = await self.book_repo.get_page(filters)
 
         # Конвертируем в API модели
-        books = [entity_to_model(entity) for entity in entities]
+        books = [entity_to_model(entity) for entity in page.items]
 
         # Создаем пагинированный ответ
         return PaginatedBooks.create(
             items=books,
-            total=total_count,
-            offset=filters.offset,
-            limit=filters.limit
+            total=page.total,
+            offset=0 if filters.cursor else filters.offset,
+            limit=filters.limit,
+            next_cursor=page.next_cursor,
+            has_next=page.next_cursor is not None
         )
 
-    async def _validate_book_creation(self, book_data: BookCreate) -> None:
-        """Валидация перед созданием книги"""
-        all_filters = BookFilters(
-            title=book_data.title,
-            author=book_data.author,
-            status=None,
-            genre=None,
-            offset=0,
-            limit=1
+    async def search_books(self, query: BookSearchQuery) -> PaginatedBooks:
+        """Полнотекстовый поиск книг с ранжированием по релевантности"""
+        logger.info(f"Searching books: q='{query.q}', offset={query.offset}, limit={query.limit}")
+
+        page = await self.book_repo.search(query)
+        books = [entity_to_model(entity) for entity in page.items]
+
+        return PaginatedBooks.create(
+            items=books,
+            total=page.total,
+            offset=query.offset,
+            limit=query.limit
         )
-        existing_books = await self.book_repo.get_all(all_filters)
-
-        for book in existing_books:
-            if (book.title.lower() == book_data.title.lower() and
-                    book.author.lower() == book_data.author.lower()):
-                raise BookAlreadyExistsError(f"Book '{book_data.title}' by {book_data.author} already exists")
-
-        # Проверяем год издания
-        current_year = datetime.now(timezone.utc).year
-        if book_data.year_of_releasing > current_year:
-            raise InvalidBookDataError("Publication year cannot be in the future")
-        if book_data.year_of_releasing < 1400:
-            raise InvalidBookDataError("Publication year is too early")
+
+    @staticmethod
+    def _validate_bulk_items(items: List[Any]) -> Tuple[List[Optional[BulkItemResult]], List[int], List[BookEntity]]:
+        """
+        Валидирует книги пакетного запроса: результаты с ошибками невалидных книг на их позициях,
+        позиции и сущности валидных книг
+        """
+        if len(items) > MAX_BULK_ITEMS:
+            raise InvalidBookDataError(f"Too many books in one request: {len(items)} > {MAX_BULK_ITEMS}")
+
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        positions: List[int] = []
+        entities: List[BookEntity] = []
+        for position, item in enumerate(items):
+            try:
+                book_data = BookCreate.model_validate(item)
+                validate_publication_year(book_data.year_of_releasing)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'book'}: {err['msg']}" for err in e.errors())
+                results[position] = BulkItemResult(index=position, status=BulkItemStatus.INVALID, error=error)
+                continue
+            except InvalidBookDataError as e:
+                results[position] = BulkItemResult(index=position, status=BulkItemStatus.INVALID, error=str(e))
+                continue
+            positions.append(position)
+            entities.append(model_to_entity(book_data))
+        return results, positions, entities
+
+    @staticmethod
+    def _count_statuses(results: List[BulkItemResult]) -> Dict[BulkItemStatus, int]:
+        """Число книг пакетного запроса по итогам"""
+        counts = {status: 0 for status in BulkItemStatus}
+        for result in results:
+            counts[result.status] += 1
+        return counts
+
+    @staticmethod
+    def _require_selection(filters: BookFilters) -> None:
+        """Изменение по фильтру требует хотя бы одного условия выборки"""
+        if all(getattr(filters, field) is None for field in SELECTION_FILTER_FIELDS):
+            raise InvalidBookDataError("At least one filter is required to change books by filter")
+
+    async def _validate_book_creation(self, book_data: BookCreate) -> None:
+        """Валидация перед созданием книги; дубликаты (название, автор) отклоняет индекс хранилища при вставке"""
+        validate_publication_year(book_data.year_of_releasing)
 
     async def _enrich_with_metadata(self, book_entity: BookEntity) -> None:
         try:
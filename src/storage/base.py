@@ -1,11 +1,24 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from src.models.book import BookFilters
+from src.storage.filtering import apply_filters, sort_and_page, sort_key
+from src.storage.search_index import BM25Index
+from src.core.exceptions import DuplicateRecordError
+
+
+def upsert_version(existing: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """Новая версия книги, найденной по ISBN: поля записи заменяют прежние, id и created_at сохраняются"""
+    return {**existing, **record, "id": existing["id"], "created_at": existing.get("created_at")}
 
 
 class StorageClient(ABC):
     """
     Абстрактный интерфейс для работы с хранилищами данных.
     Позволяет менять тип хранилища (PostgreSQL, файлы, память) без изменения кода.
+
+    Помимо полной выгрузки/перезаписи (get_data/save_data) определяет
+    операции над отдельными записями. Реализации по умолчанию построены
+    поверх get_data/save_data - хранилища, которые умеют лучше, переопределяют их.
     """
 
     @abstractmethod
@@ -17,3 +30,150 @@ class StorageClient(ABC):
     async def save_data(self, data: List[Dict[str, Any]]) -> None:
         """Сохраняет данные в хранилище"""
         pass
+
+    async def get_by_id(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Получает одну запись по ID"""
+        for record in await self.get_data():
+            if record.get("id") == record_id:
+                return record
+        return None
+
+    async def get_many(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """Получает записи по списку ID (отсутствующие ID пропускаются)"""
+        wanted = set(record_ids)
+        return [record for record in await self.get_data() if record.get("id") in wanted]
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет новую запись, назначая ей ID, и возвращает сохраненную запись"""
+        data = await self.get_data()
+        new_record = dict(record)
+        new_record["id"] = max((item.get("id", 0) for item in data), default=0) + 1
+        data.append(new_record)
+        await self.save_data(data)
+        return new_record
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Добавляет пачку записей и возвращает сохраненные записи в том же порядке;
+        на месте дубликата (по ключу название + автор, в том числе внутри пачки) - None.
+        Реализация по умолчанию вставляет по одной; хранилища переопределяют ее одной записью на пачку.
+        """
+        inserted: List[Optional[Dict[str, Any]]] = []
+        for record in records:
+            try:
+                inserted.append(await self.insert(record))
+            except DuplicateRecordError:
+                inserted.append(None)
+        return inserted
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """
+        Добавляет или заменяет записи по ISBN (у каждой записи он задан и не повторяется в пачке).
+        Возвращает в порядке записей пары (сохраненная запись, создана ли она); на месте записи,
+        которая стала бы дубликатом другой книги по названию и автору, - None.
+        Реализация по умолчанию - один проход по данным и запись по одной; хранилища переопределяют ее.
+        """
+        by_isbn = {record["isbn"]: record for record in await self.get_data() if record.get("isbn")}
+        upserted: List[Optional[Tuple[Dict[str, Any], bool]]] = []
+        for record in records:
+            existing = by_isbn.get(record["isbn"])
+            try:
+                if existing is None:
+                    saved, created = await self.insert(record), True
+                else:
+                    saved, created = await self.update(existing["id"], upsert_version(existing, record)), False
+            except DuplicateRecordError:
+                upserted.append(None)
+                continue
+            by_isbn[record["isbn"]] = saved
+            upserted.append((saved, created))
+        return upserted
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет запись с указанным ID, возвращает None если записи нет"""
+        data = await self.get_data()
+        for i, item in enumerate(data):
+            if item.get("id") == record_id:
+                data[i] = {**record, "id": record_id}
+                await self.save_data(data)
+                return data[i]
+        return None
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет запись по ID, возвращает True если запись была удалена"""
+        data = await self.get_data()
+        remaining = [item for item in data if item.get("id") != record_id]
+        if len(remaining) == len(data):
+            return False
+        await self.save_data(remaining)
+        return True
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """
+        Применяет изменения (поле -> значение) ко всем записям под фильтры (offset/limit не применяются)
+        и возвращает число измененных записей. Реализация по умолчанию - одна перезапись данных.
+        """
+        data = await self.get_data()
+        matched = {id(record) for record in apply_filters(data, filters)}
+        if not matched:
+            return 0
+        data = [{**record, **changes} if id(record) in matched else record for record in data]
+        await self.save_data(data)
+        return len(matched)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все записи под фильтры и возвращает их число; по умолчанию - одна перезапись данных"""
+        data = await self.get_data()
+        matched = {id(record) for record in apply_filters(data, filters)}
+        if not matched:
+            return 0
+        await self.save_data([record for record in data if id(record) not in matched])
+        return len(matched)
+
+    async def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Возвращает записи, подходящие под фильтры, в порядке (filters.sort_by, id).
+        after - ключ keyset пагинации (значение сортировки, id): страница начинается
+        сразу после него, offset при этом не применяется.
+        """
+        page, _ = sort_and_page(await self.get_data(), filters, offset, limit, after)
+        return page
+
+    async def iter_records(self, filters: BookFilters, chunk_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Все записи под фильтры в порядке (filters.sort_by, id) без offset/limit - для выгрузки каталога.
+        Реализация по умолчанию читает keyset страницами по chunk_size, так что одновременно
+        в памяти не больше одной страницы; SQL хранилища переопределяют ее серверным курсором.
+        """
+        after = None
+        while True:
+            page = await self.query(filters, limit=chunk_size, after=after)
+            for record in page:
+                yield record
+            if len(page) < chunk_size:
+                return
+            after = sort_key(page[-1], filters.sort_by)
+
+    async def count(self, filters: BookFilters) -> int:
+        """Подсчитывает количество записей, подходящих под фильтры"""
+        return len(apply_filters(await self.get_data(), filters))
+
+    async def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу записей (как query) и общее количество подходящих записей за один проход"""
+        return sort_and_page(await self.get_data(), filters, offset, limit, after)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Полнотекстовый поиск по названию, автору и описанию.
+        Возвращает страницу записей по убыванию релевантности и общее число найденных записей.
+        Реализация по умолчанию строит временный индекс BM25 по всем данным.
+        """
+        data = await self.get_data()
+        index = BM25Index()
+        for record in data:
+            index.add(record.get("id"), record)
+        hits, total = index.search(query, offset, limit)
+        by_id = {record.get("id"): record for record in data}
+        return [by_id[record_id] for record_id, _ in hits], total
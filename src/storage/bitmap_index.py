@@ -0,0 +1,102 @@
+"""Битовые индексы категориальных полей (status, genre) на Python int"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def iter_bits(bitmap: int, start: int = 0) -> Iterator[int]:
+    """Номера установленных битов по возрастанию, начиная с start"""
+    if start >= bitmap.bit_length():
+        return
+    # Сдвиг кратен байту, биты до start в первом байте сбрасываются маской
+    aligned = start - start % 8
+    data = bytearray((bitmap >> aligned).to_bytes((bitmap.bit_length() - aligned + 7) // 8, "little"))
+    data[0] &= 0xFF << (start - aligned) & 0xFF
+    for position, byte in enumerate(data):
+        if byte:
+            base = aligned + position * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+def bit_membership(bitmap: int) -> Callable[[int], bool]:
+    """Проверка бита за O(1): сдвиг большого int копирует его целиком, поэтому проверяем по байтам"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    size = len(data)
+
+    def contains(position: int) -> bool:
+        index = position >> 3
+        return 0 <= index < size and bool(data[index] >> (position & 7) & 1)
+
+    return contains
+
+
+class BitmapIndex:
+    """
+    Битовая карта на каждое значение поля: бит с номером id записи установлен, если у записи это значение.
+    Пересечение фильтров - AND карт, количество - bit_count(), без обхода записей.
+    Размер карты - порядка max(id) / 8 байт, поэтому индекс рассчитан на поля с небольшим числом значений:
+    если значений становится больше max_values, индекс отключается до следующей полной загрузки.
+    """
+
+    def __init__(self, normalize: Callable[[Optional[str]], str] = lambda value: value, max_values: int = 256):
+        self.normalize = normalize
+        self.max_values = max_values
+        self.enabled = True
+        self._bitmaps: Dict[str, int] = {}
+
+    def load(self, pairs: Iterable[Tuple[int, Optional[str]]]) -> None:
+        """Строит карты заново по парам (id, значение)"""
+        ids_by_value: Dict[str, List[int]] = {}
+        for record_id, value in pairs:
+            ids_by_value.setdefault(self.normalize(value), []).append(record_id)
+        self._bitmaps = {}
+        self.enabled = len(ids_by_value) <= self.max_values
+        if not self.enabled:
+            return
+        for value, record_ids in ids_by_value.items():
+            # Карта собирается в bytearray: побитовое OR на int копировало бы всю карту на каждую запись
+            data = bytearray(max(record_ids) // 8 + 1)
+            for record_id in record_ids:
+                data[record_id >> 3] |= 1 << (record_id & 7)
+            self._bitmaps[value] = int.from_bytes(data, "little")
+
+    def add(self, record_id: int, value: Optional[str]) -> None:
+        """Устанавливает бит записи в карте значения"""
+        if not self.enabled:
+            return
+        key = self.normalize(value)
+        if key not in self._bitmaps and len(self._bitmaps) >= self.max_values:
+            self.enabled = False
+            self._bitmaps = {}
+            return
+        self._bitmaps[key] = self._bitmaps.get(key, 0) | (1 << record_id)
+
+    def remove(self, record_id: int, value: Optional[str]) -> None:
+        """Сбрасывает бит записи в карте значения"""
+        if not self.enabled:
+            return
+        key = self.normalize(value)
+        bitmap = self._bitmaps.get(key, 0) & ~(1 << record_id)
+        if bitmap:
+            self._bitmaps[key] = bitmap
+        else:
+            self._bitmaps.pop(key, None)
+
+    def get(self, value: Optional[str]) -> Optional[int]:
+        """Карта записей с точным значением; None, если индекс отключен"""
+        if not self.enabled:
+            return None
+        return self._bitmaps.get(self.normalize(value), 0)
+
+    def containing(self, substring: str) -> Optional[int]:
+        """OR карт всех значений, содержащих подстроку (значения нормализуются тем же способом); None, если индекс отключен"""
+        if not self.enabled:
+            return None
+        needle = self.normalize(substring)
+        bitmap = 0
+        for value, value_bitmap in self._bitmaps.items():
+            if needle in value:
+                bitmap |= value_bitmap
+        return bitmap
@@ -0,0 +1,139 @@
+"""Кодеки сериализации записей для файловых и HTTP хранилищ"""
+import gc
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Поля записи с datetime: JSON хранит их строкой ISO 8601, при чтении они восстанавливаются
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def restore_datetimes(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Превращает ISO строки в полях DATETIME_FIELDS обратно в datetime (на месте)"""
+    for record in records:
+        for field in DATETIME_FIELDS:
+            value = record.get(field)
+            if isinstance(value, str):
+                record[field] = datetime.fromisoformat(value)
+    return records
+
+
+@contextmanager
+def _gc_paused():
+    """Отключает циклический сборщик мусора: разбор сотен тысяч словарей иначе запускает его десятки раз"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Codec(ABC):
+    """Кодек: превращает значение в байты и обратно"""
+
+    name: str = ""
+    binary: bool = False  # True - результат не JSON (не подходит для JSONBin и строк журнала)
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Сериализует значение"""
+        pass
+
+    @abstractmethod
+    def loads(self, content: bytes) -> Any:
+        """Разбирает сериализованное значение"""
+        pass
+
+    def encode_records(self, records: List[Dict[str, Any]]) -> bytes:
+        """Сериализует список записей"""
+        return self.dumps(records)
+
+    def decode_records(self, content: bytes) -> List[Dict[str, Any]]:
+        """Разбирает список записей, восстанавливая datetime"""
+        with _gc_paused():
+            return restore_datetimes(self.loads(content))
+
+
+def _json_default(value: Any) -> Any:
+    """Сериализация типов, которых не знает стандартный json"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonCodec(Codec):
+    """Компактный JSON на стандартной библиотеке"""
+
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+    def loads(self, content: bytes) -> Any:
+        return json.loads(content)
+
+
+class OrjsonCodec(Codec):
+    """JSON через orjson: datetime сериализуется нативно в RFC 3339"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def loads(self, content: bytes) -> Any:
+        return self._orjson.loads(content)
+
+
+class MsgpackCodec(Codec):
+    """
+    Бинарный msgpack: datetime пишется расширением Timestamp и читается обратно как datetime в UTC.
+    Наивные datetime считаются временем в UTC.
+    """
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, datetime=True, default=self._default)
+
+    def loads(self, content: bytes) -> Any:
+        return self._msgpack.unpackb(content, timestamp=3, strict_map_key=False)
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+_CODECS = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Создает кодек по имени (по умолчанию - из переменной окружения STORAGE_CODEC)"""
+    name = name or os.getenv("STORAGE_CODEC", JsonCodec.name)
+    codec_class = _CODECS.get(name)
+    if codec_class is None:
+        raise ValueError(f"Unknown storage codec: {name}")
+    try:
+        return codec_class()
+    except ImportError as e:
+        raise ValueError(f"Storage codec '{name}' requires an optional package: {e}")
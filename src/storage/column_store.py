@@ -0,0 +1,353 @@
+"""Колоночное хранилище записей в памяти на массивах NumPy с векторными фильтрами"""
+from bisect import bisect_left, bisect_right, insort
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import numpy as np
+from src.models.book import BookFilters, BookSortField
+from src.storage.filtering import sort_key, range_bounds
+from src.storage.search_index import BM25Index
+from src.storage.ngram_index import TrigramIndex
+from src.storage.interning import intern_value
+from src.storage.duplicates import DuplicateKeys, IsbnIndex
+
+# Колонки, которые хранятся отдельно от прочих полей записи
+_NUMERIC_FIELDS = ("year_of_releasing", "amount_of_pages")
+_COLUMN_FIELDS = ("id", "title", "author", "genre", "status") + _NUMERIC_FIELDS
+
+# Если фильтры оставили больше этой доли записей, сортировка по title идет проходом по готовому порядку
+_CANDIDATE_SORT_RATIO = 0.25
+
+_MIN_CAPACITY = 1024
+
+
+class _Dictionary:
+    """Словарное кодирование категориального поля: значение <-> небольшой целочисленный код"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value: Optional[str]) -> Optional[int]:
+        return self._codes.get(value)
+
+
+class ColumnStore:
+    """
+    Записи по колонкам: id, год и число страниц - массивы NumPy, статус и жанр - массивы кодов словаря,
+    title/author - списки строк с триграммными индексами, остальные поля - словарь на строку.
+    Фильтры по статусу, жанру, диапазоны года и числа страниц и подсчет количества - векторные булевы маски,
+    словари записей собираются только для строк возвращаемой страницы. Удаление помечает строку мертвой;
+    когда мертвых строк больше живых, колонки пересобираются.
+    API совпадает с RecordIndex.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self.load(records)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Полностью заменяет содержимое"""
+        records = sorted(records, key=lambda record: record.get("id"))
+        capacity = max(len(records), _MIN_CAPACITY)
+        self._size = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._years = np.zeros(capacity, dtype=np.int32)
+        self._pages = np.zeros(capacity, dtype=np.int32)
+        self._years_filled = np.zeros(capacity, dtype=bool)  # False - значение не поместилось в колонку (None)
+        self._pages_filled = np.zeros(capacity, dtype=bool)
+        self._status_codes = np.zeros(capacity, dtype=np.int16)
+        self._genre_codes = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._statuses = _Dictionary()
+        self._genres = _Dictionary()
+        self._titles: List[Optional[str]] = []
+        self._authors: List[Optional[str]] = []
+        self._extras: List[Optional[Dict[str, Any]]] = []  # поля вне колонок и непредставимые значения колонок
+        self._rows: Dict[int, int] = {}  # id -> номер строки
+        self._max_id = 0  # максимальный ID живых строк: строки идут по возрастанию id
+        self._title_order: List[Tuple[Any, int]] = []
+        self._search = BM25Index()
+        self._text_indexes = {"title": TrigramIndex(), "author": TrigramIndex()}  # по номерам строк
+        self._keys = DuplicateKeys()
+        self._isbns = IsbnIndex()
+        for record in records:
+            self._append(dict(record))
+        self._title_order.sort()
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Возвращает все записи в порядке id"""
+        return [self._record(row) for row in np.flatnonzero(self._alive[:self._size])]
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Возвращает запись по ID или None"""
+        row = self._rows.get(record_id)
+        return self._record(row) if row is not None else None
+
+    def get_many(self, record_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Возвращает найденные записи в порядке запрошенных ID"""
+        return [self._record(self._rows[record_id]) for record_id in record_ids if record_id in self._rows]
+
+    def find_isbn(self, isbn: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Возвращает запись с этим ISBN или None"""
+        record_id = self._isbns.find(isbn)
+        return self._record(self._rows[record_id]) if record_id is not None else None
+
+    def next_id(self) -> int:
+        """Вычисляет следующий свободный ID"""
+        return self._max_id + 1
+
+    def insert(self, record: Dict[str, Any], record_id: Optional[int] = None) -> Dict[str, Any]:
+        """Добавляет запись с ID от аллокатора хранилища или следующим за максимальным"""
+        new_record = {**record, "id": record_id if record_id is not None else self.next_id()}
+        self._keys.check(new_record)
+        self._isbns.check(new_record)
+        self.put(new_record)
+        return dict(new_record)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        """Кладет запись с ее собственным ID, заменяя прежнюю версию"""
+        if record["id"] in self._rows:
+            self.update(record["id"], record)
+        elif record["id"] > self._max_id:
+            self._append(dict(record), keep_title_order=True)
+        else:
+            # Строки упорядочены по id - запись из середины требует пересборки
+            self.load(self.all() + [record])
+
+    def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет существующую запись на месте, возвращает None если записи нет"""
+        row = self._rows.get(record_id)
+        if row is None:
+            return None
+        new_record = {**record, "id": record_id}
+        self._keys.check(new_record, record_id)
+        self._isbns.check(new_record, record_id)
+        self._unindex(row)
+        self._write_row(row, new_record)
+        self._index(row, new_record, keep_title_order=True)
+        return dict(new_record)
+
+    def delete(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Удаляет запись и возвращает ее, либо None если записи нет"""
+        row = self._rows.get(record_id)
+        if row is None:
+            return None
+        record = self._record(row)
+        self._unindex(row)
+        del self._rows[record_id]
+        self._alive[row] = False
+        self._extras[row] = None
+        if record_id == self._max_id:
+            # Новый максимум - последняя живая строка перед удаленной
+            while row > 0 and not self._alive[row - 1]:
+                row -= 1
+            self._max_id = int(self._ids[row - 1]) if row > 0 else 0
+        if self._size > _MIN_CAPACITY and self._size - len(self._rows) > len(self._rows):
+            self.load(self.all())
+        return record
+
+    def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+              after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу записей под фильтры"""
+        mask = self._mask(filters)
+        return [self._record(row) for row in self._page_rows(mask, filters.sort_by, offset, limit, after)]
+
+    def count(self, filters: BookFilters) -> int:
+        """Подсчитывает записи под фильтры суммой булевой маски"""
+        return int(np.count_nonzero(self._mask(filters)))
+
+    def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                   after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу и общее число совпадений по одной маске"""
+        mask = self._mask(filters)
+        rows = self._page_rows(mask, filters.sort_by, offset, limit, after)
+        return [self._record(row) for row in rows], int(np.count_nonzero(mask))
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск: страница записей по убыванию релевантности и общее число найденных"""
+        hits, total = self._search.search(query, offset, limit)
+        return [self._record(self._rows[record_id]) for record_id, _ in hits], total
+
+    def _mask(self, filters: BookFilters) -> np.ndarray:
+        """Булева маска живых строк, подходящих под фильтры"""
+        size = self._size
+        mask = self._alive[:size].copy()
+
+        if filters.status:
+            code = self._statuses.code(filters.status.value)
+            if code is None:
+                return np.zeros(size, dtype=bool)
+            mask &= self._status_codes[:size] == code
+
+        if filters.genre:
+            # Подстрока проверяется по словарю жанров (их единицы), строки отбираются по кодам
+            needle = filters.genre.lower()
+            codes = [code for code, genre in enumerate(self._genres.values) if needle in (genre or "").lower()]
+            mask &= np.isin(self._genre_codes[:size], codes)
+
+        for field, low, high in range_bounds(filters):
+            column, filled = self._numeric_column(field)
+            mask &= filled[:size]
+            if low is not None:
+                mask &= column[:size] >= low
+            if high is not None:
+                mask &= column[:size] <= high
+
+        for field, text_index in self._text_indexes.items():
+            substring = getattr(filters, field)
+            if not substring:
+                continue
+            matched = np.zeros(size, dtype=bool)
+            rows = text_index.search(substring)
+            if rows:
+                matched[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            mask &= matched
+
+        return mask
+
+    def _page_rows(self, mask: np.ndarray, sort_by: BookSortField, offset: int, limit: Optional[int],
+                   after: Optional[Tuple[Any, int]]) -> List[int]:
+        """Номера строк страницы в порядке сортировки (sort_by, id)"""
+        if after is not None:
+            offset = 0
+        end = None if limit is None else offset + limit
+
+        if sort_by == BookSortField.ID:
+            # Строки хранятся в порядке id
+            rows = np.flatnonzero(mask)
+            if after is not None:
+                rows = rows[np.searchsorted(self._ids[rows], after[1], side="right"):]
+            return rows[offset:end].tolist()
+
+        if sort_by == BookSortField.YEAR_OF_RELEASING:
+            # Составной ключ (год, id) в одном int64 - keyset условие и частичная сортировка векторные
+            rows = np.flatnonzero(mask)
+            keys = (self._years[rows].astype(np.int64) << 32) + self._ids[rows]
+            if after is not None:
+                selected = keys > (int(after[0]) << 32) + int(after[1])
+                rows, keys = rows[selected], keys[selected]
+            if end is not None and end < len(keys):
+                top = np.argpartition(keys, end - 1)[:end]
+                rows, keys = rows[top], keys[top]
+            return rows[np.argsort(keys, kind="stable")][offset:end].tolist()
+
+        matched = int(np.count_nonzero(mask))
+        if matched <= self._size * _CANDIDATE_SORT_RATIO:
+            keys = sorted(self._title_key(row) for row in np.flatnonzero(mask).tolist())
+            start = bisect_right(keys, after) if after is not None else 0
+            return [self._rows[record_id] for _, record_id in keys[start:]][offset:end]
+
+        page = []
+        start = bisect_right(self._title_order, after) if after is not None else 0
+        for position in range(start, len(self._title_order)):
+            row = self._rows[self._title_order[position][1]]
+            if not mask[row]:
+                continue
+            page.append(row)
+            if end is not None and len(page) >= end:
+                break
+        return page[offset:]
+
+    def _title_key(self, row: int) -> Tuple[Any, int]:
+        title = self._titles[row]
+        return (title if title is not None else ""), int(self._ids[row])
+
+    def _record(self, row: int) -> Dict[str, Any]:
+        """Собирает словарь записи из колонок строки"""
+        record = {
+            "id": int(self._ids[row]),
+            "title": self._titles[row],
+            "author": self._authors[row],
+            "genre": self._genres.values[self._genre_codes[row]],
+            "status": self._statuses.values[self._status_codes[row]],
+            "year_of_releasing": int(self._years[row]),
+            "amount_of_pages": int(self._pages[row]),
+        }
+        record.update(self._extras[row])
+        return record
+
+    def _append(self, record: Dict[str, Any], keep_title_order: bool = False) -> None:
+        """Добавляет строку в конец колонок"""
+        if self._size == len(self._ids):
+            self._grow()
+        row = self._size
+        self._size += 1
+        self._titles.append(None)
+        self._authors.append(None)
+        self._extras.append(None)
+        self._write_row(row, record)
+        self._alive[row] = True
+        self._max_id = max(self._max_id, record["id"])
+        self._index(row, record, keep_title_order)
+
+    def _write_row(self, row: int, record: Dict[str, Any]) -> None:
+        """Раскладывает запись по колонкам строки"""
+        self._ids[row] = record["id"]
+        self._titles[row] = record.get("title")
+        self._authors[row] = intern_value(record.get("author"))
+        self._genre_codes[row] = self._genres.encode(record.get("genre"))
+        self._status_codes[row] = self._statuses.encode(record.get("status", "available"))
+        extras = {key: value for key, value in record.items() if key not in _COLUMN_FIELDS}
+        for field in _NUMERIC_FIELDS:
+            column, filled = self._numeric_column(field)
+            value = record.get(field)
+            filled[row] = isinstance(value, int) and -2**31 <= value < 2**31
+            if filled[row]:
+                column[row] = value
+            else:
+                # Значение не помещается в колонку (None, отсутствует): в колонке 0, как у ключа сортировки,
+                # а исходное значение хранится вместе с прочими полями
+                column[row] = 0
+                extras[field] = value
+        self._extras[row] = extras
+
+    def _index(self, row: int, record: Dict[str, Any], keep_title_order: bool) -> None:
+        """Добавляет строку в словарь id, порядок по title, поисковый и триграммные индексы"""
+        self._rows[record["id"]] = row
+        self._keys.add(record)
+        self._isbns.add(record)
+        key = sort_key(record, BookSortField.TITLE)
+        if keep_title_order:
+            insort(self._title_order, key)
+        else:
+            self._title_order.append(key)
+        self._search.add(record["id"], record)
+        for field, text_index in self._text_indexes.items():
+            text_index.add(row, record.get(field) or "")
+
+    def _unindex(self, row: int) -> None:
+        """Убирает строку из индексов (колонки не трогает)"""
+        record_id = int(self._ids[row])
+        self._keys.remove({"id": record_id, "title": self._titles[row], "author": self._authors[row]})
+        self._isbns.remove({"id": record_id, "isbn": self._extras[row].get("isbn")})
+        key = self._title_key(row)
+        position = bisect_left(self._title_order, key)
+        if position < len(self._title_order) and self._title_order[position] == key:
+            del self._title_order[position]
+        self._search.remove(record_id)
+        self._text_indexes["title"].remove(row, self._titles[row] or "")
+        self._text_indexes["author"].remove(row, self._authors[row] or "")
+
+    def _numeric_column(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Колонка числового поля и маска заполненных значений"""
+        if field == "year_of_releasing":
+            return self._years, self._years_filled
+        return self._pages, self._pages_filled
+
+    def _grow(self) -> None:
+        """Увеличивает емкость массивов в полтора раза"""
+        capacity = max(int(len(self._ids) * 1.5), _MIN_CAPACITY)
+        for name in ("_ids", "_years", "_pages", "_years_filled", "_pages_filled", "_status_codes", "_genre_codes",
+                     "_alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
@@ -0,0 +1,323 @@
+"""
+Бинарный колоночный формат каталога для чтения через mmap.
+
+Файл: MAGIC, длина заголовка (uint32), JSON заголовок, затем секции, выровненные по 8 байт:
+- числовые колонки фиксированной ширины: id (int64, по возрастанию - он же индекс по ID),
+  year_of_releasing и amount_of_pages (int32, пустое значение - 0 и признак NULL (uint8)),
+  код статуса (uint8, словарь статусов в заголовке);
+- строковые колонки: смещения (int64, rows + 1), признак NULL (uint8) и UTF-8 данные подряд;
+- перестановки строк в порядке сортировки по title и по year_of_releasing и в порядке amount_of_pages (int32);
+  по ним же бинарным поиском отвечают фильтры-диапазоны.
+Чтение не разбирает файл целиком: фильтры и поиск по ID затрагивают только нужные колонки.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from src.models.book import BookFilters, BookSortField
+from src.storage.filtering import sort_key, range_bounds
+from src.storage.file_storage import atomic_write
+
+MAGIC = b"LIBCOL01"
+_ALIGN = 8
+
+# Строковые колонки и способ хранения значения: text - как есть, json - JSON строкой, datetime - ISO 8601
+STRING_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("title", "text"),
+    ("author", "text"),
+    ("genre", "text"),
+    ("isbn", "text"),
+    ("cover_url", "text"),
+    ("description", "text"),
+    ("subjects", "json"),
+    ("created_at", "datetime"),
+    ("updated_at", "datetime"),
+)
+
+# Поля сортировки, для которых хранится перестановка строк (по id строки уже упорядочены)
+ORDERED_FIELDS = (BookSortField.TITLE, BookSortField.YEAR_OF_RELEASING)
+
+# Числовые колонки int32 с признаком NULL
+NUMERIC_COLUMNS = ("year_of_releasing", "amount_of_pages")
+
+# Числовые колонки фильтров-диапазонов; для year_of_releasing используется перестановка сортировки
+RANGE_ORDERED_FIELDS = ("amount_of_pages",)
+
+_STRING_KINDS = dict(STRING_COLUMNS)
+
+
+def _encode_string(value: Any, kind: str) -> bytes:
+    """Сериализует значение строковой колонки"""
+    if kind == "json":
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if kind == "datetime" and isinstance(value, datetime):
+        return value.isoformat().encode("utf-8")
+    return str(value).encode("utf-8")
+
+
+def _decode_string(raw: bytes, kind: str) -> Any:
+    """Разбирает значение строковой колонки"""
+    text = raw.decode("utf-8")
+    if kind == "json":
+        return json.loads(text)
+    if kind == "datetime":
+        return datetime.fromisoformat(text)
+    return text
+
+
+def write_columnar(path: str, records: List[Dict[str, Any]]) -> None:
+    """Записывает записи в колоночный файл атомарно (временный файл + fsync + rename)"""
+    records = sorted(records, key=lambda record: record["id"])
+    body = bytearray()
+    sections: Dict[str, List[Any]] = {}
+
+    def add_section(name: str, data: bytes, typecode: str) -> None:
+        body.extend(b"\0" * (-len(body) % _ALIGN))
+        sections[name] = [len(body), len(data), typecode]
+        body.extend(data)
+
+    add_section("id", array("q", (record["id"] for record in records)).tobytes(), "q")
+    for field in NUMERIC_COLUMNS:
+        add_section(field, array("i", (record.get(field) or 0 for record in records)).tobytes(), "i")
+        add_section(f"{field}.nulls", bytes(record.get(field) is None for record in records), "B")
+
+    statuses = list(dict.fromkeys(record.get("status", "available") for record in records))
+    status_codes = {status: code for code, status in enumerate(statuses)}
+    add_section("status", bytes(status_codes[record.get("status", "available")] for record in records), "B")
+
+    for field, kind in STRING_COLUMNS:
+        offsets = array("q", [0])
+        nulls = bytearray(len(records))
+        data = bytearray()
+        for row, record in enumerate(records):
+            value = record.get(field)
+            if value is None:
+                nulls[row] = 1
+            else:
+                data.extend(_encode_string(value, kind))
+            offsets.append(len(data))
+        add_section(f"{field}.offsets", offsets.tobytes(), "q")
+        add_section(f"{field}.nulls", bytes(nulls), "B")
+        add_section(f"{field}.data", bytes(data), "B")
+
+    for field in ORDERED_FIELDS:
+        order = sorted(range(len(records)), key=lambda row: sort_key(records[row], field))
+        add_section(f"order.{field.value}", array("i", order).tobytes(), "i")
+    for field in RANGE_ORDERED_FIELDS:
+        order = sorted(range(len(records)), key=lambda row: (records[row].get(field) or 0, records[row]["id"]))
+        add_section(f"order.{field}", array("i", order).tobytes(), "i")
+
+    header = json.dumps({
+        "version": 1,
+        "rows": len(records),
+        "max_id": records[-1]["id"] if records else 0,
+        "statuses": statuses,
+        "sections": sections,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % _ALIGN)
+    atomic_write(path, prefix + bytes(body))
+
+
+class ColumnarSegment:
+    """
+    Колоночный файл, открытый через mmap (только чтение).
+    Колонки - представления memoryview поверх отображенного файла без копирования,
+    строки декодируются только для запрошенных записей.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.max_id = 0
+        self._rows = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._base = 0
+        self._sections: Dict[str, List[Any]] = {}
+        self._columns: Dict[str, memoryview] = {}
+        self._statuses: List[Optional[str]] = []
+        if path is not None and os.path.exists(path) and os.path.getsize(path) > 0:
+            self._open(path)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _open(self, path: str) -> None:
+        """Отображает файл в память и разбирает заголовок"""
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a columnar catalog file")
+        (header_length,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        self._base = header_start + header_length + (-(header_start + header_length) % _ALIGN)
+        self._rows = header["rows"]
+        self.max_id = header["max_id"]
+        self._statuses = header["statuses"]
+        self._sections = header["sections"]
+        view = memoryview(self._mmap)
+        for name, (offset, length, typecode) in self._sections.items():
+            start = self._base + offset
+            self._columns[name] = view[start:start + length].cast(typecode)
+
+    def id_at(self, row: int) -> int:
+        """ID записи в строке row"""
+        return self._columns["id"][row]
+
+    def find(self, record_id: int) -> Optional[int]:
+        """Номер строки записи по ID (бинарный поиск по колонке id) или None"""
+        if not self._rows:
+            return None
+        ids = self._columns["id"]
+        row = bisect_left(ids, record_id)
+        return row if row < self._rows and ids[row] == record_id else None
+
+    def value(self, field: str, row: int) -> Any:
+        """Значение одного поля записи"""
+        if field == "id":
+            return self._columns[field][row]
+        if field in NUMERIC_COLUMNS:
+            return None if self._is_null(field, row) else self._columns[field][row]
+        if field == "status":
+            return self._statuses[self._columns["status"][row]]
+        if self._columns[f"{field}.nulls"][row]:
+            return None
+        offsets = self._columns[f"{field}.offsets"]
+        start = self._base + self._sections[f"{field}.data"][0]
+        return _decode_string(self._mmap[start + offsets[row]:start + offsets[row + 1]], _STRING_KINDS[field])
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Собирает запись целиком"""
+        record = {
+            "id": self.value("id", row),
+            "year_of_releasing": self.value("year_of_releasing", row),
+            "amount_of_pages": self.value("amount_of_pages", row),
+            "status": self.value("status", row),
+        }
+        for field, _ in STRING_COLUMNS:
+            record[field] = self.value(field, row)
+        return record
+
+    def sort_key(self, row: int, sort_by: BookSortField) -> Tuple[Any, int]:
+        """Ключ keyset пагинации строки - тот же, что filtering.sort_key у записи"""
+        record_id = self.id_at(row)
+        if sort_by == BookSortField.ID:
+            return record_id, record_id
+        if sort_by.value in NUMERIC_COLUMNS:
+            # Пустое значение хранится как 0 - это и есть ключ сортировки записи без значения
+            return self._columns[sort_by.value][row], record_id
+        value = self.value(sort_by.value, row)
+        return (value if value is not None else ""), record_id
+
+    def order(self, sort_by: BookSortField) -> Sequence[int]:
+        """Номера строк в порядке сортировки"""
+        if sort_by == BookSortField.ID:
+            return range(self._rows)
+        return self._columns[f"order.{sort_by.value}"]
+
+    def rows_after(self, order: Sequence[int], sort_by: BookSortField, after: Tuple[Any, int]) -> int:
+        """Позиция в order первой строки с ключом больше after (бинарный поиск)"""
+        return bisect_right(order, after, key=lambda row: self.sort_key(row, sort_by))
+
+    def matching_rows(self, filters: BookFilters) -> Optional[Set[int]]:
+        """
+        Строки, подходящие под все фильтры BookFilters, или None если фильтров нет.
+        Сканируются только колонки фильтров: статус - по байтам кодов, подстроки - по данным строковой колонки,
+        диапазоны - бинарным поиском по перестановке строк в порядке значения.
+        """
+        rows: Optional[Set[int]] = None
+        if filters.status:
+            rows = self._rows_with_status(filters.status.value)
+        for field, low, high in range_bounds(filters):
+            matched = self._rows_in_range(field, low, high)
+            rows = matched if rows is None else rows & matched
+        for field in ("genre", "author", "title"):
+            substring = getattr(filters, field)
+            if not substring:
+                continue
+            if rows is not None and not rows:
+                break
+            matched = self._rows_containing(field, substring)
+            rows = matched if rows is None else rows & matched
+        return rows
+
+    def _rows_in_range(self, field: str, low: Optional[int], high: Optional[int]) -> Set[int]:
+        """Строки, где числовое поле в границах (включительно); запись без значения в диапазон не попадает"""
+        column = self._columns[field]
+        order = self._columns.get(f"order.{field}")
+        if order is None:
+            # Файл записан до появления перестановки по этому полю
+            rows = [row for row in range(self._rows)
+                    if (low is None or column[row] >= low) and (high is None or column[row] <= high)]
+        else:
+            start = bisect_left(order, low, key=column.__getitem__) if low is not None else 0
+            end = bisect_right(order, high, key=column.__getitem__) if high is not None else self._rows
+            rows = order[start:end]
+        return {row for row in rows if not self._is_null(field, row)}
+
+    def _is_null(self, field: str, row: int) -> bool:
+        """Пустое ли числовое поле строки"""
+        nulls = self._columns.get(f"{field}.nulls")
+        if nulls is None:
+            # Файл записан до появления признака NULL у чисел: валидные год и страницы больше 0
+            return self._columns[field][row] == 0
+        return bool(nulls[row])
+
+    def _rows_with_status(self, status: str) -> Set[int]:
+        """Строки с заданным статусом"""
+        if status not in self._statuses or not self._rows:
+            return set()
+        code = bytes([self._statuses.index(status)])
+        start = self._base + self._sections["status"][0]
+        pattern = re.compile(re.escape(code))
+        return {match.start() - start for match in pattern.finditer(self._mmap, start, start + self._rows)}
+
+    def _rows_containing(self, field: str, substring: str) -> Set[int]:
+        """
+        Строки, где поле содержит подстроку без учета регистра.
+        Поиск идет регулярным выражением прямо по UTF-8 данным колонки (каждый символ - вариантами
+        регистра, в том числе для кириллицы), позиция совпадения переводится в строку бинарным поиском
+        по смещениям, а совпадение проверяется на декодированном значении.
+        """
+        needle = substring.lower()
+        if not self._rows or not needle:
+            return set(range(self._rows)) if self._rows and not needle else set()
+
+        pattern = re.compile(b"".join(
+            re.escape(char.encode("utf-8")) if len(variants) == 1
+            else b"(?:" + b"|".join(re.escape(variant.encode("utf-8")) for variant in variants) + b")"
+            for char in needle
+            for variants in [sorted({char, char.upper(), char.title()})]
+        ))
+        offsets = self._columns[f"{field}.offsets"]
+        offset, length, _ = self._sections[f"{field}.data"]
+        start = self._base + offset
+
+        # Для ASCII подстроки совпадение внутри одной строки точное; иначе (кириллица и др.) проверяем lower()
+        exact = needle.isascii()
+        rows: Set[int] = set()
+        position = start
+        while True:
+            match = pattern.search(self._mmap, position, start + length)
+            if match is None:
+                break
+            # Последняя строка, начинающаяся не позже совпадения (пустые строки перед ней имеют то же смещение)
+            row = bisect_right(offsets, match.start() - start) - 1
+            row_end = start + offsets[row + 1]
+            # Дальше ищем с начала следующего значения: совпадение через границу значений не считается,
+            # а остальные совпадения в этой строке уже не нужны
+            position = row_end
+            if match.end() > row_end:
+                continue
+            if exact:
+                rows.add(row)
+                continue
+            value = self.value(field, row)
+            if value is not None and needle in value.lower():
+                rows.add(row)
+        return rows
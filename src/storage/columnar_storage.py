@@ -0,0 +1,450 @@
+"""Файловое хранилище в колоночном формате (mmap) с журналом изменений поверх него"""
+import asyncio
+import heapq
+import os
+import aiofiles
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from src.models.book import BookFilters
+from src.storage.base import StorageClient, upsert_version
+from src.storage.codecs import JsonCodec, restore_datetimes
+from src.storage.columnar_format import ColumnarSegment, write_columnar
+from src.storage.file_storage import atomic_write
+from src.storage.filtering import matches_filters, sort_key
+from src.storage.id_allocator import FileIdAllocator
+from src.storage.duplicates import DuplicateKeys, IsbnIndex
+from src.storage.search_index import BM25Index
+from src.core.exceptions import StorageError, DuplicateRecordError
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Если фильтры оставили больше этой доли строк, выгоднее упорядоченный проход с проверкой членства
+_CANDIDATE_SORT_RATIO = 0.25
+
+
+class ColumnarFileStorageClient(StorageClient):
+    """
+    Хранилище для каталогов, которые читают чаще, чем меняют.
+    Основные данные - колоночный файл `path`, отображенный в память (ColumnarSegment): поиск по ID,
+    фильтры и страницы читают только нужные колонки и строки, процессы делят страницы файла
+    через page cache, а старт не требует разбора всего каталога.
+
+    Изменения дописываются строками в журнал `path.log` и держатся в памяти поверх файла;
+    когда их накапливается merge_threshold, файл пересобирается с ними и журнал очищается.
+    Строки журнала содержат записи целиком, поэтому сбой посреди пересборки безопасен.
+    """
+
+    def __init__(self, path: str = "data.col", merge_threshold: int = 4096):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.merge_threshold = merge_threshold
+        self._segment: Optional[ColumnarSegment] = None
+        self._stamp: Optional[Tuple[Any, Any]] = None  # (mtime_ns, size) файла и журнала на момент загрузки
+        self._changes: Dict[int, Optional[Dict[str, Any]]] = {}  # id -> новая версия (None - удалена)
+        self._max_id = 0
+        self._log_file = None
+        self._log_reloaded = False  # журнал перечитан: открытый дескриптор может указывать на замененный файл
+        self._torn_tail: Optional[Tuple[int, int]] = None  # (длина целых строк, размер журнала) при оборванном хвосте
+        self._codec = JsonCodec()
+        self._write_lock = asyncio.Lock()
+        self._ids = FileIdAllocator(f"{path}.ids")
+        self._keys: Optional[DuplicateKeys] = None  # строится при первой записи: чтениям он не нужен
+        self._isbns: Optional[IsbnIndex] = None  # как и _keys, строится при первой записи
+        self._search: Optional[BM25Index] = None  # строится при первом поиске и ведется вместе с журналом
+        logger.info(f"ColumnarFileStorageClient initialized with path: {path}")
+
+    async def get_data(self) -> List[Dict[str, Any]]:
+        """Возвращает все записи в порядке id"""
+        segment = await self._load()
+        rows = ((segment.id_at(row), row) for row in range(len(segment))
+                if segment.id_at(row) not in self._changes)
+        changed = sorted((record_id, -1) for record_id, record in self._changes.items() if record is not None)
+        return [self._record(row, record_id) for record_id, row in heapq.merge(rows, changed)]
+
+    async def save_data(self, data: List[Dict[str, Any]]) -> None:
+        """Полностью перезаписывает колоночный файл и очищает журнал"""
+        async with self._write_lock:
+            await self._rewrite(data)
+            logger.info(f"Saved {len(data)} records to {self.path}")
+
+    async def get_by_id(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Возвращает запись по ID: журнал, затем бинарный поиск по колонке id"""
+        segment = await self._load()
+        if record_id in self._changes:
+            record = self._changes[record_id]
+            return dict(record) if record is not None else None
+        row = segment.find(record_id)
+        return segment.record(row) if row is not None else None
+
+    async def get_many(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """Возвращает найденные записи в порядке запрошенных ID"""
+        records = [await self.get_by_id(record_id) for record_id in record_ids]
+        return [record for record in records if record is not None]
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет запись в журнал"""
+        async with self._write_lock:
+            await self._load()
+            self._ids.observe(self._max_id)
+            (await self._duplicate_keys()).check(record)
+            (await self._isbn_index()).check(record)
+            new_record = {**record, "id": await self._ids.allocate()}
+            await self._apply({"op": "put", "record": new_record})
+            return dict(new_record)
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку записей одной записью в журнал; на месте дубликата - None"""
+        async with self._write_lock:
+            await self._load()
+            self._ids.observe(self._max_id)
+            keys = await self._duplicate_keys()
+            isbns = await self._isbn_index()
+            ids = iter(await self._ids.allocate_many(len(records)))
+            inserted: List[Optional[Dict[str, Any]]] = []
+            for record in records:
+                try:
+                    keys.check(record)
+                    isbns.check(record)
+                except DuplicateRecordError:
+                    inserted.append(None)
+                    continue
+                new_record = {**record, "id": next(ids)}
+                keys.add(new_record)  # следующие записи пачки проверяются и против этой
+                isbns.add(new_record)
+                inserted.append(new_record)
+            added = [record for record in inserted if record is not None]
+            if added:
+                try:
+                    await self._apply(*({"op": "put", "record": record} for record in added))
+                except Exception:
+                    self._keys = self._isbns = None  # ключи пачки уже добавлены - индексы перестроятся по файлу
+                    raise
+            return [dict(record) if record is not None else None for record in inserted]
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет записи по хеш-индексу ISBN одной записью в журнал; на месте дубликата - None"""
+        async with self._write_lock:
+            await self._load()
+            self._ids.observe(self._max_id)
+            keys = await self._duplicate_keys()
+            isbns = await self._isbn_index()
+            ids = iter(await self._ids.allocate_many(
+                sum(isbns.find(record["isbn"]) is None for record in records)))
+            upserted: List[Optional[Tuple[Dict[str, Any], bool]]] = []
+            for record in records:
+                existing_id = isbns.find(record["isbn"])
+                existing = await self.get_by_id(existing_id) if existing_id is not None else None
+                new_record = upsert_version(existing, record) if existing else {**record, "id": next(ids)}
+                try:
+                    keys.check(new_record, new_record["id"])
+                except DuplicateRecordError:
+                    upserted.append(None)
+                    continue
+                # Следующие записи пачки проверяются и ищутся уже с учетом этой
+                if existing:
+                    keys.remove(existing)
+                keys.add(new_record)
+                isbns.add(new_record)
+                upserted.append((new_record, existing is None))
+            changed = [change for change in upserted if change is not None]
+            if changed:
+                try:
+                    await self._apply(*({"op": "put", "record": record} for record, _ in changed))
+                except Exception:
+                    self._keys = self._isbns = None  # индексы перестроятся по файлу
+                    raise
+            return [None if change is None else (dict(change[0]), change[1]) for change in upserted]
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Записывает новую версию записи в журнал"""
+        async with self._write_lock:
+            if await self.get_by_id(record_id) is None:
+                return None
+            new_record = {**record, "id": record_id}
+            (await self._duplicate_keys()).check(new_record, record_id)
+            (await self._isbn_index()).check(new_record, record_id)
+            await self._apply({"op": "put", "record": new_record})
+            return dict(new_record)
+
+    async def delete(self, record_id: int) -> bool:
+        """Записывает удаление в журнал"""
+        async with self._write_lock:
+            if await self.get_by_id(record_id) is None:
+                return False
+            await self._apply({"op": "delete", "id": record_id})
+            return True
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Записывает новые версии всех записей под фильтры в журнал одной записью"""
+        async with self._write_lock:
+            matched = await self.query(filters)
+            if matched:
+                await self._apply(*({"op": "put", "record": {**record, **changes}} for record in matched))
+            return len(matched)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Записывает удаление всех записей под фильтры в журнал одной записью"""
+        async with self._write_lock:
+            matched = await self.query(filters)
+            if matched:
+                await self._apply(*({"op": "delete", "id": record["id"]} for record in matched))
+            return len(matched)
+
+    async def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу записей; целиком декодируются только строки страницы"""
+        await self._load()
+        page = []
+        skipped = 0
+        for _, row, record_id in self._iter_matches(filters, after):
+            if after is None and skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and len(page) >= limit:
+                break
+            page.append(self._record(row, record_id))
+        return page
+
+    async def count(self, filters: BookFilters) -> int:
+        """Подсчитывает записи под фильтры по колонкам, не собирая записи"""
+        segment = await self._load()
+        rows = segment.matching_rows(filters)
+        count = len(rows) if rows is not None else len(segment)
+        if self._changes:
+            # Строки файла, замененные журналом, не считаются; актуальные версии проверяются отдельно
+            for record_id, record in self._changes.items():
+                row = segment.find(record_id)
+                if row is not None and (rows is None or row in rows):
+                    count -= 1
+                if record is not None and matches_filters(record, filters):
+                    count += 1
+        return count
+
+    async def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу и общее количество"""
+        return await self.query(filters, offset, limit, after), await self.count(filters)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск по поддерживаемому индексу BM25; целиком декодируются только записи страницы"""
+        hits, total = (await self._search_index()).search(query, offset, limit)
+        records = [await self.get_by_id(record_id) for record_id, _ in hits]
+        return [record for record in records if record is not None], total
+
+    async def close(self) -> None:
+        """Закрывает журнал"""
+        async with self._write_lock:
+            if self._log_file is not None:
+                await self._log_file.close()
+                self._log_file = None
+
+    def _record(self, row: int, record_id: int) -> Dict[str, Any]:
+        """Запись из журнала (row = -1) или из строки файла"""
+        if row < 0:
+            return dict(self._changes[record_id])
+        return self._segment.record(row)
+
+    def _iter_matches(self, filters: BookFilters,
+                      after: Optional[Tuple[Any, int]] = None) -> Iterator[Tuple[Tuple[Any, int], int, int]]:
+        """
+        Перебирает (ключ сортировки, строка, id) записей под фильтры в порядке сортировки после ключа after.
+        Строки файла и измененные записи журнала сливаются по ключу; строка -1 означает запись из журнала.
+        """
+        segment = self._segment
+        sort_by = filters.sort_by
+        candidates = segment.matching_rows(filters)
+
+        if candidates is not None and len(candidates) <= len(segment) * _CANDIDATE_SORT_RATIO:
+            order = sorted(candidates, key=lambda row: segment.sort_key(row, sort_by))
+            candidates = None  # все строки order уже подходят под фильтры
+        else:
+            order = segment.order(sort_by)
+        start = segment.rows_after(order, sort_by, after) if after is not None else 0
+
+        def segment_matches():
+            for position in range(start, len(order)):
+                row = order[position]
+                if candidates is not None and row not in candidates:
+                    continue
+                record_id = segment.id_at(row)
+                if record_id in self._changes:
+                    continue
+                yield segment.sort_key(row, sort_by), row, record_id
+
+        changed = sorted(
+            (sort_key(record, sort_by), -1, record_id)
+            for record_id, record in self._changes.items()
+            if record is not None and matches_filters(record, filters)
+            and (after is None or sort_key(record, sort_by) > after)
+        )
+        return heapq.merge(segment_matches(), changed)
+
+    async def _duplicate_keys(self) -> DuplicateKeys:
+        """Хеш-индекс ключей дубликатов по всем записям файла и журнала"""
+        await self._load()
+        if self._keys is None:
+            self._keys = DuplicateKeys(await self.get_data())
+        return self._keys
+
+    async def _isbn_index(self) -> IsbnIndex:
+        """Хеш-индекс ISBN по всем записям файла и журнала"""
+        await self._load()
+        if self._isbns is None:
+            self._isbns = IsbnIndex(await self.get_data())
+        return self._isbns
+
+    async def _search_index(self) -> BM25Index:
+        """Инвертированный индекс BM25 по всем записям файла и журнала"""
+        await self._load()
+        if self._search is None:
+            self._search = self._build_search(await self.get_data())
+        return self._search
+
+    @staticmethod
+    def _build_search(records: List[Dict[str, Any]]) -> BM25Index:
+        """Строит индекс BM25 по записям"""
+        index = BM25Index()
+        for record in records:
+            index.add(record["id"], record)
+        return index
+
+    def _file_stamp(self) -> Tuple[Any, Any]:
+        """(mtime_ns, size) колоночного файла и журнала - меняются, когда их переписал другой процесс"""
+        stamps = []
+        for path in (self.path, self.log_path):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    async def _load(self) -> ColumnarSegment:
+        """Открывает файл и применяет журнал, если они изменились с прошлой загрузки"""
+        stamp = self._file_stamp()
+        if self._segment is None or stamp != self._stamp:
+            try:
+                segment = ColumnarSegment(self.path)
+            except ValueError as e:
+                logger.error(f"Invalid columnar file {self.path}: {e}")
+                raise StorageError(f"Invalid columnar file {self.path}: {e}")
+            self._segment = segment
+            self._keys = self._isbns = None
+            self._search = None
+            self._log_reloaded = True
+            self._changes, self._max_id = await self._replay(segment.max_id)
+            self._stamp = stamp
+            logger.info(f"Loaded {len(segment)} records from {self.path} and {len(self._changes)} changes "
+                        f"from {self.log_path}")
+        return self._segment
+
+    async def _replay(self, max_id: int) -> Tuple[Dict[int, Optional[Dict[str, Any]]], int]:
+        """
+        Читает журнал изменений; оборванная при сбое последняя строка пропускается.
+        Чтение журнал не меняет: хвост обрезается перед следующей дозаписью под _write_lock.
+        """
+        changes: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._torn_tail = None
+        try:
+            async with aiofiles.open(self.log_path, "rb") as f:
+                content = await f.read()
+        except FileNotFoundError:
+            return changes, max_id
+
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            logger.warning(f"Skipping incomplete tail of {self.log_path} at offset {complete}")
+            self._torn_tail = (complete, len(content))
+
+        for line in content[:complete].splitlines():
+            try:
+                entry = self._codec.loads(line)
+            except ValueError as e:
+                raise StorageError(f"Corrupted log {self.log_path}: {e}")
+            if entry["op"] == "put":
+                record = restore_datetimes([entry["record"]])[0]
+                changes[record["id"]] = record
+                max_id = max(max_id, record["id"])
+            else:
+                changes[entry["id"]] = None
+        return changes, max_id
+
+    async def _apply(self, *entries: Dict[str, Any]) -> None:
+        """Дописывает изменения в журнал одной записью, применяет их в памяти и при необходимости пересобирает файл"""
+        content = b"".join(self._codec.dumps(entry) + b"\n" for entry in entries)
+        previous: List[Optional[Dict[str, Any]]] = []
+        if self._keys is not None or self._isbns is not None:
+            previous = [await self.get_by_id(entry["record"]["id"] if entry["op"] == "put" else entry["id"])
+                        for entry in entries]
+        try:
+            await self._prepare_log()
+            if self._log_file is None:
+                self._log_file = await aiofiles.open(self.log_path, "ab")
+            await self._log_file.write(content)
+            await self._log_file.flush()
+        except Exception as e:
+            logger.error(f"Error appending to log {self.log_path}: {e}")
+            raise
+
+        for position, entry in enumerate(entries):
+            for index in (self._keys, self._isbns):
+                if index is None:
+                    continue
+                if previous[position] is not None:
+                    index.remove(previous[position])
+                if entry["op"] == "put":
+                    index.add(entry["record"])
+
+            if self._search is not None:
+                if entry["op"] == "put":
+                    self._search.add(entry["record"]["id"], entry["record"])
+                else:
+                    self._search.remove(entry["id"])
+
+            if entry["op"] == "put":
+                record = entry["record"]
+                self._changes[record["id"]] = dict(record)
+                self._max_id = max(self._max_id, record["id"])
+            else:
+                self._changes[entry["id"]] = None
+        self._stamp = self._file_stamp()
+
+        if len(self._changes) >= self.merge_threshold:
+            await self._rewrite(await self.get_data())
+
+    async def _prepare_log(self) -> None:
+        """
+        Готовит журнал к дозаписи (вызывается под _write_lock).
+        После перечитывания файлов закрывает дескриптор: другой процесс мог заменить журнал при пересборке,
+        и дозапись в старый файл потерялась бы. Оборванный хвост обрезается на месте, не меняя файл журнала.
+        """
+        if self._log_reloaded and self._log_file is not None:
+            await self._log_file.close()
+            self._log_file = None
+        self._log_reloaded = False
+        if self._torn_tail is not None:
+            complete, size = self._torn_tail
+            self._torn_tail = None
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) == size:
+                logger.warning(f"Truncating incomplete tail of {self.log_path} at offset {complete}")
+                await asyncio.to_thread(os.truncate, self.log_path, complete)
+
+    async def _rewrite(self, records: List[Dict[str, Any]]) -> None:
+        """Пересобирает колоночный файл из записей и очищает журнал"""
+        keep_search = self._search is not None
+        try:
+            await asyncio.to_thread(write_columnar, self.path, records)
+            if self._log_file is not None:
+                await self._log_file.close()
+                self._log_file = None
+            await asyncio.to_thread(atomic_write, self.log_path, b"")
+        except Exception as e:
+            logger.error(f"Error rewriting columnar file {self.path}: {e}")
+            self._segment = None
+            raise
+        self._segment = None
+        await self._load()
+        if keep_search:
+            # Слияние журнала не должно стоить следующему поиску полного построения индекса
+            self._search = self._build_search(records)
+        logger.info(f"Rewrote {self.path} with {len(records)} records")
@@ -0,0 +1,76 @@
+"""Уникальные ключи книги - нормализованные название и автор, ISBN - и их хеш-индексы для хранилищ в памяти"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+from src.core.exceptions import DuplicateRecordError
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """casefold и схлопывание пробельных символов: 'Война  и\\tМир ' -> 'война и мир'"""
+    return " ".join((value or "").casefold().split())
+
+
+def duplicate_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    """Ключ дубликата записи: (нормализованное название, нормализованный автор)"""
+    return normalize_text(record.get("title")), normalize_text(record.get("author"))
+
+
+class DuplicateKeys:
+    """
+    Хеш-таблица ключ дубликата -> id записи: проверка перед вставкой или изменением - O(1) вместо прохода.
+    Если в загруженных данных уже есть дубликаты, ключ закрепляется за первой записью.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self._ids: Dict[Tuple[str, str], int] = {}
+        for record in records:
+            self.add(record)
+
+    def check(self, record: Dict[str, Any], record_id: Optional[int] = None) -> None:
+        """Бросает DuplicateRecordError, если ключ записи занят другой записью"""
+        owner = self._ids.get(duplicate_key(record))
+        if owner is not None and owner != record_id:
+            raise DuplicateRecordError(
+                f"Record '{record.get('title')}' by {record.get('author')} duplicates record {owner}")
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Закрепляет ключ за записью"""
+        self._ids.setdefault(duplicate_key(record), record["id"])
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        """Освобождает ключ, если он закреплен за этой записью"""
+        key = duplicate_key(record)
+        if self._ids.get(key) == record["id"]:
+            del self._ids[key]
+
+
+class IsbnIndex:
+    """
+    Хеш-таблица ISBN -> id записи: upsert по ISBN находит существующую книгу за O(1), а не проходом,
+    а вставка и изменение отклоняют чужой ISBN, как уникальный индекс isbn в БД.
+    Если в загруженных данных ISBN уже повторяется, он закрепляется за первой записью.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self._ids: Dict[str, int] = {}
+        for record in records:
+            self.add(record)
+
+    def find(self, isbn: Optional[str]) -> Optional[int]:
+        """ID записи с этим ISBN или None"""
+        return self._ids.get(isbn) if isbn else None
+
+    def check(self, record: Dict[str, Any], record_id: Optional[int] = None) -> None:
+        """Бросает DuplicateRecordError, если ISBN записи закреплен за другой записью"""
+        owner = self.find(record.get("isbn"))
+        if owner is not None and owner != record_id:
+            raise DuplicateRecordError(f"Record with ISBN {record.get('isbn')} duplicates record {owner}")
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Закрепляет ISBN за записью (записи без ISBN не индексируются)"""
+        if record.get("isbn"):
+            self._ids.setdefault(record["isbn"], record["id"])
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        """Освобождает ISBN, если он закреплен за этой записью"""
+        isbn = record.get("isbn")
+        if isbn and self._ids.get(isbn) == record["id"]:
+            del self._ids[isbn]
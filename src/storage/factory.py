@@ -1,10 +1,14 @@
 import os
-from typing import Optional
+from typing import Optional, Dict, Tuple, Callable
 from src.storage.memory import InMemoryStorageClient
 from src.storage.file_storage import FileStorageClient
+from src.storage.log_file_storage import LogFileStorageClient
+from src.storage.columnar_storage import ColumnarFileStorageClient
 from src.storage.jsonbin import JsonBinStorageClient
 from src.storage.base import StorageClient
+from src.storage.codecs import get_codec
 from src.storage.sqlalchemy_storage import SQLAlchemyStorageClient
+from src.storage.sqlite_storage import SQLiteStorageClient
 from src.core.logger import get_logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,6 +17,10 @@ logger = get_logger(__name__)
 class StorageFactory:
     """Фабрика для создания экземпляров хранилищ данных"""
 
+    # Хранилища, держащие данные в процессе, создаются один раз и переиспользуются между запросами,
+    # иначе каждый запрос получал бы пустую память и заново разбирал файл
+    _shared_clients: Dict[Tuple[str, str], StorageClient] = {}
+
     def __init__(self, storage_type: Optional[str] = None):
         self.storage_type = storage_type or os.getenv("STORAGE_TYPE", "postgres")
         logger.info(f"StorageFactory initialized with type: {self.storage_type}")
@@ -26,12 +34,40 @@ class StorageFactory:
                 raise ValueError("AsyncSession is required for postgres storage type")
             return SQLAlchemyStorageClient(session)
 
+        elif self.storage_type == "sqlite":
+            sqlite_path = os.getenv("SQLITE_PATH", "library.db")
+            return self._get_shared(("sqlite", sqlite_path), lambda: SQLiteStorageClient(path=sqlite_path))
+
         elif self.storage_type == "memory":
-            return InMemoryStorageClient()
+            layout = os.getenv("STORAGE_MEMORY_LAYOUT", "rows")
+            return self._get_shared(("memory", layout), lambda: InMemoryStorageClient(layout=layout))
 
         elif self.storage_type == "file":
             file_path = os.getenv("STORAGE_FILE", "data.json")
-            return FileStorageClient(path=file_path)
+            file_mode = os.getenv("STORAGE_FILE_MODE", "snapshot")
+
+            if file_mode == "log":
+                # Снимок + журнал изменений: запись дописывает строку вместо перезаписи файла
+                return self._get_shared(("file", file_path), lambda: LogFileStorageClient(
+                    path=file_path,
+                    compact_bytes=int(os.getenv("STORAGE_LOG_COMPACT_BYTES", str(16 * 1024 * 1024))),
+                    garbage_ratio=float(os.getenv("STORAGE_LOG_GARBAGE_RATIO", "0.5")),
+                    codec=get_codec(),
+                ))
+            if file_mode == "columnar":
+                # Колоночный файл через mmap для каталогов, которые в основном читают
+                return self._get_shared(("file", file_path), lambda: ColumnarFileStorageClient(
+                    path=file_path,
+                    merge_threshold=int(os.getenv("STORAGE_COLUMNAR_MERGE_THRESHOLD", "4096")),
+                ))
+            if file_mode != "snapshot":
+                raise ValueError(f"Unknown file storage mode: {file_mode}")
+            return self._get_shared(("file", file_path), lambda: FileStorageClient(
+                path=file_path,
+                batch_window=float(os.getenv("STORAGE_BATCH_WINDOW_MS", "2")) / 1000,
+                max_batch=int(os.getenv("STORAGE_BATCH_MAX", "256")),
+                codec=get_codec(),
+            ))
 
         elif self.storage_type == "jsonbin":
             base_url = os.getenv("JSONBIN_URL")
@@ -46,11 +82,21 @@ class StorageFactory:
                 "X-Master-Key": api_key,
                 "Content-Type": "application/json"
             }
-            return JsonBinStorageClient(base_url, headers)
+            # Bin загружается в индекс клиента один раз - клиент общий, иначе каждый запрос скачивал бы bin заново
+            return self._get_shared(("jsonbin", base_url), lambda: JsonBinStorageClient(base_url, headers, codec=get_codec()))
 
         else:
             raise ValueError(f"Unknown storage type: {self.storage_type}")
 
+    @classmethod
+    def _get_shared(cls, key: Tuple[str, str], create: Callable[[], StorageClient]) -> StorageClient:
+        """Возвращает общий экземпляр хранилища, создавая его при первом обращении"""
+        client = cls._shared_clients.get(key)
+        if client is None:
+            client = create()
+            cls._shared_clients[key] = client
+        return client
+
 
 def create_default_storage(session: Optional[AsyncSession] = None) -> StorageClient:
     """Создает хранилище по умолчанию из переменных окружения"""
@@ -1,30 +1,217 @@
 #  Модуль для работы с файлами (JSON)
-import json
+import asyncio
+import os
+import time
 import aiofiles
-from typing import List, Dict, Any
-from src.storage.base import StorageClient
+from typing import List, Dict, Any, Optional, Tuple
+from src.storage.codecs import Codec, JsonCodec
+from src.models.book import BookFilters
+from src.storage.indexed import IndexedStorageClient, insert_records, update_matching, delete_matching
+from src.storage.indexed import upsert_records, upsert_results, new_isbn_count
+from src.storage.record_index import RecordIndex
+from src.storage.id_allocator import FileIdAllocator
+from src.middleware.metrics import STORAGE_BATCH_SIZE, STORAGE_FLUSH_LATENCY
+from src.core.exceptions import StorageError
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-class FileStorageClient(StorageClient):
-    """Хранилище данных в JSON файле"""
+class FileStorageClient(IndexedStorageClient):
+    """
+    Хранилище данных в JSON файле.
+    Содержимое файла кешируется в RecordIndex и перечитывается только если файл
+    изменился на диске (по mtime и размеру), поэтому чтения не разбирают весь файл заново.
 
-    def __init__(self, path: str = "data.json"):
+    Записи выполняются групповым коммитом: изменения ставятся в очередь, единственная задача-писатель
+    собирает все, что пришло за batch_window секунд (не больше max_batch), применяет их к кешу,
+    записывает файл один раз атомарно (временный файл + fsync + rename) и только затем
+    отвечает всем ожидающим запросам. Пока идет запись, новые изменения копятся в очереди.
+    Формат файла задается кодеком (по умолчанию компактный JSON).
+    """
+
+    def __init__(self, path: str = "data.json", batch_window: float = 0.002, max_batch: int = 256,
+                 codec: Optional[Codec] = None):
         self.path = path
+        self.codec = codec or JsonCodec()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._index: Optional[RecordIndex] = None
+        self._stamp: Optional[Tuple[int, int]] = None  # (mtime_ns, size) файла на момент загрузки
+        self._flushing = False  # файл переписывает сам писатель - перечитывать его не нужно
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._ids = FileIdAllocator(f"{path}.ids")  # общий для процессов, работающих с этим файлом
         logger.info(f"FileStorageClient initialized with path: {path}")
 
     async def get_data(self) -> List[Dict[str, Any]]:
         """Загружает данные из JSON файла"""
+        index = await self._load()
+        return index.all()
+
+    async def save_data(self, data: List[Dict[str, Any]]) -> None:
+        """Сохраняет данные в JSON файл"""
+        await self._submit("save", data)
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет запись и сохраняет файл; ID выдается заранее из блока hi/lo"""
+        index = await self._load()
+        self._ids.observe(index.next_id() - 1)
+        return await self._submit("insert", record, await self._ids.allocate())
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку записей одним изменением группового коммита - файл записывается один раз"""
+        index = await self._load()
+        self._ids.observe(index.next_id() - 1)
+        return await self._submit("insert_many", records, await self._ids.allocate_many(len(records)))
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет записи по ISBN одним изменением группового коммита"""
+        index = await self._load()
+        self._ids.observe(index.next_id() - 1)
+        ids = await self._ids.allocate_many(new_isbn_count(index, records))
+        return upsert_results(await self._submit("upsert_many", records, ids))
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет запись и сохраняет файл"""
+        return await self._submit("update", record_id, record)
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет запись и сохраняет файл"""
+        return await self._submit("delete", record_id)
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все записи под фильтры одним изменением группового коммита"""
+        return await self._submit("update_where", filters, changes)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все записи под фильтры одним изменением группового коммита"""
+        return await self._submit("delete_where", filters)
+
+    async def close(self) -> None:
+        """Останавливает задачу-писателя (изменения в очереди к этому моменту уже ожидаются вызывающими)"""
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+            self._queue = None
+
+    async def _submit(self, op: str, *args: Any) -> Any:
+        """Ставит изменение в очередь писателя и ждет, пока оно будет записано на диск"""
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._run_writer())
+        future = loop.create_future()
+        self._queue.put_nowait((op, args, future))
+        return await future
+
+    async def _run_writer(self) -> None:
+        """Цикл писателя: собирает пачку изменений и фиксирует ее одной записью файла"""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.max_batch - 1 and self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[str, Tuple[Any, ...], asyncio.Future]]) -> None:
+        """Применяет пачку изменений к кешу, записывает файл и разрешает futures"""
+        results = []
+        changed = False
         try:
-            async with aiofiles.open(self.path, "r", encoding="utf-8") as f:
+            index = await self._load()
+            for op, args, future in batch:
+                try:
+                    result = self._apply(index, op, args)
+                except Exception as e:
+                    results.append((future, None, e))
+                    continue
+                if op in ("insert_many", "upsert_many"):
+                    changed = changed or any(record is not None for record in result)
+                else:
+                    changed = changed or op == "save" or result not in (None, False)
+                results.append((future, result, None))
+
+            if changed:
+                started = time.perf_counter()
+                self._flushing = True
+                try:
+                    data = index.all()
+                    await asyncio.to_thread(self._write_file, data)
+                    self._stamp = self._file_stamp()
+                finally:
+                    self._flushing = False
+                STORAGE_FLUSH_LATENCY.labels(backend="file").observe(time.perf_counter() - started)
+                logger.info(f"Saved {len(data)} records to {self.path} ({len(batch)} changes in batch)")
+            STORAGE_BATCH_SIZE.labels(backend="file").observe(len(batch))
+
+        except Exception as e:
+            # Кеш мог разойтись с диском - сбрасываем его, следующее обращение перечитает файл
+            logger.error(f"Error saving data to file {self.path}: {e}")
+            self._index = None
+            results = [(future, None, e) for _, _, future in batch]
+
+        for future, result, error in results:
+            if future.done():
+                continue  # вызывающий запрос уже отменен
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _apply(self, index: RecordIndex, op: str, args: Tuple[Any, ...]) -> Any:
+        """Применяет одно изменение к кешу записей"""
+        if op == "insert":
+            return index.insert(*args)
+        if op == "insert_many":
+            return insert_records(index, *args)
+        if op == "upsert_many":
+            return upsert_records(index, *args)
+        if op == "update_where":
+            return len(update_matching(index, *args))
+        if op == "delete_where":
+            return len(delete_matching(index, *args))
+        if op == "update":
+            return index.update(*args)
+        if op == "delete":
+            return index.delete(*args) is not None
+        index.load(*args)
+        return None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        """Возвращает (mtime_ns, size) файла или None, если файла нет"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _load(self) -> RecordIndex:
+        """Возвращает кеш записей, перечитывая файл если он изменился"""
+        if self._flushing and self._index is not None:
+            return self._index
+        stamp = self._file_stamp()
+        if self._index is None or stamp != self._stamp:
+            self._index = RecordIndex(await self._read())
+            self._stamp = stamp
+        return self._index
+
+    async def _read(self) -> List[Dict[str, Any]]:
+        """
+        Читает и разбирает файл целиком. Пустой список - только для отсутствующего или пустого файла:
+        нечитаемый файл - ошибка, иначе следующая запись затерла бы каталог.
+        """
+        try:
+            async with aiofiles.open(self.path, "rb") as f:
                 content = await f.read()
                 if not content.strip():
                     logger.info(f"File {self.path} is empty, returning empty list")
                     return []
 
-                data = json.loads(content)
+                data = self.codec.decode_records(content)
                 logger.info(f"Loaded {len(data)} records from {self.path}")
                 return data
 
@@ -32,24 +219,30 @@ class FileStorageClient(StorageClient):
             logger.info(f"File {self.path} not found, returning empty list")
             return []
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in file {self.path}: {e}")
-            return []
+        except ValueError as e:
+            logger.error(f"Invalid {self.codec.name} data in file {self.path}: {e}")
+            raise StorageError(f"Invalid {self.codec.name} data in file {self.path}: {e}")
 
         except Exception as e:
             logger.error(f"Error reading file {self.path}: {e}")
-            return []
-
-    async def save_data(self, data: List[Dict[str, Any]]) -> None:
-        """Сохраняет данные в JSON файл"""
-        try:
-            json_content = json.dumps(data, indent=2, ensure_ascii=False)
+            raise StorageError(f"Error reading file {self.path}: {e}")
 
-            async with aiofiles.open(self.path, "w", encoding="utf-8") as f:
-                await f.write(json_content)
+    def _write_file(self, data: List[Dict[str, Any]]) -> None:
+        """Сериализует и атомарно записывает все данные в файл (выполняется в отдельном потоке)"""
+        atomic_write(self.path, self.codec.encode_records(data))
 
-            logger.info(f"Saved {len(data)} records to {self.path}")
 
-        except Exception as e:
-            logger.error(f"Error saving data to file {self.path}: {e}")
-            raise
\ No newline at end of file
+def atomic_write(path: str, content: bytes) -> None:
+    """Пишет файл через временный файл, fsync и rename - читатель видит старое или новое содержимое целиком"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    directory = os.path.dirname(os.path.abspath(path))
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,72 @@
+"""Фильтрация записей хранилища по BookFilters для хранилищ без собственного языка запросов"""
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+from src.models.book import BookFilters, BookSortField
+
+# Значения ключа сортировки для записей, где поле не заполнено
+_SORT_DEFAULTS = {
+    BookSortField.ID: 0,
+    BookSortField.TITLE: "",
+    BookSortField.YEAR_OF_RELEASING: 0,
+}
+
+# Числовые поля с фильтром-диапазоном: поле записи -> (нижняя граница, верхняя граница) в BookFilters
+RANGE_FILTERS = {
+    "year_of_releasing": ("year_min", "year_max"),
+    "amount_of_pages": ("pages_min", "pages_max"),
+}
+
+
+def range_bounds(filters: BookFilters) -> Iterator[Tuple[str, Optional[int], Optional[int]]]:
+    """Перебирает заданные диапазоны фильтров как (поле, нижняя граница, верхняя граница)"""
+    for field, (low_name, high_name) in RANGE_FILTERS.items():
+        low, high = getattr(filters, low_name), getattr(filters, high_name)
+        if low is not None or high is not None:
+            yield field, low, high
+
+
+def matches_filters(record: Dict[str, Any], filters: BookFilters) -> bool:
+    """Проверяет, подходит ли запись под фильтры"""
+    if filters.title and filters.title.lower() not in (record.get("title") or "").lower():
+        return False
+
+    if filters.author and filters.author.lower() not in (record.get("author") or "").lower():
+        return False
+
+    if filters.status and record.get("status", "available") != filters.status.value:
+        return False
+
+    if filters.genre and filters.genre.lower() not in (record.get("genre") or "").lower():
+        return False
+
+    for field, low, high in range_bounds(filters):
+        # Запись без значения под диапазон не подходит, как NULL в SQL
+        value = record.get(field)
+        if value is None or (low is not None and value < low) or (high is not None and value > high):
+            return False
+
+    return True
+
+
+def apply_filters(records: List[Dict[str, Any]], filters: BookFilters) -> List[Dict[str, Any]]:
+    """Возвращает записи, подходящие под фильтры, в исходном порядке"""
+    return [record for record in records if matches_filters(record, filters)]
+
+
+def sort_key(record: Dict[str, Any], sort_by: BookSortField) -> Tuple[Any, int]:
+    """Ключ keyset пагинации записи: (значение поля сортировки, id)"""
+    value = record.get(sort_by.value)
+    if value is None:
+        value = _SORT_DEFAULTS[sort_by]
+    return value, record.get("id", 0)
+
+
+def sort_and_page(records: List[Dict[str, Any]], filters: BookFilters, offset: int = 0,
+                  limit: Optional[int] = None, after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Фильтрует, сортирует и режет на страницу список записей; возвращает (страница, всего под фильтры)"""
+    filtered = sorted(apply_filters(records, filters), key=lambda record: sort_key(record, filters.sort_by))
+    total = len(filtered)
+    if after is not None:
+        filtered = [record for record in filtered if sort_key(record, filters.sort_by) > after]
+        offset = 0
+    end = None if limit is None else offset + limit
+    return filtered[offset:end], total
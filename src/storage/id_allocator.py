@@ -0,0 +1,110 @@
+"""Выдача ID новых записей для хранилищ без последовательностей БД"""
+import asyncio
+import os
+from typing import List, Optional
+from src.core.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, блоки уникальны только в пределах процесса
+    fcntl = None
+
+logger = get_logger(__name__)
+
+
+class IdAllocator:
+    """
+    Высшая отметка выданных ID в памяти процесса.
+    ID не вычисляется по данным при каждой вставке и не переиспользуется после удаления последней записи;
+    observe() поднимает отметку выше ID, пришедших извне (загрузка файла, save_data).
+    Выдача не содержит await, поэтому параллельные вставки в одном процессе не получат одинаковый ID.
+    """
+
+    def __init__(self):
+        self._next = 1
+
+    def observe(self, max_id: Optional[int]) -> None:
+        """Учитывает уже занятый ID"""
+        if max_id is not None and max_id >= self._next:
+            self._next = max_id + 1
+
+    async def allocate(self) -> int:
+        """Выдает следующий ID"""
+        record_id = self._next
+        self._next += 1
+        return record_id
+
+    async def allocate_many(self, count: int) -> List[int]:
+        """Выдает count последовательных ID для пакетной вставки"""
+        start = self._next
+        self._next += count
+        return list(range(start, self._next))
+
+
+class FileIdAllocator(IdAllocator):
+    """
+    hi/lo выдача для файловых хранилищ, которые делят несколько процессов.
+    В файле-счетчике `path` хранится граница зарезервированных ID. Процесс под эксклюзивной блокировкой
+    файла (flock) забирает блок из block_size ID и передвигает границу, затем выдает ID блока из памяти
+    без обращения к диску. Блоки разных процессов не пересекаются; неиспользованный остаток блока
+    при перезапуске пропадает, что дает пропуски в нумерации, но не повторы.
+    """
+
+    def __init__(self, path: str, block_size: int = 64):
+        super().__init__()
+        self.path = path
+        self.block_size = block_size
+        self._limit = 0  # конец текущего блока (не включительно)
+        self._floor = 1  # наименьший допустимый ID с учетом observe()
+        self._reserve_lock = asyncio.Lock()
+
+    def observe(self, max_id: Optional[int]) -> None:
+        """Учитывает уже занятый ID; если он попал в текущий блок, при выдаче резервируется новый"""
+        if max_id is not None and max_id >= self._floor:
+            self._floor = max_id + 1
+
+    async def allocate(self) -> int:
+        """Выдает следующий ID блока, резервируя новый блок, когда текущий закончился"""
+        return (await self.allocate_many(1))[0]
+
+    async def allocate_many(self, count: int) -> List[int]:
+        """
+        Выдает count ID: сначала остаток текущего блока, затем один новый блок размером
+        не меньше недостающего числа ID - пачка стоит одного обращения к файлу-счетчику.
+        """
+        async with self._reserve_lock:
+            ids: List[int] = []
+            if self._floor <= self._next < self._limit:
+                taken = min(count, self._limit - self._next)
+                ids.extend(range(self._next, self._next + taken))
+                self._next += taken
+            missing = count - len(ids)
+            if missing:
+                size = max(self.block_size, missing)
+                start = await asyncio.to_thread(self._reserve, self._floor, size)
+                ids.extend(range(start, start + missing))
+                self._next, self._limit = start + missing, start + size
+                logger.info(f"Reserved IDs {start}..{self._limit - 1} in {self.path}")
+            return ids
+
+    def _reserve(self, floor: int, size: int) -> int:
+        """Передвигает границу в файле-счетчике на size ID вперед и возвращает начало блока"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            content = os.read(fd, 64).strip()
+            try:
+                stored = int(content) if content else 1
+            except ValueError:
+                logger.error(f"Corrupted ID counter {self.path}: {content!r}, continuing from {floor}")
+                stored = 1
+            start = max(stored, floor)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(start + size).encode("ascii"))
+            os.fsync(fd)
+            return start
+        finally:
+            # Закрытие дескриптора снимает flock
+            os.close(fd)
@@ -0,0 +1,113 @@
+"""Базовый класс хранилищ, которые держат записи в RecordIndex и обслуживают чтения из памяти процесса"""
+from abc import abstractmethod
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from src.models.book import BookFilters
+from src.storage.base import StorageClient, upsert_version
+from src.storage.record_index import RecordIndex
+from src.core.exceptions import DuplicateRecordError
+
+
+def insert_records(index: RecordIndex, records: List[Dict[str, Any]], ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Вставляет пачку записей в индекс с заранее выданными ID.
+    Дубликат (в том числе более ранней записи той же пачки) дает None на месте записи, остальные вставляются.
+    """
+    inserted: List[Optional[Dict[str, Any]]] = []
+    for record, record_id in zip(records, ids):
+        try:
+            inserted.append(index.insert(record, record_id))
+        except DuplicateRecordError:
+            inserted.append(None)
+    return inserted
+
+
+def upsert_records(index: RecordIndex, records: List[Dict[str, Any]],
+                   ids: Iterable[int]) -> List[Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]]:
+    """
+    Добавляет или заменяет записи по хеш-индексу ISBN за один проход; возвращает пары (новая, прежняя версия),
+    у добавленной прежней версии нет. Новые записи получают ID из ids, при их нехватке - следующий за максимальным.
+    Запись, которая стала бы дубликатом по названию и автору, дает None.
+    """
+    ids = iter(ids)
+    upserted: List[Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]] = []
+    for record in records:
+        existing = index.find_isbn(record["isbn"])
+        try:
+            if existing is None:
+                upserted.append((index.insert(record, next(ids, None)), None))
+            else:
+                upserted.append((index.update(existing["id"], upsert_version(existing, record)), existing))
+        except DuplicateRecordError:
+            upserted.append(None)
+    return upserted
+
+
+def new_isbn_count(index: RecordIndex, records: List[Dict[str, Any]]) -> int:
+    """Сколько записей пачки upsert будут добавлены - столько ID выдается заранее"""
+    return sum(index.find_isbn(record["isbn"]) is None for record in records)
+
+
+def upsert_results(upserted: List[Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]]
+                   ) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+    """Результат upsert_many хранилища: (запись, создана ли она)"""
+    return [None if change is None else (change[0], change[1] is None) for change in upserted]
+
+
+def update_matching(index: RecordIndex, filters: BookFilters,
+                    changes: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Применяет изменения ко всем записям под фильтры за один проход; возвращает пары (прежняя, новая версия)"""
+    return [(record, index.update(record["id"], {**record, **changes})) for record in index.query(filters)]
+
+
+def delete_matching(index: RecordIndex, filters: BookFilters) -> List[Dict[str, Any]]:
+    """Удаляет все записи под фильтры за один проход и возвращает их"""
+    return [index.delete(record["id"]) for record in index.query(filters)]
+
+
+class IndexedStorageClient(StorageClient):
+    """
+    Чтения (по ID, фильтры, пагинация, поиск) выполняются по RecordIndex,
+    который наследник загружает в _load(). Запись остается за наследником.
+    """
+
+    @abstractmethod
+    async def _load(self) -> RecordIndex:
+        """Возвращает актуальный RecordIndex, при необходимости загружая данные"""
+        pass
+
+    async def get_data(self) -> List[Dict[str, Any]]:
+        """Возвращает все записи"""
+        index = await self._load()
+        return index.all()
+
+    async def get_by_id(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Возвращает запись по ID"""
+        index = await self._load()
+        return index.get(record_id)
+
+    async def get_many(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """Возвращает записи по списку ID"""
+        index = await self._load()
+        return index.get_many(record_ids)
+
+    async def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу записей под фильтры"""
+        index = await self._load()
+        return index.query(filters, offset, limit, after)
+
+    async def count(self, filters: BookFilters) -> int:
+        """Подсчитывает записи под фильтры"""
+        index = await self._load()
+        return index.count(filters)
+
+    async def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу записей и общее количество за один проход"""
+        index = await self._load()
+        return index.query_page(filters, offset, limit, after)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск по инвертированному индексу"""
+        index = await self._load()
+        return index.search(query, offset, limit)
@@ -0,0 +1,24 @@
+"""Интернирование повторяющихся строковых значений записей при загрузке"""
+import sys
+from typing import Any, Dict
+
+# Поля с небольшим числом различных значений на весь каталог
+INTERNED_FIELDS = ("status", "genre", "author")
+
+
+def intern_value(value: Any) -> Any:
+    """Возвращает единственный экземпляр строки; не строки (и подклассы str) отдаются как есть"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def intern_fields(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Заменяет значения status/genre/author записи интернированными строками (на месте).
+    Разбор JSON и строки из БД создают свою копию строки для каждой записи,
+    после интернирования все книги одного автора или жанра ссылаются на один объект.
+    """
+    for field in INTERNED_FIELDS:
+        value = record.get(field)
+        if type(value) is str:
+            record[field] = sys.intern(value)
+    return record
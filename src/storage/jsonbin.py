@@ -1,50 +1,156 @@
-from typing import List, Dict, Any
-from src.storage.base import StorageClient
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+from src.storage.codecs import Codec, JsonCodec, restore_datetimes
+from src.models.book import BookFilters
+from src.storage.indexed import IndexedStorageClient, insert_records, update_matching, delete_matching
+from src.storage.indexed import upsert_records, upsert_results, new_isbn_count
+from src.storage.record_index import RecordIndex
+from src.storage.id_allocator import IdAllocator
 from src.clients.async_http_client_manager import AsyncHttpClientManager
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
-class JsonBinStorageClient(StorageClient):
-    """Хранилище данных через JSONBin.io внешний сервис"""
+class JsonBinStorageClient(IndexedStorageClient):
+    """
+    Хранилище данных через JSONBin.io внешний сервис.
+    JSONBin не умеет частичных обновлений, поэтому bin загружается один раз
+    в RecordIndex клиента, чтения обслуживаются из него, а запись отправляет bin целиком.
+    Тело запроса сериализуется JSON кодеком (stdlib или orjson).
+    """
 
-    def __init__(self, base_url: str, headers: Dict[str, str]):
+    def __init__(self, base_url: str, headers: Dict[str, str], codec: Optional[Codec] = None):
         self.base_url = base_url.rstrip('/')
         self.headers = headers
+        self.codec = codec or JsonCodec()
+        if self.codec.binary:
+            raise ValueError(f"JSONBin requires a JSON codec, got '{self.codec.name}'")
+        self._index: Optional[RecordIndex] = None
+        self._write_lock = asyncio.Lock()
+        self._ids = IdAllocator()  # bin на стороннем сервисе не дает атомарной выдачи между процессами
         logger.info(f"JsonBinStorageClient initialized with URL: {base_url}")
 
     async def get_data(self) -> List[Dict[str, Any]]:
         """Загружает данные из JSONBin.io"""
-        logger.info("Loading data from JSONBin")
-
         try:
-            session = await AsyncHttpClientManager.get_session()
-
-            async with session.get(self.base_url, headers=self.headers) as resp:
-                resp.raise_for_status()
-                data = await resp.json()
-
-                records = data.get("record", [])
-                logger.info(f"Loaded {len(records)} records from JSONBin")
-                return records
-
+            index = await self._load()
         except Exception as e:
             logger.error(f"Error loading data from JSONBin: {e}")
             return []
+        return index.all()
 
     async def save_data(self, data: List[Dict[str, Any]]) -> None:
         """Сохраняет данные в JSONBin.io"""
+        async with self._write_lock:
+            await self._put(data)
+            self._index = RecordIndex(data)
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет запись и отправляет bin"""
+        async with self._write_lock:
+            index = await self._load()
+            self._ids.observe(index.next_id() - 1)
+            new_record = index.insert(record, await self._ids.allocate())
+            await self._persist(index)
+            return new_record
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку записей и отправляет bin один раз"""
+        async with self._write_lock:
+            index = await self._load()
+            self._ids.observe(index.next_id() - 1)
+            inserted = insert_records(index, records, await self._ids.allocate_many(len(records)))
+            if any(record is not None for record in inserted):
+                await self._persist(index)
+            return inserted
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет записи по ISBN и отправляет bin один раз"""
+        async with self._write_lock:
+            index = await self._load()
+            self._ids.observe(index.next_id() - 1)
+            upserted = upsert_records(index, records, await self._ids.allocate_many(new_isbn_count(index, records)))
+            if any(change is not None for change in upserted):
+                await self._persist(index)
+            return upsert_results(upserted)
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет запись и отправляет bin"""
+        async with self._write_lock:
+            index = await self._load()
+            updated = index.update(record_id, record)
+            if updated is not None:
+                await self._persist(index)
+            return updated
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет запись и отправляет bin"""
+        async with self._write_lock:
+            index = await self._load()
+            if index.delete(record_id) is None:
+                return False
+            await self._persist(index)
+            return True
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все записи под фильтры и отправляет bin один раз"""
+        async with self._write_lock:
+            index = await self._load()
+            changed = update_matching(index, filters, changes)
+            if changed:
+                await self._persist(index)
+            return len(changed)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все записи под фильтры и отправляет bin один раз"""
+        async with self._write_lock:
+            index = await self._load()
+            deleted = delete_matching(index, filters)
+            if deleted:
+                await self._persist(index)
+            return len(deleted)
+
+    async def _load(self) -> RecordIndex:
+        """Загружает bin при первом обращении"""
+        if self._index is None:
+            self._index = RecordIndex(await self._fetch())
+        return self._index
+
+    async def _persist(self, index: RecordIndex) -> None:
+        """Отправляет состояние индекса; при ошибке индекс сбрасывается и будет загружен заново"""
+        try:
+            await self._put(index.all())
+        except Exception:
+            self._index = None
+            raise
+
+    async def _fetch(self) -> List[Dict[str, Any]]:
+        """Загружает все записи из JSONBin.io (ошибки пробрасываются, чтобы не закешировать пустой bin)"""
+        logger.info("Loading data from JSONBin")
+
+        session = await AsyncHttpClientManager.get_session()
+
+        async with session.get(self.base_url, headers=self.headers) as resp:
+            resp.raise_for_status()
+            data = self.codec.loads(await resp.read())
+
+            records = restore_datetimes(data.get("record", []))
+            logger.info(f"Loaded {len(records)} records from JSONBin")
+            return records
+
+    async def _put(self, data: List[Dict[str, Any]]) -> None:
+        """Отправляет все записи в JSONBin.io"""
         logger.info(f"Saving {len(data)} records to JSONBin")
 
         try:
             session = await AsyncHttpClientManager.get_session()
 
-            payload = {"record": data}
-            async with session.put(self.base_url, headers=self.headers, json=payload) as resp:
+            payload = self.codec.dumps({"record": data})
+            async with session.put(self.base_url, headers=self.headers, data=payload) as resp:
                 resp.raise_for_status()
 
             logger.info(f"Successfully saved {len(data)} records to JSONBin")
 
         except Exception as e:
             logger.error(f"Error saving data to JSONBin: {e}")
-            raise
\ No newline at end of file
+            raise
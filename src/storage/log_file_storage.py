@@ -0,0 +1,314 @@
+"""Файловое хранилище в виде снимка и журнала изменений (append-only)"""
+import asyncio
+import os
+import aiofiles
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from src.storage.codecs import Codec, JsonCodec, restore_datetimes
+from src.storage.file_storage import atomic_write
+from src.models.book import BookFilters
+from src.storage.indexed import IndexedStorageClient, insert_records, update_matching, delete_matching
+from src.storage.indexed import upsert_records, upsert_results, new_isbn_count
+from src.storage.record_index import RecordIndex
+from src.storage.id_allocator import FileIdAllocator
+from src.core.exceptions import StorageError
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Смещение в _offsets для записей, последняя версия которых лежит в снимке
+SNAPSHOT_OFFSET = -1
+
+# Пока записей меньше, доля мусора не проверяется - сжимать маленький журнал бессмысленно
+_COMPACT_MIN_ENTRIES = 1000
+
+
+class LogFileStorageClient(IndexedStorageClient):
+    """
+    Хранилище в двух файлах: снимок `path` (тот же формат, что у FileStorageClient с тем же кодеком)
+    и журнал `path.log`, куда каждая вставка, обновление и удаление дописывается одной JSON строкой
+    (бинарный кодек используется только для снимка - журналу нужны строки).
+    Запись стоит O(размер записи) вместо перезаписи всего файла и подтверждается после fsync журнала,
+    так что подтвержденные изменения переживают сбой; оборванная при сбое последняя
+    строка журнала отбрасывается при старте, поэтому файл не портится.
+
+    Для каждого ID хранится смещение его последней версии в журнале - по ним считается доля
+    устаревших строк. Когда журнал превышает compact_bytes или мусора больше garbage_ratio,
+    фоновая задача пишет новый снимок (временный файл + fsync + rename) и обрезает журнал.
+    Строки журнала содержат записи целиком, поэтому повторное применение журнала к более
+    новому снимку дает то же состояние - сбой на любом шаге сжатия безопасен.
+    """
+
+    def __init__(self, path: str = "data.json", compact_bytes: int = 16 * 1024 * 1024,
+                 garbage_ratio: float = 0.5, codec: Optional[Codec] = None):
+        self.path = path
+        self.codec = codec or JsonCodec()
+        self._journal_codec = self.codec if not self.codec.binary else JsonCodec()
+        self.log_path = f"{path}.log"
+        self.compact_bytes = compact_bytes
+        self.garbage_ratio = garbage_ratio
+        self._index: Optional[RecordIndex] = None
+        self._offsets: Dict[int, int] = {}  # id -> смещение последней версии записи в журнале
+        self._entries = 0  # версий записей в снимке и строк журнала, включая устаревшие
+        self._log_size = 0
+        self._log_file = None
+        self._write_lock = asyncio.Lock()
+        self._compaction_lock = asyncio.Lock()  # сжатие и полная перезапись не идут одновременно
+        self._compaction: Optional[asyncio.Task] = None
+        self._ids = FileIdAllocator(f"{path}.ids")
+        logger.info(f"LogFileStorageClient initialized with path: {path}")
+
+    async def save_data(self, data: List[Dict[str, Any]]) -> None:
+        """Полностью перезаписывает снимок и очищает журнал"""
+        async with self._compaction_lock, self._write_lock:
+            await asyncio.to_thread(self._write_snapshot, data)
+            await self._reset_log(b"")
+            self._index = RecordIndex(data)
+            self._offsets = {record["id"]: SNAPSHOT_OFFSET for record in data}
+            self._entries = len(data)
+            logger.info(f"Saved {len(data)} records to {self.path}")
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет запись и дописывает ее в журнал"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            self._ids.observe(index.next_id() - 1)
+            new_record = index.insert(record, await self._ids.allocate())
+            await self._append_or_rollback({"op": "put", "record": new_record},
+                                           lambda: index.delete(new_record["id"]))
+            return new_record
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку записей и дописывает их в журнал одной записью"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            self._ids.observe(index.next_id() - 1)
+            inserted = insert_records(index, records, await self._ids.allocate_many(len(records)))
+            added = [record for record in inserted if record is not None]
+            if added:
+                await self._append_many_or_rollback(
+                    [{"op": "put", "record": record} for record in added],
+                    lambda: [index.delete(record["id"]) for record in added])
+            return inserted
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет записи по ISBN и дописывает их новые версии в журнал одной записью"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            self._ids.observe(index.next_id() - 1)
+            upserted = upsert_records(index, records, await self._ids.allocate_many(new_isbn_count(index, records)))
+            changed = [change for change in upserted if change is not None]
+            if changed:
+                await self._append_many_or_rollback(
+                    [{"op": "put", "record": record} for record, _ in changed],
+                    lambda: [index.delete(record["id"]) if previous is None else index.put(previous)
+                             for record, previous in changed])
+            return upsert_results(upserted)
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет запись и дописывает новую версию в журнал"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            previous = index.get(record_id)
+            updated = index.update(record_id, record)
+            if updated is None:
+                return None
+            await self._append_or_rollback({"op": "put", "record": updated},
+                                           lambda: index.update(record_id, previous))
+            return updated
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет запись и дописывает удаление в журнал"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            previous = index.delete(record_id)
+            if previous is None:
+                return False
+            await self._append_or_rollback({"op": "delete", "id": record_id},
+                                           lambda: index.put(previous))
+            return True
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все записи под фильтры и дописывает их новые версии в журнал одной записью"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            changed = update_matching(index, filters, changes)
+            if changed:
+                await self._append_many_or_rollback(
+                    [{"op": "put", "record": updated} for _, updated in changed],
+                    lambda: [index.put(previous) for previous, _ in changed])
+            return len(changed)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все записи под фильтры и дописывает удаления в журнал одной записью"""
+        async with self._write_lock:
+            index = await self._ensure_index()
+            deleted = delete_matching(index, filters)
+            if deleted:
+                await self._append_many_or_rollback(
+                    [{"op": "delete", "id": record["id"]} for record in deleted],
+                    lambda: [index.put(record) for record in deleted])
+            return len(deleted)
+
+    async def compact(self) -> None:
+        """Переписывает снимок по текущему состоянию и убирает из журнала вошедшие в него строки"""
+        async with self._compaction_lock:
+            async with self._write_lock:
+                index = await self._ensure_index()
+                records = index.all()
+                position = self._log_size
+
+            # Снимок пишется без блокировки записи: новые строки продолжают дописываться в журнал
+            await asyncio.to_thread(self._write_snapshot, records)
+
+            async with self._write_lock:
+                async with aiofiles.open(self.log_path, "rb") as f:
+                    await f.seek(position)
+                    tail = await f.read()
+                await self._reset_log(tail)
+                self._offsets = {
+                    record_id: SNAPSHOT_OFFSET if offset < position else offset - position
+                    for record_id, offset in self._offsets.items()
+                }
+                self._entries = len(records) + tail.count(b"\n")
+                logger.info(f"Compacted {self.log_path}: {len(records)} records in snapshot, "
+                            f"{len(tail)} bytes left in log")
+
+    async def close(self) -> None:
+        """Дожидается фонового сжатия и закрывает журнал"""
+        if self._compaction is not None:
+            await asyncio.gather(self._compaction, return_exceptions=True)
+        async with self._write_lock:
+            if self._log_file is not None:
+                await self._log_file.close()
+                self._log_file = None
+
+    async def _load(self) -> RecordIndex:
+        """Возвращает индекс, при первом обращении восстанавливая его из снимка и журнала"""
+        if self._index is None:
+            async with self._write_lock:
+                return await self._ensure_index()
+        return self._index
+
+    async def _ensure_index(self) -> RecordIndex:
+        """Восстанавливает индекс, если он еще не загружен (вызывается под _write_lock)"""
+        if self._index is None:
+            await self._replay()
+        return self._index
+
+    async def _replay(self) -> None:
+        """Загружает снимок и применяет к нему журнал"""
+        records = {record["id"]: record for record in await self._read_snapshot()}
+        offsets = {record_id: SNAPSHOT_OFFSET for record_id in records}
+        entries = len(records)
+
+        try:
+            async with aiofiles.open(self.log_path, "rb") as f:
+                content = await f.read()
+        except FileNotFoundError:
+            content = b""
+
+        position = 0
+        while position < len(content):
+            end = content.find(b"\n", position)
+            if end == -1:
+                # Оборванная при сбое последняя строка: отбрасываем ее
+                logger.warning(f"Dropping incomplete tail of {self.log_path} at offset {position}")
+                break
+            try:
+                entry = self._journal_codec.loads(content[position:end])
+            except ValueError as e:
+                raise StorageError(f"Corrupted log {self.log_path} at offset {position}: {e}")
+
+            if entry["op"] == "put":
+                record = restore_datetimes([entry["record"]])[0]
+                records[record["id"]] = record
+                offsets[record["id"]] = position
+            else:
+                records.pop(entry["id"], None)
+                offsets.pop(entry["id"], None)
+            entries += 1
+            position = end + 1
+
+        if position < len(content):
+            await self._reset_log(content[:position])
+        self._log_size = position
+        self._index = RecordIndex(records.values())
+        self._offsets = offsets
+        self._entries = entries
+        logger.info(f"Loaded {len(records)} records from {self.path} and {entries - len(offsets)} "
+                    f"stale entries from {self.log_path}")
+
+    async def _read_snapshot(self) -> List[Dict[str, Any]]:
+        """Читает снимок; испорченный снимок - ошибка, иначе сжатие затерло бы данные пустым состоянием"""
+        try:
+            async with aiofiles.open(self.path, "rb") as f:
+                content = await f.read()
+        except FileNotFoundError:
+            logger.info(f"Snapshot {self.path} not found, starting from empty state")
+            return []
+
+        if not content.strip():
+            return []
+        try:
+            return self.codec.decode_records(content)
+        except ValueError as e:
+            logger.error(f"Invalid {self.codec.name} data in snapshot {self.path}: {e}")
+            raise StorageError(f"Invalid {self.codec.name} data in snapshot {self.path}: {e}")
+
+    async def _append_or_rollback(self, entry: Dict[str, Any], rollback: Callable[[], Any]) -> None:
+        """Дописывает строку в журнал; при ошибке откатывает изменение индекса"""
+        await self._append_many_or_rollback([entry], rollback)
+
+    async def _append_many_or_rollback(self, entries: List[Dict[str, Any]], rollback: Callable[[], Any]) -> None:
+        """Дописывает строки в журнал одной записью и fsync; при ошибке откатывает изменения индекса"""
+        lines = [self._journal_codec.dumps(entry) + b"\n" for entry in entries]
+        try:
+            if self._log_file is None:
+                self._log_file = await aiofiles.open(self.log_path, "ab")
+            await self._log_file.write(b"".join(lines))
+            await self._log_file.flush()
+            # Одна синхронизация на группу строк; в потоке, чтобы не блокировать цикл событий
+            await asyncio.to_thread(os.fsync, self._log_file.fileno())
+        except Exception as e:
+            logger.error(f"Error appending to log {self.log_path}: {e}")
+            rollback()
+            raise
+
+        for entry, line in zip(entries, lines):
+            if entry["op"] == "put":
+                self._offsets[entry["record"]["id"]] = self._log_size
+            else:
+                self._offsets.pop(entry["id"], None)
+            self._log_size += len(line)
+            self._entries += 1
+        self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        """Запускает фоновое сжатие, если журнал вырос или в нем много устаревших строк"""
+        if self._compaction is not None and not self._compaction.done():
+            return
+        garbage = self._entries - len(self._offsets)
+        if self._log_size < self.compact_bytes and (
+                self._entries < _COMPACT_MIN_ENTRIES or garbage < self._entries * self.garbage_ratio):
+            return
+        self._compaction = asyncio.create_task(self._compact_in_background())
+
+    async def _compact_in_background(self) -> None:
+        """Сжатие в фоне: ошибка логируется, журнал остается полным и будет сжат позже"""
+        try:
+            await self.compact()
+        except Exception as e:
+            logger.error(f"Error compacting {self.log_path}: {e}")
+
+    async def _reset_log(self, content: bytes) -> None:
+        """Атомарно заменяет журнал содержимым content (временный файл + fsync + rename)"""
+        if self._log_file is not None:
+            await self._log_file.close()
+            self._log_file = None
+        await asyncio.to_thread(atomic_write, self.log_path, content)
+        self._log_size = len(content)
+
+    def _write_snapshot(self, records: List[Dict[str, Any]]) -> None:
+        """Атомарно записывает снимок (выполняется в отдельном потоке)"""
+        atomic_write(self.path, self.codec.encode_records(records))
+
@@ -1,26 +1,72 @@
-from typing import List, Dict, Any
-from src.storage.base import StorageClient
+from typing import List, Dict, Any, Optional, Tuple
+from src.models.book import BookFilters
+from src.storage.indexed import IndexedStorageClient, insert_records, update_matching, delete_matching
+from src.storage.indexed import upsert_records, upsert_results, new_isbn_count
+from src.storage.record_index import RecordIndex
+from src.storage.id_allocator import IdAllocator
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
-class InMemoryStorageClient(StorageClient):
+class InMemoryStorageClient(IndexedStorageClient):
     """
     Хранилище данных в оперативной памяти.
     Подходит для тестов и прототипирования.
     Данные теряются при перезапуске приложения.
     """
 
-    def __init__(self):
-        self._data: List[Dict[str, Any]] = []
-        logger.info("InMemoryStorageClient initialized")
+    def __init__(self, layout: str = "rows"):
+        if layout == "columnar":
+            # Колонки NumPy: фильтры и подсчет - векторные маски; numpy нужен только в этом режиме
+            from src.storage.column_store import ColumnStore
+            self._index = ColumnStore()
+        elif layout == "rows":
+            self._index = RecordIndex()
+        else:
+            raise ValueError(f"Unknown memory storage layout: {layout}")
+        self._ids = IdAllocator()
+        logger.info(f"InMemoryStorageClient initialized with {layout} layout")
+
+    async def _load(self) -> RecordIndex:
+        """Данные всегда в памяти - загружать нечего"""
+        return self._index
 
     async def get_data(self) -> List[Dict[str, Any]]:
         """Возвращает все данные из памяти"""
-        logger.info(f"Loading {len(self._data)} records from memory")
-        return self._data.copy()
+        logger.info(f"Loading {len(self._index)} records from memory")
+        return self._index.all()
 
     async def save_data(self, data: List[Dict[str, Any]]) -> None:
         """Сохраняет данные в память (полная перезапись)"""
-        self._data = data.copy()
-        logger.info(f"Saved {len(self._data)} records to memory")
\ No newline at end of file
+        self._index.load(data)
+        self._ids.observe(self._index.next_id() - 1)
+        logger.info(f"Saved {len(self._index)} records to memory")
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет одну запись с ID из высшей отметки (удаленные ID не переиспользуются)"""
+        return self._index.insert(record, await self._ids.allocate())
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку записей; на месте дубликата - None"""
+        return insert_records(self._index, records, await self._ids.allocate_many(len(records)))
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет записи по хеш-индексу ISBN"""
+        ids = await self._ids.allocate_many(new_isbn_count(self._index, records))
+        return upsert_results(upsert_records(self._index, records, ids))
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет одну запись"""
+        return self._index.update(record_id, record)
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет одну запись"""
+        return self._index.delete(record_id) is not None
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все записи под фильтры"""
+        return len(update_matching(self._index, filters, changes))
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все записи под фильтры"""
+        return len(delete_matching(self._index, filters))
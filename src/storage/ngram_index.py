@@ -0,0 +1,116 @@
+"""Триграммный инвертированный индекс для фильтров-подстрок по текстовым полям в памяти"""
+from array import array
+from typing import Dict, List, Optional, Set, Union
+
+# Ниже этого порога мертвых значений индекс не перестраивается
+_REBUILD_MIN_DEAD = 1024
+
+
+def trigrams(text: str) -> Set[str]:
+    """Возвращает множество триграмм строки"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Индекс подстрок одного текстового поля (title, author, genre).
+    Триграммы индексируются по различным значениям поля в нижнем регистре, а не по записям:
+    у многих книг один автор или жанр, поэтому индекс компактнее, а проверка совпадения
+    выполняется один раз на значение. Поиск - пересечение списков вхождений триграмм подстроки
+    и финальная проверка `подстрока in значение` для выживших значений.
+    """
+
+    def __init__(self):
+        self._value_ids: Dict[str, int] = {}  # значение -> номер значения
+        self._values: List[Optional[str]] = []  # номер значения -> значение (None - значение больше не используется)
+        self._owners: List[Union[int, Set[int], None]] = []  # номер значения -> id записи или множество id
+        self._postings: Dict[str, array] = {}  # триграмма -> номера значений (только добавление)
+        self._dead = 0
+
+    def add(self, record_id: int, text: str) -> None:
+        """Индексирует значение поля записи"""
+        value = text.lower()
+        value_id = self._value_ids.get(value)
+        if value_id is None:
+            value_id = len(self._values)
+            self._value_ids[value] = value_id
+            self._values.append(value)
+            self._owners.append(record_id)
+            for gram in trigrams(value):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array("l")
+                postings.append(value_id)
+            return
+
+        owners = self._owners[value_id]
+        if isinstance(owners, set):
+            owners.add(record_id)
+        elif owners != record_id:
+            self._owners[value_id] = {owners, record_id}
+
+    def remove(self, record_id: int, text: str) -> None:
+        """Убирает запись из индекса значения поля"""
+        value = text.lower()
+        value_id = self._value_ids.get(value)
+        if value_id is None:
+            return
+
+        owners = self._owners[value_id]
+        if isinstance(owners, set):
+            owners.discard(record_id)
+            if len(owners) == 1:
+                self._owners[value_id] = next(iter(owners))
+            return
+        if owners != record_id:
+            return
+
+        # Значение больше никем не используется: списки вхождений не трогаем, номер помечается мертвым
+        del self._value_ids[value]
+        self._values[value_id] = None
+        self._owners[value_id] = None
+        self._dead += 1
+        if self._dead > _REBUILD_MIN_DEAD and self._dead > len(self._value_ids):
+            self._rebuild()
+
+    def search(self, substring: str) -> Set[int]:
+        """Возвращает id всех записей, у которых значение поля содержит подстроку (без учета регистра)"""
+        needle = substring.lower()
+        grams = trigrams(needle)
+
+        if grams:
+            postings = []
+            for gram in grams:
+                gram_postings = self._postings.get(gram)
+                if gram_postings is None:
+                    return set()
+                postings.append(gram_postings)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for gram_postings in postings[1:]:
+                candidates.intersection_update(gram_postings)
+                if not candidates:
+                    return set()
+        else:
+            # Подстрока короче триграммы: проверяем все различные значения (их меньше, чем записей)
+            candidates = range(len(self._values))
+
+        record_ids: Set[int] = set()
+        for value_id in candidates:
+            value = self._values[value_id]
+            if value is None or needle not in value:
+                continue
+            owners = self._owners[value_id]
+            if isinstance(owners, set):
+                record_ids.update(owners)
+            else:
+                record_ids.add(owners)
+        return record_ids
+
+    def _rebuild(self) -> None:
+        """Перестраивает индекс без мертвых значений"""
+        live = [(value, self._owners[value_id]) for value, value_id in self._value_ids.items()]
+        self.__init__()
+        for value, owners in live:
+            for record_id in (owners if isinstance(owners, set) else (owners,)):
+                self.add(record_id, value)
@@ -0,0 +1,316 @@
+"""Набор записей в памяти процесса с доступом по ID - общая основа для памяти, файла и JSONBin"""
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Set
+from src.models.book import BookFilters, BookSortField
+from src.storage.filtering import matches_filters, sort_key, range_bounds, RANGE_FILTERS
+from src.storage.search_index import BM25Index
+from src.storage.ngram_index import TrigramIndex
+from src.storage.interning import intern_fields
+from src.storage.duplicates import DuplicateKeys, IsbnIndex
+from src.storage.bitmap_index import BitmapIndex, iter_bits, bit_membership
+
+# Текстовые поля BookFilters с поиском подстроки - для них ведутся триграммные индексы
+TEXT_FILTER_FIELDS = ("title", "author", "genre")
+
+# Если индексы оставили больше этой доли записей, выгоднее упорядоченный проход с проверкой членства
+_CANDIDATE_SORT_RATIO = 0.25
+
+# Если битовые карты оставили не больше стольких записей, подстроки проверяются прямо на них
+_VERIFY_LIMIT = 4096
+
+
+def _normalize_genre(genre: Optional[str]) -> str:
+    """Жанр в том виде, в котором его сравнивает фильтр-подстрока"""
+    return (genre or "").lower()
+
+
+class RecordIndex:
+    """
+    Хранит записи в словаре id -> запись.
+    Для каждого поля сортировки поддерживается отсортированный список ключей (значение, id),
+    поэтому страница по курсору находится бинарным поиском, а не пропуском offset записей.
+    Такие же списки по year_of_releasing и amount_of_pages (только заполненные значения) обслуживают
+    фильтры-диапазоны: границы находятся бинарным поиском.
+    Полнотекстовый поиск обслуживается инвертированным индексом BM25, фильтры-подстроки по title/author/genre -
+    триграммными индексами, статус и жанр - битовыми картами; все индексы обновляются инкрементально при каждой записи.
+    insert/update отклоняют дубликат по нормализованным названию и автору или по ISBN (DuplicateRecordError);
+    хеш-индекс ISBN обслуживает и find_isbn для upsert по ISBN.
+    Все операции синхронные: вызывающий код отвечает за сохранение изменений.
+    Наружу отдаются копии записей, чтобы внешний код не мог испортить состояние.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._orders: Dict[BookSortField, List[Tuple[Any, int]]] = {}
+        self._range_orders: Dict[str, List[Tuple[Any, int]]] = {}
+        self._search = BM25Index()
+        self._text_indexes: Dict[str, TrigramIndex] = {}
+        self._status_bitmaps = BitmapIndex()
+        self._genre_bitmaps = BitmapIndex(normalize=_normalize_genre)
+        self._keys = DuplicateKeys()
+        self._isbns = IsbnIndex()
+        self.load(records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Полностью заменяет содержимое индекса"""
+        self._records = {record.get("id"): intern_fields(dict(record)) for record in records}
+        self._orders = {
+            field: sorted(sort_key(record, field) for record in self._records.values())
+            for field in BookSortField
+        }
+        self._range_orders = {
+            field: sorted((record[field], record_id) for record_id, record in self._records.items()
+                          if record.get(field) is not None)
+            for field in RANGE_FILTERS
+        }
+        self._search = BM25Index()
+        self._text_indexes = {field: TrigramIndex() for field in TEXT_FILTER_FIELDS}
+        for record_id, record in self._records.items():
+            self._search.add(record_id, record)
+            for field, text_index in self._text_indexes.items():
+                text_index.add(record_id, record.get(field) or "")
+        self._status_bitmaps.load(
+            (record_id, record.get("status", "available")) for record_id, record in self._records.items())
+        self._genre_bitmaps.load((record_id, record.get("genre")) for record_id, record in self._records.items())
+        self._keys = DuplicateKeys(self._records.values())
+        self._isbns = IsbnIndex(self._records.values())
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Возвращает все записи в порядке id"""
+        return [dict(self._records[record_id]) for _, record_id in self._orders[BookSortField.ID]]
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Возвращает запись по ID или None"""
+        record = self._records.get(record_id)
+        return dict(record) if record is not None else None
+
+    def get_many(self, record_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Возвращает найденные записи в порядке запрошенных ID"""
+        return [dict(self._records[record_id]) for record_id in record_ids
+                if record_id in self._records]
+
+    def find_isbn(self, isbn: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Возвращает запись с этим ISBN или None"""
+        record_id = self._isbns.find(isbn)
+        return self.get(record_id) if record_id is not None else None
+
+    def next_id(self) -> int:
+        """Вычисляет следующий свободный ID"""
+        id_order = self._orders[BookSortField.ID]
+        return id_order[-1][1] + 1 if id_order else 1
+
+    def insert(self, record: Dict[str, Any], record_id: Optional[int] = None) -> Dict[str, Any]:
+        """Добавляет запись с ID от аллокатора хранилища или следующим за максимальным"""
+        new_record = {**record, "id": record_id if record_id is not None else self.next_id()}
+        self._keys.check(new_record)
+        self._isbns.check(new_record)
+        self._put(new_record)
+        return dict(new_record)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        """Кладет запись с ее собственным ID, заменяя прежнюю версию"""
+        if record["id"] in self._records:
+            self._remove(record["id"])
+        self._put(dict(record))
+
+    def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет существующую запись, возвращает None если записи нет"""
+        if record_id not in self._records:
+            return None
+        new_record = {**record, "id": record_id}
+        self._keys.check(new_record, record_id)
+        self._isbns.check(new_record, record_id)
+        self._remove(record_id)
+        self._put(new_record)
+        return dict(new_record)
+
+    def delete(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Удаляет запись и возвращает ее, либо None если записи нет"""
+        if record_id not in self._records:
+            return None
+        return self._remove(record_id)
+
+    def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+              after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу записей под фильтры, останавливаясь после limit совпадений"""
+        page = []
+        skipped = 0
+        for record in self._iter_matches(filters, after):
+            if after is None and skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and len(page) >= limit:
+                break
+            page.append(dict(record))
+        return page
+
+    def count(self, filters: BookFilters) -> int:
+        """Подсчитывает записи под фильтры без копирования"""
+        bitmap, candidates = self._plan(filters)
+        if candidates is not None:
+            return sum(1 for record_id in candidates if matches_filters(self._records[record_id], filters))
+        if bitmap is not None:
+            # Остались только фильтры, которые карта отвечает точно
+            return bitmap.bit_count()
+        return sum(1 for record in self._records.values() if matches_filters(record, filters))
+
+    def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                   after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу и общее число совпадений"""
+        if after is not None:
+            # Страница по курсору не зависит от глубины; общее количество считается отдельно
+            return self.query(filters, limit=limit, after=after), self.count(filters)
+        bitmap, candidates = self._plan(filters)
+        if bitmap is not None and candidates is None:
+            # Количество отвечает карта, проход нужен только до конца страницы
+            return self.query(filters, offset=offset, limit=limit), bitmap.bit_count()
+
+        # В режиме offset страница и общее количество собираются за один проход
+        page = []
+        total = 0
+        end = None if limit is None else offset + limit
+        for record in self._iter_matches(filters):
+            if total >= offset and (end is None or total < end):
+                page.append(dict(record))
+            total += 1
+        return page, total
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск: страница записей по убыванию релевантности и общее число найденных"""
+        hits, total = self._search.search(query, offset, limit)
+        return [dict(self._records[record_id]) for record_id, _ in hits], total
+
+    def _plan(self, filters: BookFilters) -> Tuple[Optional[int], Optional[Set[int]]]:
+        """
+        Выбирает индексы для фильтров и возвращает (битовая карта, кандидаты):
+        - карта - AND карт статуса и жанра, начиная с самой малочисленной; None, если таких фильтров нет;
+        - кандидаты - id, которые осталось проверить на подстроки и диапазоны; None, если карта уже
+          отвечает точно или фильтров нет совсем.
+        Источник кандидатов - самый селективный из индексов: карта, самый узкий диапазон или
+        триграммы; если записей уже немного, остальные фильтры проверяются прямо на них.
+        """
+        bitmaps = []
+        substring_fields = [field for field in TEXT_FILTER_FIELDS if getattr(filters, field)]
+        exact = True  # все фильтры, кроме подстрок и диапазонов, отвечены картами (индекс мог отключиться)
+        if filters.status:
+            bitmaps.append(self._status_bitmaps.get(filters.status.value))
+            exact = bitmaps[-1] is not None
+        if filters.genre:
+            bitmaps.append(self._genre_bitmaps.containing(filters.genre))
+            if bitmaps[-1] is not None:
+                substring_fields.remove("genre")
+        bitmaps = sorted((bitmap for bitmap in bitmaps if bitmap is not None), key=int.bit_count)
+
+        bitmap: Optional[int] = None
+        for selected in bitmaps:
+            bitmap = selected if bitmap is None else bitmap & selected
+            if not bitmap:
+                return 0, set()
+        range_keys = self._narrowest_range(filters)
+        if range_keys is None and not substring_fields:
+            return bitmap, None if exact or bitmap is None else set(iter_bits(bitmap))
+
+        bitmap_count = bitmap.bit_count() if bitmap is not None else math.inf
+        if bitmap_count <= _VERIFY_LIMIT or (range_keys is not None and bitmap_count <= len(range_keys)):
+            return bitmap, set(iter_bits(bitmap))
+
+        candidates: Optional[Set[int]] = None
+        if range_keys is not None:
+            contains = bit_membership(bitmap) if bitmap is not None else None
+            candidates = {record_id for _, record_id in range_keys if contains is None or contains(record_id)}
+        for field in substring_fields:
+            if candidates is not None and len(candidates) <= _VERIFY_LIMIT:
+                break
+            matched = self._text_indexes[field].search(getattr(filters, field))
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return bitmap, set()
+        return bitmap, candidates
+
+    def _narrowest_range(self, filters: BookFilters) -> Optional[List[Tuple[Any, int]]]:
+        """Ключи (значение, id) самого узкого из заданных диапазонов или None, если диапазонов нет"""
+        narrowest = None
+        for field, low, high in range_bounds(filters):
+            order = self._range_orders[field]
+            start = bisect_left(order, (low,)) if low is not None else 0
+            end = bisect_right(order, (high, math.inf)) if high is not None else len(order)
+            if narrowest is None or end - start < len(narrowest):
+                narrowest = order[start:end]
+        return narrowest
+
+    def _iter_matches(self, filters: BookFilters,
+                      after: Optional[Tuple[Any, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Перебирает записи под фильтры в порядке сортировки, начиная сразу после ключа after"""
+        bitmap, candidates = self._plan(filters)
+
+        if candidates is not None and len(candidates) <= len(self._records) * _CANDIDATE_SORT_RATIO:
+            # Кандидатов мало: сортируем только их, остальные фильтры проверяем на выживших
+            keys = sorted(sort_key(self._records[record_id], filters.sort_by) for record_id in candidates)
+            start = bisect_right(keys, after) if after is not None else 0
+            for position in range(start, len(keys)):
+                record = self._records[keys[position][1]]
+                if matches_filters(record, filters):
+                    yield record
+            return
+
+        if candidates is None and bitmap is not None and filters.sort_by == BookSortField.ID:
+            # Биты карты идут по возрастанию id - это и есть нужный порядок
+            for record_id in iter_bits(bitmap, after[1] + 1 if after is not None else 0):
+                yield self._records[record_id]
+            return
+
+        contains = candidates.__contains__ if candidates is not None else None
+        if contains is None and bitmap is not None:
+            contains = bit_membership(bitmap)
+        order = self._orders[filters.sort_by]
+        start = bisect_right(order, after) if after is not None else 0
+        for position in range(start, len(order)):
+            record_id = order[position][1]
+            if contains is not None and not contains(record_id):
+                continue
+            record = self._records[record_id]
+            if matches_filters(record, filters):
+                yield record
+
+    def _put(self, record: Dict[str, Any]) -> None:
+        """Кладет запись в словарь и во все списки сортировки"""
+        self._records[record["id"]] = intern_fields(record)
+        for field, order in self._orders.items():
+            insort(order, sort_key(record, field))
+        for field, order in self._range_orders.items():
+            if record.get(field) is not None:
+                insort(order, (record[field], record["id"]))
+        self._search.add(record["id"], record)
+        for field, text_index in self._text_indexes.items():
+            text_index.add(record["id"], record.get(field) or "")
+        self._status_bitmaps.add(record["id"], record.get("status", "available"))
+        self._genre_bitmaps.add(record["id"], record.get("genre"))
+        self._keys.add(record)
+        self._isbns.add(record)
+
+    def _remove(self, record_id: int) -> Dict[str, Any]:
+        """Убирает запись из словаря и из всех списков сортировки"""
+        record = self._records.pop(record_id)
+        for field, order in self._orders.items():
+            key = sort_key(record, field)
+            position = bisect_left(order, key)
+            if position < len(order) and order[position] == key:
+                del order[position]
+        for field, order in self._range_orders.items():
+            if record.get(field) is not None:
+                key = (record[field], record_id)
+                position = bisect_left(order, key)
+                if position < len(order) and order[position] == key:
+                    del order[position]
+        self._search.remove(record_id)
+        for field, text_index in self._text_indexes.items():
+            text_index.remove(record_id, record.get(field) or "")
+        self._status_bitmaps.remove(record_id, record.get("status", "available"))
+        self._genre_bitmaps.remove(record_id, record.get("genre"))
+        self._keys.remove(record)
+        self._isbns.remove(record)
+        return record
@@ -0,0 +1,104 @@
+"""Инвертированный индекс с ранжированием BM25 для полнотекстового поиска в хранилищах без СУБД"""
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple, Any
+
+# Поля записи, по которым ведется поиск, и их вес (токены поля учитываются weight раз)
+SEARCH_FIELDS: Tuple[Tuple[str, int], ...] = (
+    ("title", 3),
+    ("author", 2),
+    ("description", 1),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на токены в нижнем регистре (кириллица и латиница)"""
+    return _TOKEN_RE.findall(text.casefold()) if text else []
+
+
+class BM25Index:
+    """
+    Инвертированный индекс term -> {id: tf} с ранжированием Okapi BM25.
+    Обновляется инкрементально при каждой записи, поэтому поиск не сканирует все записи:
+    кандидаты - пересечение списков вхождений всех термов запроса.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._doc_terms: Dict[int, List[str]] = {}  # термы записи - чтобы удаление не обходило весь словарь
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, record_id: int, record: Dict[str, Any]) -> None:
+        """Индексирует запись (повторное добавление заменяет прежнюю версию)"""
+        if record_id in self._doc_lengths:
+            self.remove(record_id)
+
+        frequencies: Counter = Counter()
+        for field, weight in SEARCH_FIELDS:
+            for token in tokenize(record.get(field) or ""):
+                frequencies[token] += weight
+
+        length = sum(frequencies.values())
+        self._doc_lengths[record_id] = length
+        self._doc_terms[record_id] = list(frequencies)
+        self._total_length += length
+        for token, tf in frequencies.items():
+            self._postings.setdefault(token, {})[record_id] = tf
+
+    def remove(self, record_id: int) -> None:
+        """Убирает запись из индекса"""
+        length = self._doc_lengths.pop(record_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for token in self._doc_terms.pop(record_id):
+            docs = self._postings[token]
+            del docs[record_id]
+            if not docs:
+                del self._postings[token]
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        Ищет записи, содержащие все термы запроса.
+        Возвращает страницу (id, score) по убыванию релевантности и общее число найденных записей.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or any(term not in self._postings for term in terms):
+            return [], 0
+
+        # Пересекаем списки вхождений, начиная с самого короткого
+        postings = sorted((self._postings[term] for term in terms), key=len)
+        candidates = set(postings[0])
+        for docs in postings[1:]:
+            candidates.intersection_update(docs)
+            if not candidates:
+                return [], 0
+
+        doc_count = len(self._doc_lengths)
+        avg_length = self._total_length / doc_count if doc_count else 0.0
+        idf = {
+            term: math.log(1 + (doc_count - len(self._postings[term]) + 0.5) / (len(self._postings[term]) + 0.5))
+            for term in terms
+        }
+
+        def score(record_id: int) -> float:
+            length_norm = 1 - self.b + self.b * (self._doc_lengths[record_id] / avg_length if avg_length else 0.0)
+            total = 0.0
+            for term in terms:
+                tf = self._postings[term][record_id]
+                total += idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+            return total
+
+        # Сортировка по (score desc, id asc) - детерминированный порядок при равной релевантности
+        top = heapq.nsmallest(offset + limit, ((-score(record_id), record_id) for record_id in candidates))
+        return [(record_id, -negative) for negative, record_id in top[offset:]], len(candidates)
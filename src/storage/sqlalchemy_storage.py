@@ -1,14 +1,81 @@
-from sqlalchemy import select, insert, delete
+from sqlalchemy import select, insert, update, delete, func, tuple_, literal_column, literal, any_, Integer, Boolean, Select
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.models.sqlalchemy_models import BookORM
+from src.models.book import BookFilters, BookSortField
+from src.models.sqlalchemy_models import (BookORM, SEARCH_VECTOR_COLUMN, DUPLICATE_KEY_INDEX, ISBN_UNIQUE_INDEX,
+                                          ISBN_UNIQUE_COLUMN, duplicate_key_expression)
+from src.core.exceptions import DuplicateRecordError
 from src.storage.base import StorageClient
-from typing import List, Dict, Any
+from src.storage.filtering import range_bounds
+from src.storage.duplicates import duplicate_key
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+books_table = BookORM.__table__
+
+# Поддерживаемая базой tsvector колонка (см. DDL рядом с BookORM)
+search_vector = literal_column(f"{books_table.name}.{SEARCH_VECTOR_COLUMN}", type_=TSVECTOR)
+
+# Колонки таблицы books - лишние ключи записи (например subjects) в БД не передаются
+BOOK_COLUMNS = frozenset(column.name for column in books_table.columns)
+
+# Строк в одном многострочном INSERT: 1000 x 12 колонок укладывается в лимит параметров asyncpg и SQLite
+INSERT_BATCH_SIZE = 1000
+
+
+def _contains_pattern(value: str) -> str:
+    """Строит шаблон ILIKE для поиска подстроки, экранируя спецсимволы LIKE"""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _duplicate_error(record: Dict[str, Any], error: IntegrityError) -> Optional[DuplicateRecordError]:
+    """DuplicateRecordError, если запись нарушила уникальный индекс ключа дубликата или ISBN; иначе None"""
+    message = str(error.orig)
+    if DUPLICATE_KEY_INDEX in message:
+        return DuplicateRecordError(f"Record '{record.get('title')}' by {record.get('author')} already exists")
+    if ISBN_UNIQUE_INDEX in message or ISBN_UNIQUE_COLUMN in message:
+        return DuplicateRecordError(f"Record with ISBN {record.get('isbn')} already exists")
+    return None
+
+
+def build_filter_conditions(filters: BookFilters) -> list:
+    """Переводит BookFilters в условия WHERE (та же семантика, что и у фильтрации в памяти)"""
+    conditions = []
+
+    if filters.title:
+        conditions.append(books_table.c.title.ilike(_contains_pattern(filters.title), escape="\\"))
+
+    if filters.author:
+        conditions.append(books_table.c.author.ilike(_contains_pattern(filters.author), escape="\\"))
+
+    if filters.status:
+        conditions.append(books_table.c.status == filters.status.value)
+
+    if filters.genre:
+        conditions.append(books_table.c.genre.ilike(_contains_pattern(filters.genre), escape="\\"))
+
+    for field, low, high in range_bounds(filters):
+        # Диапазоны - обычные сравнения: их обслуживают B-tree индексы, начинающиеся с этой колонки
+        if low is not None:
+            conditions.append(books_table.c[field] >= low)
+        if high is not None:
+            conditions.append(books_table.c[field] <= high)
+
+    return conditions
+
+
 class SQLAlchemyStorageClient(StorageClient):
-    """Хранилище данных в PostgreSQL через SQLAlchemy ORM"""
+    """
+    Хранилище данных в PostgreSQL через SQLAlchemy.
+    Фильтры, пагинация и изменения выполняются на стороне базы данных:
+    каждая операция - один SQL запрос, затрагивающий только нужные строки.
+    """
+
+    dialect = "postgresql"
 
     def __init__(self, session: AsyncSession):
         if session is None:
@@ -19,27 +86,8 @@ class SQLAlchemyStorageClient(StorageClient):
     async def get_data(self) -> List[Dict[str, Any]]:
         """Загружает все книги из базы данных"""
         try:
-            result = await self.session.execute(select(BookORM))
-            books = result.scalars().all()
-
-            # Конвертируем ORM объекты в словари
-            books_data = []
-            for book in books:
-                book_dict = {
-                    "id": book.id,
-                    "title": book.title,
-                    "author": book.author,
-                    "year_of_releasing": book.year_of_releasing,
-                    "genre": book.genre,
-                    "amount_of_pages": book.amount_of_pages,
-                    "status": book.status,
-                    "isbn": book.isbn,
-                    "cover_url": book.cover_url,
-                    "description": book.description,
-                    "created_at": book.created_at,
-                    "updated_at": book.updated_at
-                }
-                books_data.append(book_dict)
+            result = await self.session.execute(select(books_table).order_by(books_table.c.id))
+            books_data = [dict(row) for row in result.mappings()]
 
             logger.info(f"Loaded {len(books_data)} books from database")
             return books_data
@@ -54,10 +102,10 @@ class SQLAlchemyStorageClient(StorageClient):
         logger.info(f"Saving {len(data)} books to database")
 
         try:
-            await self.session.execute(delete(BookORM))
+            await self.session.execute(delete(books_table))
 
             if data:
-                await self.session.execute(insert(BookORM), data)
+                await self.session.execute(insert(books_table), [self._to_columns(book) for book in data])
 
             await self.session.commit()
             logger.info(f"Successfully saved {len(data)} books to database")
@@ -65,4 +113,437 @@ class SQLAlchemyStorageClient(StorageClient):
         except Exception as e:
             logger.error(f"Error saving data to database: {e}")
             await self.session.rollback()
-            raise
\ No newline at end of file
+            raise
+
+    async def get_by_id(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Загружает одну книгу по первичному ключу"""
+        try:
+            result = await self.session.execute(select(books_table).where(books_table.c.id == record_id))
+            row = result.mappings().one_or_none()
+            return dict(row) if row is not None else None
+
+        except Exception as e:
+            logger.error(f"Error loading book {record_id} from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def get_many(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """Загружает книги по списку ID одним запросом (порядок строк не гарантирован, отсутствующие ID пропускаются)"""
+        if not record_ids:
+            return []
+        try:
+            result = await self.session.execute(select(books_table).where(self._id_in(record_ids)))
+            return [dict(row) for row in result.mappings()]
+
+        except Exception as e:
+            logger.error(f"Error loading books by ids from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Добавляет одну книгу: INSERT ... ON CONFLICT (ключ дубликата) DO NOTHING RETURNING, ID назначает база данных.
+        Дубликат находит уникальный индекс по ключу в том же запросе; пустой RETURNING - DuplicateRecordError.
+        Повтор ISBN отклоняет его уникальный индекс - это тоже DuplicateRecordError.
+        """
+        try:
+            values = self._to_columns(record)
+            values.pop("id", None)
+            result = await self.session.execute(self.build_insert(values))
+            row = result.mappings().one_or_none()
+            if row is None:
+                await self.session.rollback()
+                raise DuplicateRecordError(f"Record '{record.get('title')}' by {record.get('author')} already exists")
+            row = dict(row)
+            await self.session.commit()
+            logger.info(f"Inserted book {row['id']} into database")
+            return row
+
+        except DuplicateRecordError:
+            raise
+        except IntegrityError as e:
+            await self.session.rollback()
+            duplicate = _duplicate_error(record, e)
+            if duplicate is not None:
+                raise duplicate from e
+            logger.error(f"Error inserting book into database: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error inserting book into database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Добавляет пачку книг многострочными INSERT ... ON CONFLICT DO NOTHING RETURNING
+        по INSERT_BATCH_SIZE строк в одной транзакции. Повторы ключа или ISBN внутри пачки отсекаются до запроса,
+        дубликаты уже сохраненных книг - уникальными индексами ключа и ISBN; на их месте в результате None.
+        """
+        inserted: List[Optional[Dict[str, Any]]] = [None] * len(records)
+        positions: Dict[Tuple[str, str], int] = {}
+        isbns: Set[str] = set()
+        for position, record in enumerate(records):
+            isbn = record.get("isbn")
+            if duplicate_key(record) in positions or (isbn and isbn in isbns):
+                continue
+            positions[duplicate_key(record)] = position
+            if isbn:
+                isbns.add(isbn)
+        unique = sorted(positions.values())
+
+        try:
+            for start in range(0, len(unique), INSERT_BATCH_SIZE):
+                rows = [self._to_columns(records[position]) for position in unique[start:start + INSERT_BATCH_SIZE]]
+                result = await self.session.execute(self.build_insert_many(rows))
+                # Порядок RETURNING не гарантирован - строки сопоставляются с пачкой по ключу дубликата
+                for row in result.mappings():
+                    inserted[positions[duplicate_key(row)]] = dict(row)
+            await self.session.commit()
+            logger.info(f"Inserted {sum(row is not None for row in inserted)} of {len(records)} books into database")
+            return inserted
+
+        except Exception as e:
+            logger.error(f"Error inserting books into database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """
+        Добавляет или заменяет книги по ISBN: INSERT ... ON CONFLICT (isbn) DO UPDATE RETURNING
+        по INSERT_BATCH_SIZE строк в одной транзакции - пачка синхронизации стоит одного запроса.
+        Если книга пачки совпала по названию и автору с другой книгой, уникальный индекс ключа отклоняет
+        весь запрос; тогда пачка повторяется по одной книге, и на месте дубликатов остается None.
+        """
+        upserted: Optional[List[Optional[Tuple[Dict[str, Any], bool]]]] = [None] * len(records)
+        positions = {record["isbn"]: position for position, record in enumerate(records)}
+        try:
+            for start in range(0, len(records), INSERT_BATCH_SIZE):
+                rows = [self._to_columns(record) for record in records[start:start + INSERT_BATCH_SIZE]]
+                # Порядок RETURNING не гарантирован - строки сопоставляются с пачкой по ISBN
+                for row, created in await self._upsert_rows(rows):
+                    upserted[positions[row["isbn"]]] = (row, created)
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            if DUPLICATE_KEY_INDEX not in str(e.orig):
+                logger.error(f"Error upserting books into database: {e}")
+                raise
+            logger.warning(f"Upsert of {len(records)} books hit the duplicate key index, retrying one by one")
+            upserted = None
+        except Exception as e:
+            logger.error(f"Error upserting books into database: {e}")
+            await self.session.rollback()
+            raise
+
+        if upserted is None:
+            upserted = [await self._upsert_one(record) for record in records]
+        logger.info(f"Upserted {sum(change is not None for change in upserted)} of {len(records)} books by ISBN")
+        return upserted
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Обновляет одну книгу: UPDATE ... WHERE id = :id RETURNING"""
+        try:
+            values = self._to_columns(record)
+            values.pop("id", None)
+            result = await self.session.execute(
+                update(books_table)
+                .where(books_table.c.id == record_id)
+                .values(**values)
+                .returning(*books_table.c)
+            )
+            row = result.mappings().one_or_none()
+            await self.session.commit()
+
+            if row is None:
+                return None
+            logger.info(f"Updated book {record_id} in database")
+            return dict(row)
+
+        except IntegrityError as e:
+            await self.session.rollback()
+            duplicate = _duplicate_error(record, e)
+            if duplicate is not None:
+                raise duplicate from e
+            logger.error(f"Error updating book {record_id} in database: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error updating book {record_id} in database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет одну книгу: DELETE ... WHERE id = :id RETURNING id"""
+        try:
+            result = await self.session.execute(
+                delete(books_table).where(books_table.c.id == record_id).returning(books_table.c.id)
+            )
+            deleted_id = result.scalar_one_or_none()
+            await self.session.commit()
+
+            if deleted_id is None:
+                return False
+            logger.info(f"Deleted book {record_id} from database")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting book {record_id} from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все книги под фильтры одним UPDATE ... WHERE"""
+        try:
+            values = self._to_columns(changes)
+            values.pop("id", None)
+            result = await self.session.execute(
+                update(books_table).where(*build_filter_conditions(filters)).values(**values))
+            await self.session.commit()
+            logger.info(f"Updated {result.rowcount} books in database")
+            return result.rowcount
+
+        except IntegrityError as e:
+            await self.session.rollback()
+            if _duplicate_error(changes, e) is not None:
+                raise DuplicateRecordError(f"Update would create duplicate books: {e.orig}") from e
+            logger.error(f"Error updating books in database: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error updating books in database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все книги под фильтры одним DELETE ... WHERE"""
+        try:
+            result = await self.session.execute(delete(books_table).where(*build_filter_conditions(filters)))
+            await self.session.commit()
+            logger.info(f"Deleted {result.rowcount} books from database")
+            return result.rowcount
+
+        except Exception as e:
+            logger.error(f"Error deleting books from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу книг: WHERE + ORDER BY + LIMIT/OFFSET (или keyset условие) в базе данных"""
+        try:
+            result = await self.session.execute(self.build_query(filters, offset, limit, after))
+            return [dict(row) for row in result.mappings()]
+
+        except Exception as e:
+            logger.error(f"Error querying books from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def iter_records(self, filters: BookFilters, chunk_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Все книги под фильтры через серверный курсор (stream + yield_per): в памяти не больше chunk_size строк"""
+        try:
+            result = await self.session.stream(self.build_query(filters).execution_options(yield_per=chunk_size))
+            async for partition in result.mappings().partitions():
+                for row in partition:
+                    yield dict(row)
+
+        except Exception as e:
+            logger.error(f"Error streaming books from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def count(self, filters: BookFilters) -> int:
+        """Подсчитывает книги под фильтры через SELECT count(*) ... WHERE"""
+        try:
+            statement = select(func.count()).select_from(books_table).where(*build_filter_conditions(filters))
+            result = await self.session.execute(statement)
+            return result.scalar_one()
+
+        except Exception as e:
+            logger.error(f"Error counting books in database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу и общее количество одним запросом через COUNT(*) OVER()"""
+        if after is not None:
+            # Оконный счетчик под keyset условием посчитал бы только строки после курсора
+            return await self.query(filters, limit=limit, after=after), await self.count(filters)
+
+        try:
+            statement = self.build_query(filters, offset, limit).add_columns(
+                func.count().over().label("total_count")
+            )
+            result = await self.session.execute(statement)
+            rows = [dict(row) for row in result.mappings()]
+
+            if not rows:
+                # Пустая страница не несет оконного счетчика: если offset за пределами выборки,
+                # общее количество нужно посчитать отдельно
+                total = await self.count(filters) if offset > 0 else 0
+                return [], total
+
+            total = rows[0]["total_count"]
+            for row in rows:
+                del row["total_count"]
+            return rows, total
+
+        except Exception as e:
+            logger.error(f"Error querying page of books from database: {e}")
+            await self.session.rollback()
+            raise
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск по tsvector колонке (GIN индекс), ранжирование ts_rank_cd"""
+        try:
+            ts_query = func.websearch_to_tsquery("simple", query)
+            rank = func.ts_rank_cd(search_vector, ts_query)
+            statement = (
+                select(books_table, func.count().over().label("total_count"))
+                .where(search_vector.op("@@")(ts_query))
+                .order_by(rank.desc(), books_table.c.id)
+                .offset(offset)
+                .limit(limit)
+            )
+            result = await self.session.execute(statement)
+            rows = [dict(row) for row in result.mappings()]
+
+            if not rows:
+                total = 0
+                if offset > 0:
+                    count_statement = select(func.count()).select_from(books_table).where(
+                        search_vector.op("@@")(ts_query))
+                    total = (await self.session.execute(count_statement)).scalar_one()
+                return [], total
+
+            total = rows[0]["total_count"]
+            for row in rows:
+                del row["total_count"]
+            return rows, total
+
+        except Exception as e:
+            logger.error(f"Error searching books in database: {e}")
+            await self.session.rollback()
+            raise
+
+    @staticmethod
+    def build_query(filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> Select:
+        """
+        Строит SELECT страницы книг под фильтры с сортировкой (sort_by, id).
+        С ключом after страница выбирается keyset условием (sort_by, id) > after,
+        которое обслуживается индексом, вместо OFFSET с пропуском строк.
+        """
+        statement = select(books_table).where(*build_filter_conditions(filters))
+
+        if filters.sort_by == BookSortField.ID:
+            statement = statement.order_by(books_table.c.id)
+            if after is not None:
+                statement = statement.where(books_table.c.id > after[1])
+        else:
+            sort_column = books_table.c[filters.sort_by.value]
+            statement = statement.order_by(sort_column, books_table.c.id)
+            if after is not None:
+                statement = statement.where(tuple_(sort_column, books_table.c.id) > tuple_(*after))
+
+        if after is None:
+            statement = statement.offset(offset)
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
+
+    @staticmethod
+    def _to_columns(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Оставляет только колонки таблицы; пустые временные метки заполнит сервер"""
+        return {
+            key: value for key, value in record.items()
+            if key in BOOK_COLUMNS and not (key in ("created_at", "updated_at") and value is None)
+        }
+
+    @classmethod
+    def build_insert(cls, values: Dict[str, Any]):
+        """INSERT одной книги, пропускающий дубликат по уникальному индексу ключа, с RETURNING всех колонок"""
+        return (
+            cls._insert_statement()
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=cls._duplicate_key_elements())
+            .returning(*books_table.c)
+        )
+
+    @classmethod
+    def build_insert_many(cls, rows: List[Dict[str, Any]]):
+        """
+        Многострочный INSERT с пропуском дубликатов; отсутствующие в части строк колонки заполняются NULL/now().
+        ON CONFLICT без цели: строка пропускается при конфликте с любым уникальным индексом - ключа и ISBN.
+        """
+        _, values = cls._batch_values(rows)
+        return (
+            cls._insert_statement()
+            .values(values)
+            .on_conflict_do_nothing()
+            .returning(*books_table.c)
+        )
+
+    @classmethod
+    def build_upsert(cls, rows: List[Dict[str, Any]]):
+        """Многострочный INSERT ... ON CONFLICT (isbn) DO UPDATE: колонки строк заменяют прежние, кроме created_at"""
+        columns, values = cls._batch_values(rows)
+        statement = cls._insert_statement().values(values)
+        return (
+            statement
+            .on_conflict_do_update(
+                index_elements=[books_table.c.isbn],
+                set_={name: statement.excluded[name] for name in columns if name not in ("isbn", "created_at")},
+            )
+            .returning(*books_table.c)
+        )
+
+    @classmethod
+    def _batch_values(cls, rows: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Колонки, заданные хотя бы в одной строке пачки, и значения строк; пропуски - NULL/now()"""
+        columns = [column.name for column in books_table.columns
+                   if column.name != "id" and any(column.name in row for row in rows)]
+        values = [
+            {name: row.get(name, func.now() if name in ("created_at", "updated_at") else None) for name in columns}
+            for row in rows
+        ]
+        return columns, values
+
+    async def _upsert_rows(self, rows: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], bool]]:
+        """Выполняет upsert пачки; xmax = 0 у строки, которую запрос вставил, а не обновил"""
+        inserted = literal_column("xmax = 0", Boolean).label("inserted")
+        result = await self.session.execute(self.build_upsert(rows).returning(inserted))
+        return [({key: value for key, value in row.items() if key != "inserted"}, row["inserted"])
+                for row in result.mappings()]
+
+    async def _upsert_one(self, record: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Upsert одной книги в своей транзакции; нарушение уникального индекса (ключа или ISBN) дает None"""
+        try:
+            (change,) = await self._upsert_rows([self._to_columns(record)])
+            await self.session.commit()
+            return change
+        except IntegrityError as e:
+            await self.session.rollback()
+            if _duplicate_error(record, e) is not None:
+                return None
+            logger.error(f"Error upserting book {record.get('isbn')} into database: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error upserting book {record.get('isbn')} into database: {e}")
+            await self.session.rollback()
+            raise
+
+    @classmethod
+    def _id_in(cls, record_ids: List[int]):
+        """id = ANY(:ids) с одним параметром-массивом: текст запроса не зависит от числа ID"""
+        return books_table.c.id == any_(literal(list(record_ids), ARRAY(Integer)))
+
+    @classmethod
+    def _insert_statement(cls):
+        """INSERT диалекта базы - с поддержкой ON CONFLICT"""
+        return pg_insert(books_table)
+
+    @classmethod
+    def _duplicate_key_elements(cls) -> list:
+        """Цель ON CONFLICT - выражения уникального индекса ключа дубликата"""
+        return [duplicate_key_expression(books_table.c.title, cls.dialect),
+                duplicate_key_expression(books_table.c.author, cls.dialect)]
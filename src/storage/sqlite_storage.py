@@ -0,0 +1,233 @@
+"""Хранилище в файле SQLite (aiosqlite, режим WAL) для развертываний без сервера базы данных"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from sqlalchemy import event, select, func, table, column, literal_column
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from src.models.book import BookFilters
+from src.models.sqlalchemy_models import Base, SEARCH_FTS_TABLE
+from src.storage.base import StorageClient
+from src.storage.duplicates import normalize_text
+from src.storage.search_index import SEARCH_FIELDS, tokenize
+from src.storage.sqlalchemy_storage import SQLAlchemyStorageClient, books_table
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+books_fts = table(SEARCH_FTS_TABLE, column("rowid"))
+books_fts_ref = literal_column(SEARCH_FTS_TABLE)
+
+
+def _unicode_lower(value: Any) -> Any:
+    """lower() для SQLite: встроенная версия меняет регистр только латиницы"""
+    return value.lower() if isinstance(value, str) else value
+
+
+def create_sqlite_engine(path: str) -> AsyncEngine:
+    """Создает движок SQLite: WAL, ожидание блокировки вместо ошибки и Unicode lower() для ILIKE"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _configure_connection(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  # читатели не блокируются писателем
+        cursor.execute("PRAGMA synchronous=NORMAL")  # в WAL fsync только на контрольных точках
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+        # ilike компилируется в lower(x) LIKE lower(y) - семантика должна совпадать с PostgreSQL и памятью
+        dbapi_connection.create_function("lower", 1, _unicode_lower, deterministic=True)
+        # Выражение уникального индекса ключа дубликата (см. DUPLICATE_KEY_INDEX)
+        dbapi_connection.create_function("normalize_key", 1, normalize_text, deterministic=True)
+
+    return engine
+
+
+class _SQLiteStatements(SQLAlchemyStorageClient):
+    """Запросы SQLAlchemyStorageClient в рамках одной сессии SQLite; поиск идет через FTS5 вместо tsvector"""
+
+    dialect = "sqlite"
+
+    @classmethod
+    def _id_in(cls, record_ids: List[int]):
+        """В SQLite нет массивов - обычный IN со списком параметров"""
+        return books_table.c.id.in_(record_ids)
+
+    async def _upsert_rows(self, rows: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], bool]]:
+        """В SQLite нет xmax: ISBN уже сохраненных книг читаются в той же сессии перед upsert"""
+        isbns = [row["isbn"] for row in rows]
+        existing = set((await self.session.execute(
+            select(books_table.c.isbn).where(books_table.c.isbn.in_(isbns)))).scalars())
+        result = await self.session.execute(self.build_upsert(rows))
+        return [(dict(row), row["isbn"] not in existing) for row in result.mappings()]
+
+    @classmethod
+    def _insert_statement(cls):
+        """INSERT SQLite - ON CONFLICT поддерживается с версии 3.24"""
+        return sqlite_insert(books_table)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск по FTS5 таблице, ранжирование bm25 с весами полей"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+
+        try:
+            # Каждый терм в кавычках: все термы обязательны, а операторы FTS5 в запросе не интерпретируются
+            match = " ".join(f'"{term}"' for term in terms)
+            rank = func.bm25(books_fts_ref, *(float(weight) for _, weight in SEARCH_FIELDS))
+            # bm25() доступна только в запросе к самой FTS5 таблице - ранг считается в подзапросе
+            hits = (
+                select(books_fts.c.rowid.label("id"), rank.label("rank"))
+                .where(books_fts_ref.op("MATCH")(match))
+                .subquery()
+            )
+            statement = (
+                select(books_table, func.count().over().label("total_count"))
+                .join(hits, hits.c.id == books_table.c.id)
+                .order_by(hits.c.rank, books_table.c.id)
+                .offset(offset)
+                .limit(limit)
+            )
+            result = await self.session.execute(statement)
+            rows = [dict(row) for row in result.mappings()]
+
+            if not rows:
+                total = 0
+                if offset > 0:
+                    count_statement = select(func.count()).select_from(books_fts).where(
+                        books_fts_ref.op("MATCH")(match))
+                    total = (await self.session.execute(count_statement)).scalar_one()
+                return [], total
+
+            total = rows[0]["total_count"]
+            for row in rows:
+                del row["total_count"]
+            return rows, total
+
+        except Exception as e:
+            logger.error(f"Error searching books in SQLite: {e}")
+            await self.session.rollback()
+            raise
+
+
+class SQLiteStorageClient(StorageClient):
+    """
+    Хранилище книг в файле SQLite.
+    Использует ту же схему (индексы BookORM) и те же запросы, что и PostgreSQL:
+    фильтры, пагинация и изменения выполняются в базе. Каждая операция открывает
+    короткую сессию, поэтому один экземпляр безопасно разделяется между запросами.
+    """
+
+    def __init__(self, path: str = "library.db"):
+        self.path = path
+        self.engine = create_sqlite_engine(path)
+        self._sessions = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        logger.info(f"SQLiteStorageClient initialized with path: {path}")
+
+    async def get_data(self) -> List[Dict[str, Any]]:
+        """Загружает все книги"""
+        async with self._statements() as statements:
+            return await statements.get_data()
+
+    async def save_data(self, data: List[Dict[str, Any]]) -> None:
+        """Сохраняет данные (полная перезапись)"""
+        async with self._statements() as statements:
+            await statements.save_data(data)
+
+    async def get_by_id(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Загружает одну книгу по ID"""
+        async with self._statements() as statements:
+            return await statements.get_by_id(record_id)
+
+    async def get_many(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """Загружает книги по списку ID"""
+        async with self._statements() as statements:
+            return await statements.get_many(record_ids)
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет одну книгу, ID назначает база"""
+        async with self._statements() as statements:
+            return await statements.insert(record)
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Добавляет пачку книг многострочными INSERT в одной транзакции"""
+        async with self._statements() as statements:
+            return await statements.insert_many(records)
+
+    async def upsert_many(self, records: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], bool]]]:
+        """Добавляет или заменяет книги по ISBN через INSERT ... ON CONFLICT (isbn) DO UPDATE"""
+        async with self._statements() as statements:
+            return await statements.upsert_many(records)
+
+    async def update(self, record_id: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Обновляет одну книгу"""
+        async with self._statements() as statements:
+            return await statements.update(record_id, record)
+
+    async def delete(self, record_id: int) -> bool:
+        """Удаляет одну книгу"""
+        async with self._statements() as statements:
+            return await statements.delete(record_id)
+
+    async def update_where(self, filters: BookFilters, changes: Dict[str, Any]) -> int:
+        """Изменяет все книги под фильтры одним UPDATE"""
+        async with self._statements() as statements:
+            return await statements.update_where(filters, changes)
+
+    async def delete_where(self, filters: BookFilters) -> int:
+        """Удаляет все книги под фильтры одним DELETE"""
+        async with self._statements() as statements:
+            return await statements.delete_where(filters)
+
+    async def query(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                    after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """Возвращает страницу книг под фильтры"""
+        async with self._statements() as statements:
+            return await statements.query(filters, offset, limit, after)
+
+    async def iter_records(self, filters: BookFilters, chunk_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Все книги под фильтры; сессия открыта, пока выгрузка не дочитана"""
+        async with self._statements() as statements:
+            async for record in statements.iter_records(filters, chunk_size):
+                yield record
+
+    async def count(self, filters: BookFilters) -> int:
+        """Подсчитывает книги под фильтры"""
+        async with self._statements() as statements:
+            return await statements.count(filters)
+
+    async def query_page(self, filters: BookFilters, offset: int = 0, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает страницу книг и общее количество"""
+        async with self._statements() as statements:
+            return await statements.query_page(filters, offset, limit, after)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Полнотекстовый поиск через FTS5"""
+        async with self._statements() as statements:
+            return await statements.search(query, offset, limit)
+
+    async def close(self) -> None:
+        """Закрывает соединения с файлом базы"""
+        await self.engine.dispose()
+
+    @asynccontextmanager
+    async def _statements(self) -> AsyncIterator[_SQLiteStatements]:
+        """Открывает сессию на одну операцию, при первом обращении создавая схему"""
+        await self._ensure_schema()
+        async with self._sessions() as session:
+            yield _SQLiteStatements(session)
+
+    async def _ensure_schema(self) -> None:
+        """Создает таблицы, индексы BookORM и FTS5 таблицу, если их еще нет"""
+        if self._schema_ready:
+            return
+        async with self._schema_lock:
+            if not self._schema_ready:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                self._schema_ready = True
+                logger.info(f"SQLite schema verified in {self.path}")
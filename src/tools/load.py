@@ -0,0 +1,288 @@
+"""
+Загрузка каталога партнерской библиотеки в PostgreSQL через COPY.
+
+    python -m src.tools.load catalog.ndjson
+    python -m src.tools.load catalog.csv --chunk-size 50000 --drop-indexes
+
+Вход (CSV с заголовком или NDJSON) читается потоково и проверяется моделью BookCreate.
+Каждая пачка копируется asyncpg COPY FROM STDIN во временную таблицу и переносится в books
+одним INSERT ... SELECT ... ON CONFLICT DO NOTHING: дубликаты (название + автор, ISBN) пропускаются,
+а повторная загрузка той же пачки ничего не меняет. После каждой пачки позиция во входе
+записывается в файл контрольной точки - прерванная загрузка продолжается с нее.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from src.models.book import BookCreate
+from src.services.book_service import validate_publication_year
+from src.domain.exceptions import InvalidBookDataError
+from src.core.logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+# Колонки, которые заполняет загрузчик; id, created_at, updated_at и search_vector заполняет база
+LOAD_COLUMNS = ("title", "author", "year_of_releasing", "genre", "amount_of_pages", "status",
+                "isbn", "description")
+STAGING_TABLE = "books_load"
+
+# Индексы, которые загрузчик не удаляет: первичный ключ и уникальные индексы нужны ON CONFLICT
+_DROPPABLE_INDEXES_SQL = """
+    SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = 'books'::regclass AND NOT x.indisunique AND NOT x.indisprimary
+    ORDER BY i.relname
+"""
+
+
+def read_records(stream: TextIO, input_format: str) -> Iterator[Any]:
+    """Потоково читает записи входа: строки CSV как словари или объекты NDJSON"""
+    if input_format == "csv":
+        for row in csv.DictReader(stream):
+            # Пустая ячейка CSV - отсутствующее значение, а не пустая строка
+            yield {key: value for key, value in row.items() if key is not None and value != ""}
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidBookDataError(f"line {number}: invalid JSON: {e}")
+
+
+def validate_record(record: Any) -> Tuple[Any, ...]:
+    """Проверяет запись моделью BookCreate и возвращает кортеж значений LOAD_COLUMNS для COPY"""
+    if isinstance(record, Exception):
+        raise record
+    book = BookCreate.model_validate(record)
+    validate_publication_year(book.year_of_releasing)
+    values = book.model_dump(include=set(LOAD_COLUMNS))
+    values["status"] = book.status.value
+    return tuple(values[column] for column in LOAD_COLUMNS)
+
+
+class Checkpoint:
+    """
+    Файл контрольной точки: сколько записей входа уже обработано и какие индексы удалены на время загрузки.
+    Пишется атомарно (временный файл + rename) после фиксации каждой пачки.
+    """
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.source = source
+        self.position = 0
+        self.dropped_indexes: Dict[str, str] = {}  # имя -> CREATE INDEX для пересоздания
+
+    def load(self) -> bool:
+        """Читает контрольную точку того же входного файла; False, если продолжать нечего"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        if state.get("source") != self.source:
+            raise ValueError(f"Checkpoint {self.path} belongs to {state.get('source')}, not {self.source}")
+        self.position = state["position"]
+        self.dropped_indexes = state.get("dropped_indexes", {})
+        return True
+
+    def save(self) -> None:
+        """Сохраняет позицию и удаленные индексы"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "position": self.position,
+                       "dropped_indexes": self.dropped_indexes}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        """Удаляет контрольную точку после успешной загрузки"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class CatalogLoader:
+    """Загрузка пачками: COPY во временную таблицу, перенос в books, контрольная точка, отчет о скорости"""
+
+    def __init__(self, connection, chunk_size: int = 50000, checkpoint: Optional[Checkpoint] = None,
+                 rejects: Optional[TextIO] = None):
+        self.connection = connection  # asyncpg.Connection
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.rejects = rejects  # сюда пишутся отклоненные записи с причиной (NDJSON)
+        self.dropped_indexes: Dict[str, str] = checkpoint.dropped_indexes if checkpoint else {}
+        self.loaded = 0  # записей входа, чьи пачки зафиксированы
+        self.inserted = 0
+        self.invalid = 0
+        self._position = 0  # записей входа, прочитанных читателем
+        self._resumed_at = 0
+        self._started = 0.0
+
+    async def load(self, records: Iterator[Any], drop_indexes: bool = False) -> None:
+        """Загружает записи; чтение и проверка следующей пачки идут, пока база принимает предыдущую"""
+        self._started = time.perf_counter()
+        self._resumed_at = self.checkpoint.position if self.checkpoint else 0
+        if self._resumed_at:
+            logger.info(f"Resuming after {self._resumed_at} records")
+            for _ in zip(range(self._resumed_at), records):
+                pass
+        self._position = self.loaded = self._resumed_at
+
+        await self.connection.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DELETE ROWS "
+            f"AS SELECT {', '.join(LOAD_COLUMNS)} FROM books WITH NO DATA")
+        try:
+            if drop_indexes:
+                await self._drop_indexes()
+
+            pending: Optional[asyncio.Task] = None
+            while True:
+                chunk, end = await asyncio.to_thread(self._next_chunk, records)
+                if pending is not None:
+                    await pending
+                if end == self.loaded:
+                    break
+                pending = asyncio.create_task(self._load_chunk(chunk, end))
+        finally:
+            # С контрольной точкой индексы пересоздаст продолжение загрузки; без нее - сразу
+            if self.dropped_indexes and (self.checkpoint is None or self.loaded == self._position):
+                await self._rebuild_indexes()
+
+        loaded = self.loaded - self._resumed_at
+        elapsed = time.perf_counter() - self._started
+        logger.info(f"Load finished: {loaded} records read, {self.inserted} inserted, "
+                    f"{loaded - self.inserted - self.invalid} duplicates skipped, {self.invalid} invalid "
+                    f"in {elapsed:.1f}s ({self._rate(loaded, elapsed):.0f} rows/s)")
+
+    def _next_chunk(self, records: Iterator[Any]) -> Tuple[List[Tuple[Any, ...]], int]:
+        """Читает и проверяет следующую пачку: (строки для COPY, позиция во входе после пачки)"""
+        rows = []
+        for record in itertools.islice(records, self.chunk_size):
+            self._position += 1
+            try:
+                rows.append(validate_record(record))
+            except (ValidationError, InvalidBookDataError) as e:
+                self.invalid += 1
+                if self.rejects is not None:
+                    error = str(e) if isinstance(e, InvalidBookDataError) else "; ".join(
+                        f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                    reject = {"position": self._position, "error": error,
+                              "record": None if isinstance(record, Exception) else record}
+                    self.rejects.write(json.dumps(reject, ensure_ascii=False, default=str) + "\n")
+        return rows, self._position
+
+    async def _load_chunk(self, rows: List[Tuple[Any, ...]], end: int) -> None:
+        """Одна транзакция на пачку: COPY во временную таблицу и INSERT ... SELECT с пропуском дубликатов"""
+        columns = ", ".join(LOAD_COLUMNS)
+        try:
+            async with self.connection.transaction():
+                if rows:
+                    await self.connection.copy_records_to_table(STAGING_TABLE, records=rows, columns=LOAD_COLUMNS)
+                status = await self.connection.execute(
+                    f"INSERT INTO books ({columns}) SELECT {columns} FROM {STAGING_TABLE} ON CONFLICT DO NOTHING")
+        except Exception as e:
+            logger.error(f"Error loading records {self.loaded + 1}..{end}: {e}")
+            raise
+
+        self.inserted += int(status.split()[-1])  # статус команды: INSERT 0 <число строк>
+        self.loaded = end
+        if self.checkpoint:
+            self.checkpoint.position = end
+            await asyncio.to_thread(self.checkpoint.save)
+        elapsed = time.perf_counter() - self._started
+        logger.info(f"Loaded {end} records ({self.inserted} inserted, {self.invalid} invalid), "
+                    f"{self._rate(end - self._resumed_at, elapsed):.0f} rows/s")
+
+    async def _drop_indexes(self) -> None:
+        """Удаляет неуникальные индексы books; определения сохраняются в контрольной точке до пересоздания"""
+        for row in await self.connection.fetch(_DROPPABLE_INDEXES_SQL):
+            self.dropped_indexes[row["name"]] = row["definition"]
+            if self.checkpoint:
+                self.checkpoint.save()
+            await self.connection.execute(f'DROP INDEX IF EXISTS "{row["name"]}"')
+            logger.info(f"Dropped index {row['name']}")
+
+    async def _rebuild_indexes(self) -> None:
+        """Пересоздает удаленные индексы и обновляет статистику планировщика"""
+        started = time.perf_counter()
+        for name, definition in list(self.dropped_indexes.items()):
+            await self.connection.execute(definition.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+            del self.dropped_indexes[name]
+            if self.checkpoint:
+                self.checkpoint.save()
+            logger.info(f"Rebuilt index {name}")
+        await self.connection.execute("ANALYZE books")
+        logger.info(f"Indexes rebuilt in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _rate(rows: int, elapsed: float) -> float:
+        """Строк в секунду"""
+        return rows / elapsed if elapsed > 0 else 0.0
+
+
+def _asyncpg_dsn(url: str) -> str:
+    """URL SQLAlchemy (postgresql+asyncpg://...) в DSN asyncpg (postgresql://...)"""
+    scheme, _, rest = url.partition("://")
+    return f"{scheme.split('+')[0]}://{rest}"
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Подключается к базе и загружает вход"""
+    import asyncpg
+
+    input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    checkpoint = None
+    if args.input != "-":
+        checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint", os.path.abspath(args.input))
+        if args.restart:
+            checkpoint.remove()
+        elif checkpoint.load():
+            logger.info(f"Found checkpoint {checkpoint.path} at record {checkpoint.position}")
+
+    connection = await asyncpg.connect(_asyncpg_dsn(args.database_url))
+    stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+    try:
+        loader = CatalogLoader(connection, chunk_size=args.chunk_size, checkpoint=checkpoint, rejects=rejects)
+        await loader.load(read_records(stream, input_format), drop_indexes=args.drop_indexes)
+        if checkpoint:
+            checkpoint.remove()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if rejects is not None:
+            rejects.close()
+        await connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV или NDJSON файл каталога, '-' - стандартный ввод (без контрольных точек)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="формат входа (по умолчанию по расширению)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="по умолчанию DATABASE_URL")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="записей в одной пачке COPY")
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="удалить неуникальные индексы books на время загрузки и пересоздать после")
+    parser.add_argument("--checkpoint", help="файл контрольной точки (по умолчанию <input>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="игнорировать контрольную точку и грузить с начала")
+    parser.add_argument("--rejects", help="NDJSON файл для отклоненных записей с причиной")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    setup_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
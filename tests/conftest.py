@@ -41,6 +41,10 @@ def mock_storage_client() -> AsyncMock:
         }
     ]
     mock.save_data.return_value = None
+    mock.get_by_id.return_value = None
+    mock.query.return_value = []
+    mock.count.return_value = 0
+    mock.query_page.return_value = ([], 0)
     return mock
 
 
@@ -1,6 +1,7 @@
 import pytest
 from src.domain.entities import BookEntity
-from src.models.book import BookFilters
+from src.domain.exceptions import InvalidBookDataError
+from src.models.book import BookFilters, BookSortField
 
 
 @pytest.mark.asyncio  # помечаем асинхронный тест
@@ -8,22 +9,20 @@ async def test_get_by_id_found(book_repository, mock_storage_client):
     """Тест получения книги по ID когда книга существует"""
     # Arrange - подготовка данных
     book_id = 1
-    mock_storage_client.get_data.return_value = [
-        {
-            "id": 1,
-            "title": "Test Book",
-            "author": "Test Author",
-            "year_of_releasing": 2020,
-            "genre": "Fiction",
-            "amount_of_pages": 300,
-            "status": "available",
-            "isbn": "1234567890",
-            "cover_url": None,
-            "description": None,
-            "created_at": None,
-            "updated_at": None
-        }
-    ]
+    mock_storage_client.get_by_id.return_value = {
+        "id": 1,
+        "title": "Test Book",
+        "author": "Test Author",
+        "year_of_releasing": 2020,
+        "genre": "Fiction",
+        "amount_of_pages": 300,
+        "status": "available",
+        "isbn": "1234567890",
+        "cover_url": None,
+        "description": None,
+        "created_at": None,
+        "updated_at": None
+    }
 
     # Act - выполнение действия
     result = await book_repository.get_by_id(book_id)
@@ -34,7 +33,8 @@ async def test_get_by_id_found(book_repository, mock_storage_client):
     assert result.id == book_id
     assert result.title == "Test Book"
     assert result.author == "Test Author"
-    mock_storage_client.get_data.assert_called_once()
+    mock_storage_client.get_by_id.assert_called_once_with(book_id)
+    mock_storage_client.get_data.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -42,14 +42,14 @@ async def test_get_by_id_not_found(book_repository, mock_storage_client):
     """Тест получения книги по ID когда книга не существует"""
     # Arrange
     book_id = 999
-    mock_storage_client.get_data.return_value = []
+    mock_storage_client.get_by_id.return_value = None
 
     # Act
     result = await book_repository.get_by_id(book_id)
 
     # Assert
     assert result is None
-    mock_storage_client.get_data.assert_called_once()
+    mock_storage_client.get_by_id.assert_called_once_with(book_id)
 
 
 @pytest.mark.asyncio
@@ -57,7 +57,7 @@ async def test_get_all_with_filters(book_repository, mock_storage_client):
     """Тест получения списка книг с фильтрацией"""
     # Arrange
     filters = BookFilters(title="Test", author=None, status=None, genre=None, offset=0, limit=10)
-    mock_storage_client.get_data.return_value = [
+    mock_storage_client.query.return_value = [
         {
             "id": 1,
             "title": "Test Book",
@@ -77,15 +77,15 @@ async def test_get_all_with_filters(book_repository, mock_storage_client):
     assert len(result) == 1
     assert isinstance(result[0], BookEntity)
     assert "Test" in result[0].title
-    mock_storage_client.get_data.assert_called_once()
+    mock_storage_client.query.assert_called_once_with(filters, offset=0, limit=10, after=None)
+    mock_storage_client.get_data.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_create_book(book_repository, mock_storage_client, sample_book_entity):
     """Тест создания новой книги"""
     # Arrange
-    mock_storage_client.get_data.return_value = []
-    mock_storage_client.save_data.return_value = None
+    mock_storage_client.insert.side_effect = lambda record: {**record, "id": 7}
 
     # Act
     result = await book_repository.create(sample_book_entity)
@@ -93,8 +93,9 @@ async def test_create_book(book_repository, mock_storage_client, sample_book_ent
     # Assert
     assert result is not None
     assert isinstance(result, BookEntity)
-    assert result.id is not None
-    mock_storage_client.save_data.assert_called_once()
+    assert result.id == 7
+    mock_storage_client.insert.assert_called_once()
+    mock_storage_client.save_data.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -104,19 +105,7 @@ async def test_update_book(book_repository, mock_storage_client, sample_book_ent
     book_id = 1
     sample_book_entity.id = book_id
     sample_book_entity.title = "Updated Title"
-
-    mock_storage_client.get_data.return_value = [
-        {
-            "id": 1,
-            "title": "Old Title",
-            "author": "Test Author",
-            "year_of_releasing": 2020,
-            "genre": "Fiction",
-            "amount_of_pages": 300,
-            "status": "available"
-        }
-    ]
-    mock_storage_client.save_data.return_value = None
+    mock_storage_client.update.side_effect = lambda record_id, record: {**record, "id": record_id}
 
     # Act
     result = await book_repository.update(book_id, sample_book_entity)
@@ -124,7 +113,8 @@ async def test_update_book(book_repository, mock_storage_client, sample_book_ent
     # Assert
     assert result is not None
     assert result.title == "Updated Title"
-    mock_storage_client.save_data.assert_called_once()
+    mock_storage_client.update.assert_called_once()
+    mock_storage_client.save_data.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -132,17 +122,14 @@ async def test_delete_book_success(book_repository, mock_storage_client):
     """Тест удаления существующей книги"""
     # Arrange
     book_id = 1
-    mock_storage_client.get_data.return_value = [
-        {"id": 1, "title": "Test Book", "author": "Test Author"}
-    ]
-    mock_storage_client.save_data.return_value = None
+    mock_storage_client.delete.return_value = True
 
     # Act
     result = await book_repository.delete(book_id)
 
     # Assert
     assert result is True
-    mock_storage_client.save_data.assert_called_once()
+    mock_storage_client.delete.assert_called_once_with(book_id)
 
 
 @pytest.mark.asyncio
@@ -150,7 +137,7 @@ async def test_delete_book_not_found(book_repository, mock_storage_client):
     """Тест удаления несуществующей книги"""
     # Arrange
     book_id = 999
-    mock_storage_client.get_data.return_value = []
+    mock_storage_client.delete.return_value = False
 
     # Act
     result = await book_repository.delete(book_id)
@@ -165,15 +152,137 @@ async def test_count_total(book_repository, mock_storage_client):
     """Тест подсчета общего количества книг с фильтрами"""
     # Arrange
     filters = BookFilters(title=None, author=None, status=None, genre=None, offset=0, limit=10)
-    mock_storage_client.get_data.return_value = [
-        {"id": 1, "title": "Book 1"},
-        {"id": 2, "title": "Book 2"},
-        {"id": 3, "title": "Book 3"}
-    ]
+    mock_storage_client.count.return_value = 3
 
     # Act
     result = await book_repository.count_total(filters)
 
     # Assert
     assert result == 3
-    mock_storage_client.get_data.assert_called_once()
\ No newline at end of file
+    mock_storage_client.count.assert_called_once_with(filters)
+
+
+@pytest.mark.asyncio
+async def test_crud_with_in_memory_storage(book_repository_real_storage, sample_book_entity):
+    """Интеграционный тест CRUD операций через реальное in-memory хранилище"""
+    # Arrange
+    sample_book_entity.id = None
+
+    # Act
+    created = await book_repository_real_storage.create(sample_book_entity)
+    created.title = "Renamed Book"
+    updated = await book_repository_real_storage.update(created.id, created)
+    found = await book_repository_real_storage.get_by_id(created.id)
+    deleted = await book_repository_real_storage.delete(created.id)
+
+    # Assert
+    assert created.id == 1
+    assert updated is not None
+    assert found.title == "Renamed Book"
+    assert deleted is True
+    assert await book_repository_real_storage.get_by_id(created.id) is None
+
+
+@pytest.mark.asyncio
+async def test_filters_with_in_memory_storage(book_repository_real_storage, in_memory_storage, sample_books_data):
+    """Интеграционный тест фильтрации и пагинации через in-memory хранилище"""
+    # Arrange
+    await in_memory_storage.save_data(sample_books_data)
+    filters = BookFilters(genre="sci", offset=0, limit=10)
+
+    # Act
+    books = await book_repository_real_storage.get_all(filters)
+    total = await book_repository_real_storage.count_total(filters)
+    second_page = await book_repository_real_storage.get_all(BookFilters(offset=1, limit=1))
+
+    # Assert
+    assert [book.id for book in books] == [2]
+    assert total == 1
+    assert [book.id for book in second_page] == [2]
+
+
+@pytest.mark.asyncio
+async def test_get_page_single_storage_call(book_repository, mock_storage_client):
+    """Тест получения страницы и общего количества одним обращением к хранилищу"""
+    # Arrange
+    filters = BookFilters(offset=0, limit=1)
+    mock_storage_client.query_page.return_value = ([{"id": 1, "title": "Book 1"}, {"id": 2, "title": "Book 2"}], 3)
+
+    # Act
+    page = await book_repository.get_page(filters)
+
+    # Assert
+    assert [book.id for book in page.items] == [1]
+    assert page.total == 3
+    assert page.next_cursor is not None
+    # Запрашивается одна лишняя запись, чтобы узнать о наличии следующей страницы
+    mock_storage_client.query_page.assert_called_once_with(filters, offset=0, limit=2, after=None)
+    mock_storage_client.count.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_page_with_in_memory_storage(book_repository_real_storage, in_memory_storage, sample_books_data):
+    """Интеграционный тест страницы за пределами выборки: total считается и для пустой страницы"""
+    # Arrange
+    await in_memory_storage.save_data(sample_books_data)
+
+    # Act
+    first = await book_repository_real_storage.get_page(BookFilters(offset=0, limit=1))
+    beyond = await book_repository_real_storage.get_page(BookFilters(offset=5, limit=1))
+
+    # Assert
+    assert [book.id for book in first.items] == [1]
+    assert first.total == 2
+    assert beyond.items == []
+    assert beyond.total == 2
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_with_in_memory_storage(book_repository_real_storage, in_memory_storage):
+    """Интеграционный тест keyset пагинации: курсоры проходят выборку без пропусков и повторов"""
+    # Arrange
+    titles = ["Dune", "Anna Karenina", "Emma", "Beloved", "Carrie"]
+    await in_memory_storage.save_data([
+        {"id": i, "title": title, "author": "Author", "status": "available"}
+        for i, title in enumerate(titles, start=1)
+    ])
+
+    # Act
+    seen = []
+    cursors = []
+    cursor = None
+    while True:
+        page = await book_repository_real_storage.get_page(
+            BookFilters(sort_by=BookSortField.TITLE, limit=2, cursor=cursor))
+        seen.extend(book.title for book in page.items)
+        cursor = page.next_cursor
+        cursors.append(cursor)
+        if cursor is None:
+            break
+
+    # Assert
+    assert seen == sorted(titles)
+    assert page.total == len(titles)
+    # Курсор, выданный для сортировки по названию, не принимается для сортировки по id
+    with pytest.raises(InvalidBookDataError):
+        await book_repository_real_storage.get_page(BookFilters(sort_by=BookSortField.ID, cursor=cursors[0]))
+    with pytest.raises(InvalidBookDataError):
+        await book_repository_real_storage.get_page(BookFilters(cursor="broken"))
+
+
+@pytest.mark.asyncio
+async def test_get_all_interns_categorical_strings(book_repository, mock_storage_client):
+    """Тест загрузки сущностей: status/genre/author интернируются, у BookEntity нет __dict__"""
+    # Arrange - строки собираются заново, как при разборе JSON
+    mock_storage_client.query.return_value = [
+        {"id": book_id, "title": f"Book {book_id}", "author": "".join(["Test ", "Author"]),
+         "genre": "".join(["Fic", "tion"]), "status": "".join(["avail", "able"])}
+        for book_id in (1, 2)
+    ]
+
+    # Act
+    first, second = await book_repository.get_all(BookFilters())
+
+    # Assert
+    assert first.author is second.author and first.genre is second.genre and first.status is second.status
+    assert not hasattr(first, "__dict__")
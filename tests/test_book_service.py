@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import pytest
+from src.domain.exceptions import InvalidBookDataError
+from src.models.book import BookBulkUpdate, BookCreate, BookFilters, BookSortField, BookStatus, BulkItemStatus, ExportFormat
+from src.services.book_service import BookService
+
+
+@pytest.mark.asyncio
+async def test_create_books_bulk_reports_per_item_results(book_repository_real_storage, mock_metadata_service):
+    """Тест пакетного создания: валидные книги создаются, невалидные и дубликаты отражаются по позициям"""
+    # Arrange
+    service = BookService(book_repo=book_repository_real_storage, metadata_service=mock_metadata_service)
+    book = {"title": "Dune", "author": "Frank Herbert", "year_of_releasing": 1965, "genre": "Sci-Fi",
+            "amount_of_pages": 412}
+    items = [
+        book,
+        {**book, "title": "Dune Messiah", "year_of_releasing": 1969},
+        {**book, "title": "  DUNE "},  # дубликат первой книги пачки
+        {**book, "amount_of_pages": 0},
+        {**book, "title": "Children of Dune", "year_of_releasing": 1200},
+        "not a book",
+    ]
+
+    # Act
+    result = await service.create_books(items)
+
+    # Assert
+    assert (result.created, result.duplicates, result.invalid) == (2, 1, 3)
+    assert [item.status for item in result.items] == [
+        BulkItemStatus.CREATED, BulkItemStatus.CREATED, BulkItemStatus.DUPLICATE,
+        BulkItemStatus.INVALID, BulkItemStatus.INVALID, BulkItemStatus.INVALID,
+    ]
+    assert [item.index for item in result.items] == list(range(6))
+    assert "amount_of_pages" in result.items[3].error
+    assert result.items[1].book.id is not None and result.items[1].book.title == "Dune Messiah"
+    mock_metadata_service.get_book_metadata.assert_not_called()  # без enrich загрузка не ходит во внешний сервис
+
+
+@pytest.mark.asyncio
+async def test_export_books_streams_all_filtered_books(book_repository_real_storage, in_memory_storage,
+                                                       sample_books_data, monkeypatch):
+    """Тест выгрузки: все книги под фильтры без ограничения limit, фрагментами, в NDJSON и CSV"""
+    # Arrange
+    monkeypatch.setattr("src.services.book_service.EXPORT_CHUNK_BOOKS", 1)
+    await in_memory_storage.save_data(sample_books_data)
+    service = BookService(book_repo=book_repository_real_storage)
+    filters = BookFilters(sort_by=BookSortField.TITLE, limit=1)
+    expected_ids = [book["id"] for book in sorted(sample_books_data, key=lambda book: (book["title"], book["id"]))]
+
+    # Act
+    ndjson_chunks = [chunk async for chunk in service.export_books(filters, ExportFormat.NDJSON)]
+    csv_text = "".join([chunk async for chunk in service.export_books(filters, ExportFormat.CSV)])
+
+    # Assert
+    assert len(ndjson_chunks) == len(expected_ids)
+    assert [json.loads(line)["id"] for line in "".join(ndjson_chunks).splitlines()] == expected_ids
+    rows = list(csv.DictReader(io.StringIO(csv_text)))
+    assert [int(row["id"]) for row in rows] == expected_ids
+    assert rows[0]["title"] == min(book["title"] for book in sample_books_data)
+
+
+@pytest.mark.asyncio
+async def test_change_books_by_filter_with_dry_run(book_repository_real_storage, in_memory_storage, sample_books_data):
+    """Тест изменения и удаления по фильтру: dry_run только считает, без фильтра запрос отклоняется"""
+    # Arrange
+    await in_memory_storage.save_data(sample_books_data)
+    service = BookService(book_repo=book_repository_real_storage)
+    borrowed = BookFilters(status=BookStatus.BORROWED)
+    expected = sum(book["status"] == "borrowed" for book in sample_books_data)
+
+    # Act
+    preview = await service.update_books_where(borrowed, BookBulkUpdate(status=BookStatus.MAINTENANCE), dry_run=True)
+    updated = await service.update_books_where(borrowed, BookBulkUpdate(status=BookStatus.MAINTENANCE))
+    deleted = await service.delete_books_where(BookFilters(status=BookStatus.MAINTENANCE))
+
+    # Assert
+    assert (preview.affected, preview.dry_run) == (expected, True)
+    assert updated.affected == expected and deleted.affected == expected
+    assert len(await in_memory_storage.get_data()) == len(sample_books_data) - expected
+    with pytest.raises(InvalidBookDataError):
+        await service.delete_books_where(BookFilters())
+
+
+@pytest.mark.asyncio
+async def test_get_books_by_ids_keeps_request_order(book_repository_real_storage, in_memory_storage, sample_books_data):
+    """Тест пакетного получения: книги в порядке запроса, повторы сохраняются, промахи явные"""
+    # Arrange
+    await in_memory_storage.save_data(sample_books_data)
+    service = BookService(book_repo=book_repository_real_storage)
+    first, second = sample_books_data[0]["id"], sample_books_data[1]["id"]
+
+    # Act
+    result = await service.get_books_by_ids([second, 999, first, second])
+
+    # Assert
+    assert [book.id if book else None for book in result.items] == [second, None, first, second]
+    assert result.missing == [999]
+    with pytest.raises(InvalidBookDataError):
+        await service.get_books_by_ids([])
+
+
+@pytest.mark.asyncio
+async def test_upsert_books_by_isbn_creates_and_updates(book_repository_real_storage):
+    """Тест upsert по ISBN: повторная синхронизация заменяет книги, книги без ISBN и повторы ISBN отклоняются"""
+    # Arrange
+    service = BookService(book_repo=book_repository_real_storage)
+    book = {"title": "Dune", "author": "Frank Herbert", "year_of_releasing": 1965, "genre": "Sci-Fi",
+            "amount_of_pages": 412, "isbn": "9780441013593"}
+    first, created = await service.upsert_book_by_isbn("9780441013593", BookCreate.model_validate(book))
+
+    # Act
+    result = await service.upsert_books([
+        {**book, "status": "borrowed"},
+        {**book, "title": "Dune Messiah", "isbn": "9780593098233"},
+        {**book, "title": "Children of Dune", "isbn": None},
+        {**book, "title": "God Emperor of Dune"},  # ISBN первой книги пачки
+    ])
+
+    # Assert
+    assert created is True
+    assert (result.created, result.updated, result.duplicates, result.invalid) == (1, 1, 0, 2)
+    assert result.items[0].status == BulkItemStatus.UPDATED and result.items[0].book.id == first.id
+    assert result.items[0].book.status == BookStatus.BORROWED
+    assert "isbn" in result.items[2].error and "isbn" in result.items[3].error
+    with pytest.raises(InvalidBookDataError):
+        await service.upsert_book_by_isbn("9780593098233", BookCreate.model_validate(book))
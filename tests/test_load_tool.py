@@ -0,0 +1,67 @@
+import io
+import json
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from src.tools.load import CatalogLoader, Checkpoint, read_records
+
+
+def _connection() -> MagicMock:
+    """asyncpg соединение: фиксирует пачки COPY и отвечает статусом INSERT по числу скопированных строк"""
+    connection = MagicMock()
+    connection.transaction.return_value.__aenter__ = AsyncMock()
+    connection.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    connection.copied = []
+
+    async def copy_records_to_table(table, records, columns):
+        connection.copied.append(list(records))
+
+    async def execute(sql):
+        return f"INSERT 0 {len(connection.copied[-1])}" if sql.startswith("INSERT") else "OK"
+
+    connection.copy_records_to_table = AsyncMock(side_effect=copy_records_to_table)
+    connection.execute = AsyncMock(side_effect=execute)
+    return connection
+
+
+def test_read_records_csv_and_ndjson():
+    """Тест чтения входа: CSV с заголовком и NDJSON, битая строка NDJSON становится отклоненной записью"""
+    # Arrange
+    csv_input = io.StringIO("title,author,year_of_releasing,genre,amount_of_pages,isbn\nDune,Frank Herbert,1965,Sci-Fi,412,\n")
+    ndjson_input = io.StringIO('{"title": "Dune"}\n\n{broken\n')
+
+    # Act
+    csv_records = list(read_records(csv_input, "csv"))
+    ndjson_records = list(read_records(ndjson_input, "ndjson"))
+
+    # Assert
+    assert csv_records == [{"title": "Dune", "author": "Frank Herbert", "year_of_releasing": "1965",
+                            "genre": "Sci-Fi", "amount_of_pages": "412"}]
+    assert ndjson_records[0] == {"title": "Dune"}
+    assert len(ndjson_records) == 2 and "line 3" in str(ndjson_records[1])
+
+
+@pytest.mark.asyncio
+async def test_catalog_loader_chunks_rejects_and_resumes(tmp_path):
+    """Тест загрузчика: пачки COPY, отклоненные записи, контрольная точка и продолжение с нее"""
+    # Arrange
+    books = [{"title": f"Book {i}", "author": "Author", "year_of_releasing": 1990, "genre": "Fiction",
+              "amount_of_pages": 100 + i} for i in range(7)]
+    books[3]["amount_of_pages"] = 0
+    checkpoint = Checkpoint(str(tmp_path / "books.checkpoint"), "books.ndjson")
+    rejects = io.StringIO()
+    connection = _connection()
+
+    # Act
+    loader = CatalogLoader(connection, chunk_size=3, checkpoint=checkpoint, rejects=rejects)
+    await loader.load(iter(books[:5]))
+    resumed = Checkpoint(checkpoint.path, "books.ndjson")
+    resumed.load()
+    resumed_connection = _connection()
+    await CatalogLoader(resumed_connection, chunk_size=3, checkpoint=resumed).load(iter(books))
+
+    # Assert
+    assert [len(chunk) for chunk in connection.copied] == [3, 1]
+    assert (loader.loaded, loader.inserted, loader.invalid) == (5, 4, 1)
+    assert json.loads(rejects.getvalue())["position"] == 4
+    assert resumed.position == 7
+    assert [row[0] for chunk in resumed_connection.copied for row in chunk] == ["Book 5", "Book 6"]
@@ -0,0 +1,65 @@
+import os
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from src.models.book import BookFilters
+from src.models.sqlalchemy_models import BookORM, Base
+from src.storage.sqlalchemy_storage import SQLAlchemyStorageClient
+
+# Тесты с EXPLAIN выполняются только при наличии локального Postgres с правом CREATE EXTENSION
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+requires_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def test_trigram_indexes_ddl():
+    """Тест DDL триграммных индексов для фильтров-подстрок"""
+    # Arrange
+    indexes = {index.name: index for index in BookORM.__table__.indexes}
+
+    # Act
+    ddl = {
+        name: str(CreateIndex(indexes[name]).compile(dialect=postgresql.dialect()))
+        for name in ("idx_books_title_trgm", "idx_books_author_trgm", "idx_books_genre_trgm")
+    }
+
+    # Assert
+    assert "USING gin (title gin_trgm_ops)" in ddl["idx_books_title_trgm"]
+    assert "USING gin (author gin_trgm_ops)" in ddl["idx_books_author_trgm"]
+    assert "USING gin (genre gin_trgm_ops)" in ddl["idx_books_genre_trgm"]
+
+
+@requires_postgres
+@pytest.mark.asyncio
+async def test_substring_filters_use_trigram_indexes():
+    """Тест плана запроса: фильтры по подстроке обслуживаются триграммными индексами, а не Seq Scan"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    # Arrange
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO books (title, author, year_of_releasing, genre, amount_of_pages, status) "
+            "SELECT 'Book ' || n, 'Author ' || (n % 997), 1900 + n % 120, 'Genre ' || (n % 50), 100, 'available' "
+            "FROM generate_series(1, 20000) AS n"
+        ))
+        await conn.execute(text("ANALYZE books"))
+
+    statement = SQLAlchemyStorageClient.build_query(BookFilters(title="ook 1234", author="thor 12"), limit=20)
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+
+    # Act
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(f"EXPLAIN {compiled}"))
+            plan = "\n".join(row[0] for row in result)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    # Assert
+    assert "trgm" in plan
+    assert "Seq Scan" not in plan
@@ -0,0 +1,160 @@
+import pytest
+from sqlalchemy import text
+from src.models.book import BookFilters, BookSortField, BookStatus
+from src.core.exceptions import DuplicateRecordError
+
+pytest.importorskip("aiosqlite")
+
+from src.storage.sqlite_storage import SQLiteStorageClient  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_books_data():
+    """Книги с одинаковым набором колонок для пакетной вставки"""
+    return [
+        {"id": 1, "title": "Мастер и Маргарита", "author": "Булгаков", "year_of_releasing": 1967, "genre": "Роман",
+         "amount_of_pages": 480, "status": "available", "description": "Роман о дьяволе в Москве"},
+        {"id": 2, "title": "Sale 50%_off", "author": "Nobody", "year_of_releasing": 2001, "genre": "Fiction",
+         "amount_of_pages": 120, "status": "borrowed", "description": None},
+        {"id": 3, "title": "Собачье сердце", "author": "Булгаков", "year_of_releasing": 1925, "genre": "Повесть",
+         "amount_of_pages": 150, "status": "available", "description": "Повесть, Москва двадцатых"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_records_filters_and_search(tmp_path, sqlite_books_data):
+    """Тест SQLite хранилища: пословные операции, фильтры в базе, keyset пагинация и FTS5 поиск"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    await storage.save_data(sqlite_books_data)
+
+    # Act
+    created = await storage.insert({**sqlite_books_data[2], "id": None, "title": "Белая гвардия",
+                                    "description": "Киев"})
+    updated = await storage.update(2, {**sqlite_books_data[1], "status": "available"})
+    deleted = await storage.delete(3)
+    by_author = await storage.query(BookFilters(author="БУЛГАКОВ"))
+    escaped = await storage.query(BookFilters(title="50%_"))
+    in_range = await storage.query(BookFilters(year_min=1950, pages_max=480))
+    page, total = await storage.query_page(
+        BookFilters(status=BookStatus.AVAILABLE, sort_by=BookSortField.TITLE), limit=1, after=("Sale 50%_off", 2))
+    hits, hits_total = await storage.search("москве")
+    streamed = [book["id"] async for book in storage.iter_records(BookFilters(sort_by=BookSortField.TITLE), chunk_size=1)]
+    by_ids = await storage.get_many([4, 3, 1])
+    changed = await storage.update_where(BookFilters(author="булгаков"), {"status": "maintenance"})
+    removed = await storage.delete_where(BookFilters(status=BookStatus.MAINTENANCE, year_max=1950))
+
+    # Assert
+    assert created["id"] == 4 and created["created_at"] is not None
+    assert updated["status"] == "available"
+    assert deleted is True and await storage.get_by_id(3) is None
+    assert [book["id"] for book in by_author] == [1, 4]
+    assert [book["id"] for book in escaped] == [2]
+    assert [book["id"] for book in in_range] == [1, 2]
+    assert ([book["id"] for book in page], total) == ([4], 3)
+    assert ([book["id"] for book in hits], hits_total) == ([1], 1)
+    assert streamed == [2, 4, 1]
+    assert sorted(book["id"] for book in by_ids) == [1, 4]
+    assert (changed, removed) == (2, 1)
+    assert [book["status"] for book in await storage.get_data()] == ["maintenance", "available"]
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_uses_wal_and_orm_indexes(tmp_path):
+    """Тест схемы SQLite: режим WAL и индексы BookORM"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    await storage.count(BookFilters())
+
+    # Act
+    async with storage.engine.connect() as conn:
+        journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar_one()
+        indexes = {row[1] for row in await conn.execute(text("PRAGMA index_list(books)"))}
+
+    # Assert
+    assert journal_mode == "wal"
+    assert {"idx_title_author", "idx_status_genre", "idx_title_id", "idx_year_id"} <= indexes
+    assert not any(name.endswith("_trgm") for name in indexes)
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_rejects_duplicates_by_key_index(tmp_path, sqlite_books_data):
+    """Тест уникального индекса ключа дубликата: нормализованные название и автор, в том числе кириллица"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    first = await storage.insert({**sqlite_books_data[0], "title": "Война и мир", "author": "Лев Толстой"})
+    second = await storage.insert(sqlite_books_data[1])
+
+    # Act / Assert
+    with pytest.raises(DuplicateRecordError):
+        await storage.insert({**sqlite_books_data[0], "title": " ВОЙНА  и\tмир", "author": "лев толстой"})
+    with pytest.raises(DuplicateRecordError):
+        await storage.update(second["id"], {**sqlite_books_data[1], "title": "война и мир", "author": "Лев Толстой"})
+    assert await storage.count(BookFilters()) == 2
+    assert (await storage.get_by_id(first["id"]))["title"] == "Война и мир"
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_upserts_by_isbn(tmp_path, sqlite_books_data):
+    """Тест upsert по ISBN: ON CONFLICT (isbn) DO UPDATE, дубликат по названию и автору - None для своей книги"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    existing = await storage.insert({**sqlite_books_data[0], "isbn": "9785170902222"})
+
+    # Act
+    upserted = await storage.upsert_many([
+        {**sqlite_books_data[0], "isbn": "9785170902222", "status": "borrowed"},
+        {**sqlite_books_data[1], "isbn": "9780000000001"},
+        {**sqlite_books_data[2], "title": "Мастер и Маргарита", "isbn": "9780000000002"},
+    ])
+
+    # Assert
+    assert [(change[0]["id"], change[1]) if change else None for change in upserted] == [
+        (existing["id"], False), (existing["id"] + 1, True), None]
+    assert (await storage.get_by_id(existing["id"]))["status"] == "borrowed"
+    assert await storage.count(BookFilters()) == 2
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_insert_many_skips_isbn_duplicates(tmp_path, sqlite_books_data):
+    """Тест пакетной вставки: занятый ISBN и повтор ISBN в пачке дают None, остальные книги вставляются"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    await storage.insert({**sqlite_books_data[0], "isbn": "9785170902222"})
+
+    # Act
+    inserted = await storage.insert_many([
+        {**sqlite_books_data[1], "isbn": "9785170902222"},
+        {**sqlite_books_data[2], "isbn": "9780000000001"},
+        {**sqlite_books_data[1], "title": "Другая книга", "isbn": "9780000000001"},
+        {**sqlite_books_data[1], "title": "Без ISBN", "isbn": None},
+    ])
+
+    # Assert
+    assert [record["title"] if record else None for record in inserted] == [
+        None, "Собачье сердце", None, "Без ISBN"]
+    assert await storage.count(BookFilters()) == 3
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_rejects_duplicate_isbn(tmp_path, sqlite_books_data):
+    """Тест уникального индекса ISBN: вставка и изменение с занятым ISBN - DuplicateRecordError, а не ошибка базы"""
+    # Arrange
+    storage = SQLiteStorageClient(path=str(tmp_path / "library.db"))
+    first = await storage.insert({**sqlite_books_data[0], "isbn": "9785170902222"})
+    second = await storage.insert({**sqlite_books_data[1], "isbn": "9780000000001"})
+
+    # Act / Assert
+    with pytest.raises(DuplicateRecordError, match="ISBN"):
+        await storage.insert({**sqlite_books_data[2], "isbn": "9785170902222"})
+    with pytest.raises(DuplicateRecordError, match="ISBN"):
+        await storage.update(second["id"], {**sqlite_books_data[1], "isbn": "9785170902222"})
+    assert await storage.count(BookFilters()) == 2
+    assert (await storage.get_by_id(first["id"]))["isbn"] == "9785170902222"
+    assert (await storage.get_by_id(second["id"]))["isbn"] == "9780000000001"
+    await storage.close()
@@ -0,0 +1,690 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy.dialects import postgresql
+from src.models.book import BookFilters, BookSortField, BookStatus
+from src.storage.codecs import get_codec
+from src.storage.columnar_storage import ColumnarFileStorageClient
+from src.storage.file_storage import FileStorageClient
+from src.storage.log_file_storage import LogFileStorageClient
+from src.storage.id_allocator import FileIdAllocator
+from src.storage.memory import InMemoryStorageClient
+from src.storage.sqlalchemy_storage import SQLAlchemyStorageClient
+from src.storage.record_index import RecordIndex
+from src.storage.filtering import apply_filters, sort_key
+from src.core.exceptions import DuplicateRecordError, StorageError
+
+
+@pytest.mark.asyncio
+async def test_file_storage_record_operations(tmp_path, sample_books_data):
+    """Тест пословных операций файлового хранилища"""
+    # Arrange
+    storage = FileStorageClient(path=str(tmp_path / "books.json"))
+    await storage.save_data(sample_books_data)
+
+    # Act
+    created = await storage.insert({"title": "Book Three", "author": "Author Three", "status": "available"})
+    updated = await storage.update(1, {**sample_books_data[0], "status": "borrowed"})
+    deleted = await storage.delete(2)
+    borrowed = await storage.query(BookFilters(status=BookStatus.BORROWED))
+
+    # Assert
+    assert created["id"] == 3
+    assert updated["status"] == "borrowed"
+    assert deleted is True
+    assert [book["id"] for book in borrowed] == [1]
+    # Новый клиент читает то же состояние с диска
+    reopened = FileStorageClient(path=str(tmp_path / "books.json"))
+    assert [book["id"] for book in await reopened.get_data()] == [1, 3]
+    assert await reopened.get_by_id(2) is None
+
+
+
+
+@pytest.mark.asyncio
+async def test_file_storage_group_commit(tmp_path, monkeypatch):
+    """Тест группового коммита: параллельные записи фиксируются общими записями файла"""
+    # Arrange
+    storage = FileStorageClient(path=str(tmp_path / "books.json"), batch_window=0.01)
+    flushes = []
+    write_file = storage._write_file
+    monkeypatch.setattr(storage, "_write_file", lambda data: (flushes.append(len(data)), write_file(data)))
+
+    # Act
+    created = await asyncio.gather(*(
+        storage.insert({"title": f"Book {number}", "author": "Author"}) for number in range(50)
+    ))
+    missing = await storage.update(999, {"title": "Nothing"})
+
+    # Assert
+    assert sorted(book["id"] for book in created) == list(range(1, 51))
+    assert missing is None
+    assert len(flushes) < 50 and flushes[-1] == 50
+    reopened = FileStorageClient(path=str(tmp_path / "books.json"))
+    assert len(await reopened.get_data()) == 50
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_file_storage_refuses_unreadable_file(tmp_path):
+    """Тест файлового хранилища: нечитаемый файл - StorageError, запись не затирает каталог пустым списком"""
+    # Arrange
+    path = tmp_path / "books.json"
+    path.write_bytes(b'[{"id": 1, "title": "Book One"')
+    storage = FileStorageClient(path=str(path))
+
+    # Act / Assert
+    with pytest.raises(StorageError):
+        await storage.get_data()
+    with pytest.raises(StorageError):
+        await storage.insert({"title": "Book Two", "author": "Author Two"})
+    assert path.read_bytes() == b'[{"id": 1, "title": "Book One"'
+    await storage.close()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec_name", ["json", "orjson", "msgpack"])
+async def test_file_storage_codecs_round_trip_datetimes(tmp_path, codec_name):
+    """Тест кодеков файлового хранилища: datetime переживает запись и чтение с диска"""
+    # Arrange
+    if codec_name != "json":
+        pytest.importorskip(codec_name)
+    created_at = datetime(2024, 5, 17, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    record = {"id": 1, "title": "Мастер и Маргарита", "author": "Булгаков", "created_at": created_at, "updated_at": None}
+    storage = FileStorageClient(path=str(tmp_path / "books.bin"), codec=get_codec(codec_name))
+
+    # Act
+    await storage.save_data([record])
+    reopened = FileStorageClient(path=str(tmp_path / "books.bin"), codec=get_codec(codec_name))
+    loaded = await reopened.get_data()
+
+    # Assert
+    assert loaded == [record]
+    await storage.close()
+
+@pytest.mark.asyncio
+async def test_log_file_storage_replay_and_compaction(tmp_path, sample_books_data):
+    """Тест журнального файлового хранилища: восстановление после оборванной записи и сжатие"""
+    # Arrange
+    path = str(tmp_path / "books.json")
+    storage = LogFileStorageClient(path=path)
+    await storage.save_data(sample_books_data)
+    created = await storage.insert({"title": "Book Three", "author": "Author Three", "status": "available"})
+    await storage.update(1, {**sample_books_data[0], "status": "borrowed"})
+    await storage.delete(2)
+    await storage.close()
+    # Имитируем сбой посреди дописывания строки
+    with open(f"{path}.log", "ab") as f:
+        f.write(b'{"op": "put", "record": {"id": 9')
+
+    # Act
+    reopened = LogFileStorageClient(path=path)
+    replayed = await reopened.get_data()
+    fourth = await reopened.insert({"title": "Book Four", "author": "Author Four"})
+    await reopened.compact()
+    compacted = LogFileStorageClient(path=path)
+
+    # Assert
+    assert created["id"] == 3
+    assert [(book["id"], book.get("status")) for book in replayed] == [(1, "borrowed"), (3, "available")]
+    assert fourth["id"] > 3  # новый процесс берет следующий блок ID
+    assert [book["id"] for book in await compacted.get_data()] == [1, 3, fourth["id"]]
+    with open(f"{path}.log", "rb") as f:
+        assert f.read() == b""
+    # После сжатия снимок читается и обычным файловым хранилищем
+    assert [book["id"] for book in await FileStorageClient(path=path).get_data()] == [1, 3, fourth["id"]]
+
+
+@pytest.mark.asyncio
+async def test_log_file_storage_fsyncs_each_append(tmp_path, monkeypatch):
+    """Тест журнала: каждая группа строк подтверждается после fsync, сбой fsync откатывает изменение"""
+    # Arrange
+    storage = LogFileStorageClient(path=str(tmp_path / "books.json"))
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(os.fstat(fd).st_ino), fsync(fd)))
+
+    # Act
+    await storage.insert({"title": "Book One", "author": "Author One"})
+    await storage.insert_many([{"title": f"Book {number}", "author": "Author"} for number in range(3)])
+    synced_appends = synced.count(os.stat(storage.log_path).st_ino)  # ID-аллокатор синхронизирует свой файл отдельно
+
+    def fail(fd):
+        raise OSError("disk failure")
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        await storage.insert({"title": "Lost Book", "author": "Author"})
+
+    # Assert
+    assert synced_appends == 2
+    assert [book["title"] for book in await storage.get_data()] == ["Book One", "Book 0", "Book 1", "Book 2"]
+    await storage.close()
+
+@pytest.mark.asyncio
+async def test_columnar_file_storage_matches_record_index(tmp_path):
+    """Тест колоночного файла: фильтры, курсор и журнал изменений дают те же результаты, что RecordIndex"""
+    # Arrange
+    records = [
+        {"id": 1, "title": "Мастер и Маргарита", "author": "Булгаков", "genre": "Роман", "status": "available",
+         "year_of_releasing": 1967, "amount_of_pages": 480, "subjects": ["classic"]},
+        {"id": 2, "title": "Garden of night", "author": "Someone", "genre": "Fiction", "status": "borrowed",
+         "year_of_releasing": 2001, "amount_of_pages": 120, "subjects": []},
+        {"id": 3, "title": None, "author": "Nobody", "genre": "Fiction", "status": "available",
+         "year_of_releasing": 1990, "amount_of_pages": 10, "subjects": []},
+        {"id": 4, "title": "МАСТЕРская", "author": "Булгаков", "genre": "Повесть", "status": "available",
+         "year_of_releasing": 1925, "amount_of_pages": 150, "subjects": []},
+        {"id": 5, "title": "Без выходных данных", "author": "Nobody", "genre": "Fiction", "status": "available",
+         "year_of_releasing": None, "amount_of_pages": None, "subjects": []},
+    ]
+    path = str(tmp_path / "books.col")
+    storage = ColumnarFileStorageClient(path=path, merge_threshold=3)
+    await storage.save_data(records)
+    reference = RecordIndex(records)
+
+    new_book = {"title": "Мастер на все руки", "author": "X", "genre": "Fiction", "status": "available",
+                "year_of_releasing": 2020, "amount_of_pages": 1}
+
+    # Act
+    await storage.insert(new_book)
+    await storage.update(2, {**records[1], "status": "available"})
+    await storage.delete(3)  # третье изменение пересобирает файл
+    await storage.search("мастер")  # дальше индекс поиска ведется изменениями
+    await storage.update(4, {**records[3], "description": "Мастер и его рукописи"})
+    reference.insert(new_book)
+    reference.update(2, {**records[1], "status": "available"})
+    reference.delete(3)
+    reference.update(4, {**records[3], "description": "Мастер и его рукописи"})
+    reopened = ColumnarFileStorageClient(path=path)
+
+    # Assert
+    cases = [
+        BookFilters(title="мастер"),
+        BookFilters(genre="FIC", status=BookStatus.AVAILABLE),
+        BookFilters(author="булгаков", sort_by=BookSortField.YEAR_OF_RELEASING),
+        BookFilters(sort_by=BookSortField.TITLE),
+        BookFilters(year_min=1950, pages_max=200, sort_by=BookSortField.TITLE),
+        BookFilters(year_max=2000, sort_by=BookSortField.YEAR_OF_RELEASING),
+        BookFilters(pages_max=200),
+    ]
+    for filters in cases:
+        expected = [record["id"] for record in reference.query(filters)]
+        assert [record["id"] for record in await storage.query(filters)] == expected
+        assert [record["id"] for record in await reopened.query(filters)] == expected
+        assert await reopened.count(filters) == reference.count(filters)
+        after = sort_key(reference.query(filters, limit=1)[0], filters.sort_by)
+        assert [record["id"] for record in await reopened.query(filters, after=after)] == expected[1:]
+    for query in ("мастер", "булгаков рукописи", "garden"):
+        hits, total = reference.search(query)
+        expected = ([record["id"] for record in hits], total)
+        for client in (storage, reopened):
+            found, found_total = await client.search(query)
+            assert ([record["id"] for record in found], found_total) == expected
+    assert (await reopened.get_by_id(1))["subjects"] == ["classic"]
+    assert await reopened.get_by_id(3) is None
+    assert (await reopened.get_by_id(5))["amount_of_pages"] is None
+    await storage.close()
+
+
+
+@pytest.mark.asyncio
+async def test_columnar_file_storage_journal_survives_reload(tmp_path):
+    """Тест журнала колоночного файла: чтение не переписывает журнал, дозапись после чужой пересборки не теряется"""
+    # Arrange
+    path = str(tmp_path / "books.col")
+    first = ColumnarFileStorageClient(path=path, merge_threshold=3)
+    await first.save_data([{"id": 1, "title": "Book One", "author": "Author One", "status": "available"}])
+    await first.insert({"title": "Book Two", "author": "Author Two"})
+    # Имитируем сбой посреди дописывания строки
+    with open(f"{path}.log", "ab") as f:
+        f.write(b'{"op": "put", "record": {"id": 9')
+    log_inode = os.stat(f"{path}.log").st_ino
+    second = ColumnarFileStorageClient(path=path, merge_threshold=3)
+
+    # Act
+    read = [book["id"] for book in await second.get_data()]
+    inode_after_read = os.stat(f"{path}.log").st_ino
+    third = await second.insert({"title": "Book Three", "author": "Author Three"})
+    await second.insert({"title": "Book Four", "author": "Author Four"})  # пересборка заменяет журнал
+    fifth = await first.insert({"title": "Book Five", "author": "Author Five"})
+    await first.close()
+    await second.close()
+
+    # Assert
+    assert read == [1, 2]
+    assert inode_after_read == log_inode
+    titles = [book["title"] for book in await ColumnarFileStorageClient(path=path).get_data()]
+    assert titles == ["Book One", "Book Two", "Book Three", "Book Four", "Book Five"]
+    assert fifth["id"] > third["id"]
+
+def test_sql_query_pushes_filters_and_pagination_down():
+    """Тест трансляции BookFilters в WHERE/ORDER BY/LIMIT/OFFSET"""
+    # Arrange
+    filters = BookFilters(title="50%_off", status=BookStatus.AVAILABLE, genre="Fiction")
+
+    # Act
+    compiled = SQLAlchemyStorageClient.build_query(filters, offset=40, limit=20).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+
+    # Assert
+    assert "books.title ILIKE %(title_1)s" in sql
+    assert "books.status = %(status_1)s" in sql
+    assert "ORDER BY books.id" in sql
+    assert "LIMIT %(param_1)s" in sql and "OFFSET %(param_2)s" in sql
+    assert compiled.params["title_1"] == "%50\\%\\_off%"
+    assert compiled.params["genre_1"] == "%Fiction%"
+    assert (compiled.params["param_1"], compiled.params["param_2"]) == (20, 40)
+
+
+def test_sql_query_pushes_range_filters_down():
+    """Тест трансляции диапазонов года и числа страниц в условия WHERE"""
+    # Arrange
+    filters = BookFilters(year_min=1990, year_max=2000, pages_max=300)
+
+    # Act
+    compiled = SQLAlchemyStorageClient.build_query(filters).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+
+    # Assert
+    assert "books.year_of_releasing >= %(year_of_releasing_1)s" in sql
+    assert "books.year_of_releasing <= %(year_of_releasing_2)s" in sql
+    assert "books.amount_of_pages <= %(amount_of_pages_1)s" in sql
+    assert "amount_of_pages >=" not in sql
+    assert (compiled.params["year_of_releasing_1"], compiled.params["year_of_releasing_2"]) == (1990, 2000)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_full_text_search_ranking(in_memory_storage):
+    """Тест полнотекстового поиска: ранжирование BM25 и обновление индекса при записи"""
+    # Arrange
+    await in_memory_storage.save_data([
+        {"id": 1, "title": "Мастер и Маргарита", "author": "Булгаков", "description": "Роман о дьяволе в Москве"},
+        {"id": 2, "title": "Собачье сердце", "author": "Булгаков", "description": "Повесть, Москва двадцатых"},
+        {"id": 3, "title": "Москва-Петушки", "author": "Ерофеев", "description": None},
+    ])
+
+    # Act
+    by_title, total = await in_memory_storage.search("москва")
+    both_terms, both_total = await in_memory_storage.search("Булгаков москве")
+    await in_memory_storage.update(3, {"title": "Вальпургиева ночь", "author": "Ерофеев"})
+    after_update, after_total = await in_memory_storage.search("москва")
+
+    # Assert
+    assert total == 2
+    assert by_title[0]["id"] == 3  # совпадение в названии весит больше, чем в описании
+    assert [book["id"] for book in both_terms] == [1]
+    assert both_total == 1
+    assert [book["id"] for book in after_update] == [2]
+    assert after_total == 1
+
+
+def test_trigram_filters_match_linear_scan():
+    """Тест триграммных индексов: результат совпадает с линейной фильтрацией и после изменений"""
+    # Arrange
+    records = [
+        {"id": i, "title": title, "author": author, "genre": genre, "status": "available"}
+        for i, (title, author, genre) in enumerate([
+            ("War and Peace", "Tolstoy", "Fiction"),
+            ("Anna Karenina", "Tolstoy", "Fiction"),
+            ("Dune", "Herbert", "Science Fiction"),
+            ("Warlock", "Smith", "Fantasy"),
+            ("Peace Talks", "Butcher", "Fantasy"),
+        ], start=1)
+    ]
+    index = RecordIndex(records)
+    cases = [BookFilters(title="war"), BookFilters(title="pe", genre="fic"),
+             BookFilters(author="TOL"), BookFilters(genre="fantasy", title="ace"), BookFilters(title="zzz")]
+
+    # Act
+    index.update(4, {**records[3], "title": "Dark Peace"})
+    index.delete(1)
+    current = [record for record in records if record["id"] != 1]
+    current[2] = {**current[2], "title": "Dark Peace"}
+
+    # Assert
+    for filters in cases:
+        expected = [record["id"] for record in apply_filters(current, filters)]
+        assert [record["id"] for record in index.query(filters)] == expected
+        assert index.count(filters) == len(expected)
+
+
+def test_column_store_matches_record_index():
+    """Тест колоночного хранилища в памяти: маски фильтров, курсор и изменения дают те же результаты, что RecordIndex"""
+    # Arrange
+    pytest.importorskip("numpy")
+    from src.storage.column_store import ColumnStore
+    records = [
+        {"id": 1, "title": "Мастер и Маргарита", "author": "Булгаков", "genre": "Роман", "status": "available",
+         "year_of_releasing": 1967, "amount_of_pages": 480, "subjects": ["classic"]},
+        {"id": 2, "title": "Garden of night", "author": "Someone", "genre": "Fiction", "status": "borrowed",
+         "year_of_releasing": 2001, "amount_of_pages": 120},
+        {"id": 3, "title": None, "author": "Nobody", "genre": "Science fiction", "status": "available",
+         "year_of_releasing": None, "amount_of_pages": 10},
+        {"id": 4, "title": "МАСТЕРская", "author": "Булгаков", "genre": "Повесть", "status": "available",
+         "year_of_releasing": 1925, "amount_of_pages": 150},
+    ]
+    store = ColumnStore(records)
+    reference = RecordIndex(records)
+    new_book = {"title": "Мастер на все руки", "author": "X", "genre": "Fiction", "status": "reserved",
+                "year_of_releasing": 2020, "amount_of_pages": 1}
+
+    # Act
+    for index in (store, reference):
+        index.insert(new_book)
+        index.update(2, {**records[1], "status": "available"})
+        index.delete(4)
+
+    # Assert
+    cases = [
+        BookFilters(title="мастер"),
+        BookFilters(genre="FIC", status=BookStatus.AVAILABLE),
+        BookFilters(status=BookStatus.RESERVED),
+        BookFilters(author="булгаков", sort_by=BookSortField.YEAR_OF_RELEASING),
+        BookFilters(sort_by=BookSortField.YEAR_OF_RELEASING),
+        BookFilters(sort_by=BookSortField.TITLE),
+        BookFilters(year_max=2000, pages_min=10, sort_by=BookSortField.YEAR_OF_RELEASING),
+    ]
+    for filters in cases:
+        expected = reference.query(filters)
+        assert store.query(filters) == expected
+        assert store.query_page(filters, offset=1, limit=2) == reference.query_page(filters, offset=1, limit=2)
+        after = sort_key(expected[0], filters.sort_by)
+        assert store.query(filters, after=after) == expected[1:]
+    assert store.get(3)["year_of_releasing"] is None
+    assert store.next_id() == reference.next_id() == 6
+    assert store.search("маргарита")[1] == 1
+
+
+def test_column_store_next_id_follows_record_index():
+    """Тест колоночного хранилища: максимальный ID ведется при вставке и удалении так же, как в RecordIndex"""
+    # Arrange
+    pytest.importorskip("numpy")
+    from src.storage.column_store import ColumnStore
+    records = [{"id": record_id, "title": f"Book {record_id}", "author": "Author"} for record_id in range(1, 6)]
+    store = ColumnStore(records)
+    reference = RecordIndex(records)
+    steps = [
+        lambda index: index.delete(5),
+        lambda index: index.delete(3),
+        lambda index: index.delete(4),  # максимум откатывается через удаленную строку
+        lambda index: index.put({"id": 10, "title": "Book 10", "author": "Author"}),
+        lambda index: index.insert({"title": "Book next", "author": "Author"}),
+        lambda index: index.put({"id": 7, "title": "Book 7", "author": "Author"}),
+        lambda index: [index.delete(record_id) for record_id in (1, 2, 7, 10, 11)],
+    ]
+
+    # Act
+    next_ids = []
+    for step in steps:
+        step(store)
+        step(reference)
+        next_ids.append((store.next_id(), reference.next_id()))
+
+    # Assert
+    assert [ours for ours, _ in next_ids] == [theirs for _, theirs in next_ids] == [5, 5, 3, 11, 12, 12, 1]
+    assert store.all() == reference.all() == []
+
+@pytest.mark.parametrize("max_values", [256, 2])
+def test_record_index_bitmap_filters_match_scan(max_values):
+    """Тест битовых карт статуса и жанра: результаты совпадают с полным проходом, в том числе после изменений"""
+    # Arrange
+    genres = ["Fiction", "Science Fiction", "Poetry", None]
+    statuses = ["available", "borrowed", "reserved"]
+    records = [
+        {"id": record_id, "title": f"Book {record_id}", "author": f"Author {record_id % 7}",
+         "genre": genres[record_id % 4], "status": statuses[record_id % 3], "year_of_releasing": 1900 + record_id,
+         "amount_of_pages": record_id * 3 if record_id % 10 else None}
+        for record_id in range(1, 201)
+    ]
+    index = RecordIndex()
+    index._status_bitmaps.max_values = index._genre_bitmaps.max_values = max_values
+    index.load(records)
+
+    # Act
+    index.update(5, {**records[4], "status": "borrowed", "genre": "Poetry"})
+    index.delete(6)
+    index.insert({"title": "Book new", "author": "Author 1", "genre": "Fiction", "status": "reserved"})
+    expected_records = index.all()
+
+    # Assert
+    cases = [
+        BookFilters(status=BookStatus.BORROWED),
+        BookFilters(genre="fiction"),
+        BookFilters(genre="FICTION", status=BookStatus.RESERVED, sort_by=BookSortField.TITLE),
+        BookFilters(genre="poetry", author="author 1", sort_by=BookSortField.YEAR_OF_RELEASING),
+        BookFilters(status=BookStatus.MAINTENANCE),
+        BookFilters(year_min=1950, year_max=2010, status=BookStatus.BORROWED),
+        BookFilters(pages_max=90, genre="fiction", sort_by=BookSortField.TITLE),
+        BookFilters(pages_min=100, year_max=2050, sort_by=BookSortField.YEAR_OF_RELEASING),
+    ]
+    for filters in cases:
+        expected = sorted(apply_filters(expected_records, filters), key=lambda record: sort_key(record, filters.sort_by))
+        assert index.query(filters) == expected
+        assert index.count(filters) == len(expected)
+        assert index.query_page(filters, offset=1, limit=2) == (expected[1:3], len(expected))
+        if expected:
+            after = sort_key(expected[0], filters.sort_by)
+            assert index.query(filters, after=after, limit=3) == expected[1:4]
+
+
+def _allocate_ids(path: str, count: int) -> list:
+    """Выдает count ID в отдельном процессе"""
+    async def allocate():
+        allocator = FileIdAllocator(path, block_size=8)
+        return [await allocator.allocate() for _ in range(count)]
+    return asyncio.run(allocate())
+
+
+def test_file_id_allocator_unique_across_processes(tmp_path):
+    """Тест hi/lo выдачи ID: процессы с общим файлом-счетчиком не получают одинаковых ID"""
+    # Arrange
+    path = str(tmp_path / "books.json.ids")
+
+    # Act
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        batches = list(pool.map(_allocate_ids, [path] * 4, [50] * 4))
+
+    # Assert
+    ids = [record_id for batch in batches for record_id in batch]
+    assert len(set(ids)) == 200
+    assert all(batch == sorted(batch) for batch in batches)
+
+
+@pytest.mark.asyncio
+async def test_storage_ids_are_unique_and_not_reused(tmp_path):
+    """Тест выдачи ID: параллельные вставки получают разные ID, ID удаленной последней записи не повторяется"""
+    # Arrange
+    memory = InMemoryStorageClient()
+    file = FileStorageClient(path=str(tmp_path / "books.json"))
+    await file.save_data([{"id": 10, "title": "Existing"}])
+
+    # Act
+    memory_ids = [record["id"] for record in await asyncio.gather(
+        *(memory.insert({"title": f"Book {i}"}) for i in range(20)))]
+    await memory.delete(max(memory_ids))
+    after_delete = await memory.insert({"title": "Next"})
+    file_ids = [record["id"] for record in await asyncio.gather(
+        *(file.insert({"title": f"Book {i}"}) for i in range(20)))]
+
+    # Assert
+    assert sorted(memory_ids) == list(range(1, 21))
+    assert after_delete["id"] == 21
+    assert len(set(file_ids)) == 20 and min(file_ids) == 11
+    await file.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "columns", "file", "log", "columnar"])
+async def test_storage_rejects_normalized_duplicates(tmp_path, kind):
+    """Тест ключа дубликата: название и автор сравниваются без учета регистра и лишних пробелов"""
+    # Arrange
+    storage = {
+        "memory": lambda: InMemoryStorageClient(),
+        "columns": lambda: InMemoryStorageClient(layout="columnar"),
+        "file": lambda: FileStorageClient(path=str(tmp_path / "books.json")),
+        "log": lambda: LogFileStorageClient(path=str(tmp_path / "books.log")),
+        "columnar": lambda: ColumnarFileStorageClient(path=str(tmp_path / "books.col")),
+    }[kind]()
+    first = await storage.insert({"title": "War and Peace", "author": "Leo Tolstoy", "status": "available"})
+    second = await storage.insert({"title": "Anna Karenina", "author": "Leo Tolstoy", "status": "available"})
+
+    # Act / Assert
+    with pytest.raises(DuplicateRecordError):
+        await storage.insert({"title": "  WAR and\tpeace ", "author": "leo  tolstoy", "status": "available"})
+    with pytest.raises(DuplicateRecordError):
+        await storage.update(second["id"], {"title": "war and peace", "author": "Leo Tolstoy"})
+    assert (await storage.update(first["id"], {"title": "War and Peace", "author": "LEO TOLSTOY"})) is not None
+    assert await storage.delete(first["id"])
+    assert (await storage.insert({"title": "War and Peace", "author": "Leo Tolstoy"}))["id"] != first["id"]
+    if hasattr(storage, "close"):
+        await storage.close()
+
+
+def test_sql_insert_skips_duplicates_by_key_index():
+    """Тест INSERT: дубликат отсекает ON CONFLICT по выражениям уникального индекса ключа"""
+    # Act
+    sql = str(SQLAlchemyStorageClient.build_insert({"title": "Dune", "author": "Frank Herbert"})
+              .compile(dialect=postgresql.dialect()))
+
+    # Assert
+    assert ("ON CONFLICT (lower(btrim(regexp_replace(title, '\\s+', ' ', 'g'))), "
+            "lower(btrim(regexp_replace(author, '\\s+', ' ', 'g')))) DO NOTHING") in sql
+    assert "RETURNING books.id" in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "file", "log", "columnar"])
+async def test_storage_insert_many_keeps_order_and_skips_duplicates(tmp_path, kind):
+    """Тест пакетной вставки: результаты в порядке пачки, дубликаты (и внутри пачки) - None, одна запись файла"""
+    # Arrange
+    storage = {
+        "memory": lambda: InMemoryStorageClient(),
+        "file": lambda: FileStorageClient(path=str(tmp_path / "books.json")),
+        "log": lambda: LogFileStorageClient(path=str(tmp_path / "books.log")),
+        "columnar": lambda: ColumnarFileStorageClient(path=str(tmp_path / "books.col")),
+    }[kind]()
+    await storage.insert({"title": "Existing", "author": "A"})
+    records = [{"title": f"Book {i}", "author": "A"} for i in range(5)]
+    records[2] = {"title": "EXISTING", "author": "a"}
+    records[4] = {"title": "book 0", "author": "A"}
+
+    # Act
+    inserted = await storage.insert_many(records)
+
+    # Assert
+    assert [record is None for record in inserted] == [False, False, True, False, True]
+    assert [record["title"] for record in inserted if record] == ["Book 0", "Book 1", "Book 3"]
+    assert len({record["id"] for record in inserted if record}) == 3
+    assert len(await storage.get_data()) == 4
+    if hasattr(storage, "close"):
+        await storage.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "columns", "file", "log", "columnar"])
+async def test_storage_update_and_delete_by_filter(tmp_path, kind, sample_books_data):
+    """Тест изменения и удаления по фильтру: одна операция затрагивает все записи под фильтр и только их"""
+    # Arrange
+    storage = {
+        "memory": lambda: InMemoryStorageClient(),
+        "columns": lambda: InMemoryStorageClient(layout="columnar"),
+        "file": lambda: FileStorageClient(path=str(tmp_path / "books.json")),
+        "log": lambda: LogFileStorageClient(path=str(tmp_path / "books.log")),
+        "columnar": lambda: ColumnarFileStorageClient(path=str(tmp_path / "books.col")),
+    }[kind]()
+    await storage.save_data(sample_books_data)
+    fiction = BookFilters(genre="fiction")
+    expected = [book["id"] for book in apply_filters(sample_books_data, fiction)]
+
+    # Act
+    updated = await storage.update_where(fiction, {"status": "maintenance"})
+    missed = await storage.update_where(BookFilters(author="nobody"), {"status": "maintenance"})
+    in_maintenance = [book["id"] for book in await storage.query(BookFilters(status=BookStatus.MAINTENANCE))]
+    deleted = await storage.delete_where(BookFilters(status=BookStatus.MAINTENANCE))
+
+    # Assert
+    assert (updated, missed, deleted) == (len(expected), 0, len(expected))
+    assert in_maintenance == expected
+    assert sorted(book["id"] for book in await storage.get_data()) == sorted(
+        book["id"] for book in sample_books_data if book["id"] not in expected)
+    if hasattr(storage, "close"):
+        await storage.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "columns", "file", "log", "columnar"])
+async def test_storage_upsert_many_by_isbn(tmp_path, kind):
+    """Тест upsert по ISBN: существующая книга заменяется с прежними id и created_at, новая добавляется"""
+    # Arrange
+    storage = {
+        "memory": lambda: InMemoryStorageClient(),
+        "columns": lambda: InMemoryStorageClient(layout="columnar"),
+        "file": lambda: FileStorageClient(path=str(tmp_path / "books.json")),
+        "log": lambda: LogFileStorageClient(path=str(tmp_path / "books.log")),
+        "columnar": lambda: ColumnarFileStorageClient(path=str(tmp_path / "books.col")),
+    }[kind]()
+    created_at = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    existing = await storage.insert({"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593",
+                                     "genre": "Sci-Fi", "cover_url": "cover.jpg", "created_at": created_at})
+    await storage.insert({"title": "Emma", "author": "Jane Austen", "isbn": "9780141439587", "genre": "Novel"})
+
+    # Act
+    upserted = await storage.upsert_many([
+        {"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593", "genre": "Classic", "created_at": None},
+        {"title": "Solaris", "author": "Stanislaw Lem", "isbn": "9780156027601", "genre": "Sci-Fi"},
+        {"title": "EMMA", "author": "jane austen", "isbn": "9999999999", "genre": "Novel"},
+    ])
+    replaced = await storage.get_by_id(existing["id"])
+
+    # Assert
+    assert [(change[0]["title"], change[1]) if change else None for change in upserted] == [
+        ("Dune", False), ("Solaris", True), None]
+    assert (replaced["genre"], replaced["cover_url"], replaced["created_at"]) == ("Classic", "cover.jpg", created_at)
+    assert len(await storage.get_data()) == 3
+    if hasattr(storage, "close"):
+        await storage.close()
+
+
+def test_sql_upsert_updates_on_isbn_conflict():
+    """Тест upsert: ON CONFLICT (isbn) DO UPDATE заменяет переданные колонки, кроме created_at"""
+    # Act
+    sql = str(SQLAlchemyStorageClient.build_upsert(
+        [{"title": "Dune", "author": "Frank Herbert", "isbn": "9780441013593", "created_at": None}]
+    ).compile(dialect=postgresql.dialect()))
+
+    # Assert
+    assert "ON CONFLICT (isbn) DO UPDATE SET title = excluded.title, author = excluded.author" in sql
+    assert "created_at = excluded" not in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "columns", "file", "log", "columnar"])
+async def test_storage_rejects_duplicate_isbn(tmp_path, kind):
+    """Тест уникальности ISBN: чужой ISBN отклоняется, после удаления владельца upsert создает одну книгу"""
+    # Arrange
+    storage = {
+        "memory": lambda: InMemoryStorageClient(),
+        "columns": lambda: InMemoryStorageClient(layout="columnar"),
+        "file": lambda: FileStorageClient(path=str(tmp_path / "books.json")),
+        "log": lambda: LogFileStorageClient(path=str(tmp_path / "books.log")),
+        "columnar": lambda: ColumnarFileStorageClient(path=str(tmp_path / "books.col")),
+    }[kind]()
+    first = await storage.insert({"title": "Dune", "author": "Frank Herbert", "isbn": "1234567890"})
+    other = await storage.insert({"title": "Emma", "author": "Jane Austen", "isbn": None})
+
+    # Act / Assert
+    with pytest.raises(DuplicateRecordError):
+        await storage.insert({"title": "Solaris", "author": "Stanislaw Lem", "isbn": "1234567890"})
+    with pytest.raises(DuplicateRecordError):
+        await storage.update(other["id"], {**other, "isbn": "1234567890"})
+    inserted = await storage.insert_many([{"title": "Solaris", "author": "Stanislaw Lem", "isbn": "1234567890"}])
+    assert inserted == [None]
+
+    assert await storage.delete(first["id"])
+    (change,) = await storage.upsert_many([{"title": "Dune", "author": "Frank Herbert", "isbn": "1234567890"}])
+    (repeat,) = await storage.upsert_many([{"title": "Dune", "author": "Frank Herbert", "isbn": "1234567890",
+                                            "genre": "Sci-Fi"}])
+    assert change[1] is True and (repeat[0]["id"], repeat[0]["genre"], repeat[1]) == (change[0]["id"], "Sci-Fi", False)
+    assert [book["isbn"] for book in await storage.get_data()].count("1234567890") == 1
+    if hasattr(storage, "close"):
+        await storage.close()